@@ -3,20 +3,18 @@
 MVP - Aplicación Web para Identificación de Minerales mediante Espectros EDS
 """
 
-import os
-import tempfile
-from datetime import datetime
-
-import numpy as np
-import pandas as pd
 import streamlit as st
 
-from src.analysis.compare import compare_spectrum
+from src.analysis.compare import compare_vector
 from src.database.connection import SessionLocal
-from src.database.queries import (count_muestras, create_tables,
-                                  get_all_muestras_with_vectors, get_muestra_by_id,
-                                  insert_espectro, insert_muestra, update_muestra, delete_muestra)
-from src.parsers.docx_parser import extract_and_vectorize_spectrum
+from src.database.queries import (count_muestras, count_muestras_filtered, create_tables,
+                                  delete_muestras, get_investigadores, get_muestras_page,
+                                  insert_espectro, insert_muestra, update_muestras)
+from src.database.stats import get_database_stats
+from src.service.jobs import COMPLETADO, ERROR, JobManager, file_hash
+
+# Muestras por página en los listados
+PAGE_SIZE = 50
 
 
 def setup_database():
@@ -28,150 +26,273 @@ def show_database_stats():
     """Muestra estadísticas de la base de datos."""
     session = SessionLocal()
     try:
-        total_muestras = count_muestras(session)
-        muestras_with_vectors = len(get_all_muestras_with_vectors(session))
+        stats = get_database_stats(session)
         
         col1, col2 = st.columns(2)
         with col1:
-            st.metric("Total de Muestras", total_muestras)
+            st.metric("Total de Muestras", stats["total_muestras"])
         with col2:
-            st.metric("Muestras con Espectros", muestras_with_vectors)
+            st.metric("Muestras con Espectros", stats["muestras_con_espectro"])
             
     finally:
         session.close()
 
 
+def show_statistics_panel():
+    """Muestra el panel de estadísticas detalladas (agregados SQL en caché)."""
+    import pandas as pd
+
+    session = SessionLocal()
+    try:
+        granularidad = st.radio(
+            "Agrupar fechas por:",
+            ["month", "day", "year"],
+            format_func={"day": "Día", "month": "Mes", "year": "Año"}.get,
+            horizontal=True
+        )
+        stats = get_database_stats(session, granularity=granularidad)
+    finally:
+        session.close()
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("Minerales Distintos", stats["minerales_distintos"])
+    with col2:
+        st.metric("Espectros Almacenados", stats["total_espectros"])
+    
+    if not stats["total_muestras"]:
+        return
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.write("**Muestras por mineral**")
+        st.bar_chart(pd.DataFrame(stats["por_mineral"], columns=["Mineral", "Muestras"]).set_index("Mineral"))
+    with col2:
+        st.write("**Muestras por investigador**")
+        st.bar_chart(pd.DataFrame(stats["por_investigador"], columns=["Investigador", "Muestras"]).set_index("Investigador"))
+    
+    if stats["por_fecha"]:
+        st.write("**Muestras por fecha de registro**")
+        st.bar_chart(pd.DataFrame(stats["por_fecha"], columns=["Periodo", "Muestras"]).set_index("Periodo"))
+
+
+def select_muestras_page(session, key, page_size=PAGE_SIZE):
+    """
+    Muestra los filtros y controles de paginación de un listado de muestras.
+    Retorna (muestras de la página actual, total de muestras que cumplen los filtros).
+    """
+    col1, col2, col3 = st.columns([2, 2, 3])
+    with col1:
+        nombre_prefix = st.text_input("Mineral (comienza con)", key=f"{key}_prefix").strip()
+    with col2:
+        investigadores = ["Todos"] + get_investigadores(session)
+        investigador = st.selectbox("Investigador", investigadores, key=f"{key}_investigador")
+    with col3:
+        rango = st.date_input("Rango de fechas", value=(), key=f"{key}_fechas")
+    
+    filtros = {
+        "nombre_prefix": nombre_prefix or None,
+        "investigador": None if investigador == "Todos" else investigador,
+        "fecha_desde": rango[0] if len(rango) > 0 else None,
+        "fecha_hasta": rango[1] if len(rango) > 1 else None,
+    }
+    
+    # Pila de cursores (keyset): se reinicia cuando cambian los filtros
+    firma = repr(sorted(filtros.items()))
+    if st.session_state.get(f"{key}_firma") != firma:
+        st.session_state[f"{key}_firma"] = firma
+        st.session_state[f"{key}_cursores"] = [None]
+    cursores = st.session_state[f"{key}_cursores"]
+    st.session_state[f"{key}_filtros"] = filtros
+    
+    muestras, next_cursor = get_muestras_page(session, after_id=cursores[-1], limit=page_size, **filtros)
+    total = count_muestras_filtered(session, **filtros)
+    
+    col_prev, col_info, col_next = st.columns([1, 3, 1])
+    with col_prev:
+        if st.button("⬅️ Anterior", key=f"{key}_prev", disabled=len(cursores) == 1):
+            cursores.pop()
+            st.rerun()
+    with col_info:
+        st.caption(f"Página {len(cursores)} de {max(1, -(-total // page_size))} · {total} muestras")
+    with col_next:
+        if st.button("Siguiente ➡️", key=f"{key}_next", disabled=next_cursor is None):
+            cursores.append(next_cursor)
+            st.rerun()
+    
+    return muestras, total
+
+
+def show_muestras_table(muestras):
+    """Muestra una tabla con las muestras indicadas."""
+    import pandas as pd
+
+    data = []
+    for muestra in muestras:
+        data.append({
+            "ID": muestra.id,
+            "Mineral": muestra.nombre_muestra,
+            "Investigador": muestra.investigador or "N/A",
+            "Fecha": muestra.fecha.strftime("%Y-%m-%d") if muestra.fecha else "N/A"
+        })
+    
+    df = pd.DataFrame(data)
+    st.dataframe(df, use_container_width=True)
+
+
 def show_mineral_database():
-    """Muestra la tabla de minerales en la base de datos."""
+    """Muestra la tabla paginada de minerales en la base de datos."""
     session = SessionLocal()
     try:
-        muestras = get_all_muestras_with_vectors(session)
-        
-        if not muestras:
+        if count_muestras(session) == 0:
             st.warning("No hay muestras en la base de datos. Ejecuta el script de población primero.")
             return
         
-        # Crear DataFrame para mostrar
-        data = []
-        for muestra in muestras:
-            data.append({
-                "ID": muestra.id,
-                "Mineral": muestra.nombre_muestra,
-                "Investigador": muestra.investigador or "N/A",
-                "Fecha": muestra.fecha.strftime("%Y-%m-%d") if muestra.fecha else "N/A"
-            })
+        muestras, total = select_muestras_page(session, key="db")
+        if not muestras:
+            st.info("Ninguna muestra coincide con los filtros.")
+            return
         
-        df = pd.DataFrame(data)
-        st.dataframe(df, use_container_width=True)
+        show_muestras_table(muestras)
         
     finally:
         session.close()
 
 
+@st.cache_resource
+def get_job_manager():
+    """Pool de trabajos en segundo plano compartido por todas las sesiones."""
+    return JobManager(max_workers=2)
+
+
+def show_identification_results(resultados):
+    """Muestra la tabla de minerales similares y el mejor match."""
+    import pandas as pd
+
+    st.subheader("🔍 Resultados de Identificación")
+
+    if not resultados:
+        st.warning("No se encontraron minerales similares en la base de datos.")
+        return
+
+    st.write("Minerales más similares (ordenados por similitud):")
+
+    # Crear DataFrame con resultados
+    df_resultados = pd.DataFrame([
+        {
+            "Mineral": nombre,
+            "Similitud": f"{sim:.2%}",
+            "Confianza": "Alta" if sim > 0.8 else "Media" if sim > 0.6 else "Baja"
+        }
+        for mid, nombre, sim in resultados[:10]  # Top 10
+    ])
+
+    st.dataframe(df_resultados, use_container_width=True)
+
+    # Mostrar el mejor match
+    mejor_match = resultados[0]
+    similitud = mejor_match[2]
+    mineral = mejor_match[1]
+
+    if similitud > 0.8:
+        st.success(f"🎯 **Identificación muy probable:** {mineral} (similitud: {similitud:.2%})")
+    elif similitud > 0.6:
+        st.warning(f"🤔 **Posible identificación:** {mineral} (similitud: {similitud:.2%})")
+    else:
+        st.info(f"💡 **Sugerencia:** {mineral} (similitud: {similitud:.2%}) - Se recomienda análisis adicional")
+
+
 def identify_mineral():
-    """Interfaz para identificar un mineral subiendo un archivo DOCX."""
+    """Interfaz para identificar minerales subiendo uno o varios archivos DOCX."""
     st.subheader("📤 Subir Espectro EDS para Identificación")
     
-    uploaded_file = st.file_uploader(
-        "Selecciona un archivo DOCX con espectro EDS",
+    uploaded_files = st.file_uploader(
+        "Selecciona uno o varios archivos DOCX con espectros EDS",
         type=['docx'],
+        accept_multiple_files=True,
         help="El archivo debe contener una imagen de espectro EDS de 400x512 píxeles"
     )
     
-    if uploaded_file is not None:
-        # Crear archivo temporal
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.docx') as tmp_file:
-            tmp_file.write(uploaded_file.getvalue())
-            tmp_path = tmp_file.name
-        
+    manager = get_job_manager()
+    # Trabajos de esta sesión: hash del archivo -> job_id
+    session_jobs = st.session_state.setdefault('identification_jobs', {})
+    
+    # Encolar los archivos nuevos; los ya enviados no se reprocesan en cada rerun
+    for uploaded_file in uploaded_files or []:
+        data = uploaded_file.getvalue()
+        digest = file_hash(data)
+        if digest not in session_jobs or manager.get(session_jobs[digest]) is None:
+            session_jobs[digest] = manager.submit(data, uploaded_file.name)
+    
+    jobs = [job for job in (manager.get(job_id) for job_id in session_jobs.values()) if job]
+    if not jobs:
+        return
+    
+    # Estado de los trabajos en cola
+    st.markdown("---")
+    st.subheader("⏳ Archivos en Proceso")
+    for job in jobs:
+        estado = f"{job['filename']} — {job['estado']}"
+        if job['estado'] == ERROR:
+            st.error(f"❌ {estado}: {job['error']}")
+        else:
+            st.progress(job['progreso'], text=estado)
+    
+    pendientes = [job for job in jobs if job['estado'] not in (COMPLETADO, ERROR)]
+    if pendientes:
+        st.info(f"{len(pendientes)} archivo(s) en proceso. Puedes seguir usando la aplicación mientras tanto.")
+        st.button("🔄 Actualizar estado")
+    
+    completados = [job for job in jobs if job['estado'] == COMPLETADO]
+    if not completados:
+        return
+    
+    st.markdown("---")
+    job_options = {f"{job['filename']} ({job['id']})": job for job in completados}
+    selected = st.selectbox("Selecciona un archivo procesado:", options=list(job_options.keys()))
+    job = job_options[selected]
+    
+    st.success("✅ Espectro extraído exitosamente!")
+    st.info(f"Vector generado: {len(job['vector'])} dimensiones")
+    
+    # Almacenar el vector en session_state para uso posterior
+    if st.session_state.get('uploaded_filename') != job['filename']:
+        st.session_state['show_save_form'] = False
+    st.session_state['current_vector'] = job['vector']
+    st.session_state['current_representacion'] = job['representacion']
+    st.session_state['uploaded_filename'] = job['filename']
+    
+    # Ventana del vector: se recalcula la similitud con el vector ya extraído.
+    # El eje de los perfiles de imagen no está calibrado en energía, así que la
+    # ventana se elige en bins del vector.
+    resultados = job['resultados']
+    dimension = len(job['vector'])
+    ventana = st.slider(
+        "Ventana del vector (bins)", min_value=0, max_value=dimension, value=(0, dimension), step=1,
+        help="Compara solo los bins [inicio, fin) del vector, p. ej. para ignorar el pico de "
+             "carbono/recubrimiento al inicio"
+    )
+    if tuple(ventana) != (0, dimension):
+        session = SessionLocal()
         try:
-            with st.spinner("Procesando espectro..."):
-                # Extraer y vectorizar
-                vector = extract_and_vectorize_spectrum(tmp_path, vector_size=200)
-                
-                if vector is None:
-                    st.error("❌ No se encontró un espectro válido en el archivo. Verifica que contenga una imagen de espectro EDS de 400x512 píxeles.")
-                    return
-                
-                st.success("✅ Espectro extraído exitosamente!")
-                
-                # Mostrar información del vector
-                st.info(f"Vector generado: {len(vector)} dimensiones")
-                
-                # Almacenar el vector en session_state para uso posterior
-                st.session_state['current_vector'] = vector
-                st.session_state['uploaded_filename'] = uploaded_file.name
-                
-                # Comparar contra la base de datos usando una muestra temporal
-                st.subheader("🔍 Resultados de Identificación")
-                
-                session = SessionLocal()
-                try:
-                    # Crear una muestra temporal solo para comparación (no persistir)
-                    temp_muestra = insert_muestra(
-                        session=session,
-                        nombre_muestra=f"TEMP_COMPARISON_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
-                        investigador="TEMP",
-                        ruta_imagen=uploaded_file.name
-                    )
-                    
-                    insert_espectro(session, muestra_id=temp_muestra.id, vector=vector)
-                    
-                    resultados = compare_spectrum(session, temp_muestra.id, similitud_umbral=0.0)
-                    
-                    # Eliminar la muestra temporal después de obtener resultados
-                    delete_muestra(session, temp_muestra.id)
-                    
-                    if not resultados:
-                        st.warning("No se encontraron minerales similares en la base de datos.")
-                    else:
-                        st.write("Minerales más similares (ordenados por similitud):")
-                        
-                        # Crear DataFrame con resultados
-                        df_resultados = pd.DataFrame([
-                            {
-                                "Mineral": nombre,
-                                "Similitud": f"{sim:.2%}",
-                                "Confianza": "Alta" if sim > 0.8 else "Media" if sim > 0.6 else "Baja"
-                            }
-                            for mid, nombre, sim in resultados[:10]  # Top 10
-                        ])
-                        
-                        st.dataframe(df_resultados, use_container_width=True)
-                        
-                        # Mostrar el mejor match
-                        if resultados:
-                            mejor_match = resultados[0]
-                            similitud = mejor_match[2]
-                            mineral = mejor_match[1]
-                            
-                            if similitud > 0.8:
-                                st.success(f"🎯 **Identificación muy probable:** {mineral} (similitud: {similitud:.2%})")
-                            elif similitud > 0.6:
-                                st.warning(f"🤔 **Posible identificación:** {mineral} (similitud: {similitud:.2%})")
-                            else:
-                                st.info(f"💡 **Sugerencia:** {mineral} (similitud: {similitud:.2%}) - Se recomienda análisis adicional")
-                        
-                        # Almacenar resultados en session_state para mostrar después
-                        st.session_state['comparison_results'] = resultados
-                
-                finally:
-                    session.close()
-                
-                # Botón para guardar la muestra en la base de datos
-                st.markdown("---")
-                st.subheader("💾 Guardar Muestra en Base de Datos")
-                
-                if st.button("📁 Guardar esta muestra", type="primary", help="Guarda la muestra analizada en la base de datos"):
-                    st.session_state['show_save_form'] = True
-                
-                # Mostrar formulario de guardado si se activó
-                if st.session_state.get('show_save_form', False):
-                    show_save_sample_form()
-                    
+            resultados = compare_vector(session, job['vector'], similitud_umbral=0.0, ventana=ventana,
+                                        representacion=job['representacion'])
         finally:
-            # Limpiar archivo temporal
-            os.unlink(tmp_path)
+            session.close()
+    st.session_state['comparison_results'] = resultados
+    
+    show_identification_results(resultados)
+    
+    # Botón para guardar la muestra en la base de datos
+    st.markdown("---")
+    st.subheader("💾 Guardar Muestra en Base de Datos")
+    
+    if st.button("📁 Guardar esta muestra", type="primary", help="Guarda la muestra analizada en la base de datos"):
+        st.session_state['show_save_form'] = True
+    
+    # Mostrar formulario de guardado si se activó
+    if st.session_state.get('show_save_form', False):
+        show_save_sample_form()
 
 
 def main():
@@ -228,6 +349,9 @@ def main():
         st.header("📊 Base de Datos de Minerales")
         
         show_database_stats()
+        
+        with st.expander("📈 Estadísticas detalladas"):
+            show_statistics_panel()
         st.markdown("---")
         
         st.subheader("🗂️ Minerales en la Base de Datos")
@@ -310,7 +434,8 @@ def show_save_sample_form():
                     ruta_imagen=st.session_state.get('uploaded_filename', 'archivo_subido.docx')
                 )
                 
-                insert_espectro(session, muestra_id=nueva_muestra.id, vector=st.session_state['current_vector'])
+                insert_espectro(session, muestra_id=nueva_muestra.id, vector=st.session_state['current_vector'],
+                                representacion=st.session_state['current_representacion'])
                 
                 st.success(f"✅ Muestra '{nombre_muestra}' guardada exitosamente con ID: {nueva_muestra.id}")
                 
@@ -323,6 +448,7 @@ def show_save_sample_form():
                 # Limpiar session_state
                 if 'current_vector' in st.session_state:
                     del st.session_state['current_vector']
+                    del st.session_state['current_representacion']
                 if 'uploaded_filename' in st.session_state:
                     del st.session_state['uploaded_filename']
                 if 'comparison_results' in st.session_state:
@@ -344,107 +470,93 @@ def manage_samples():
     
     session = SessionLocal()
     try:
-        muestras = get_all_muestras_with_vectors(session)
+        if count_muestras(session) == 0:
+            st.warning("No hay muestras en la base de datos.")
+            return
         
+        # Búsqueda paginada de la muestra a gestionar
+        muestras, total = select_muestras_page(session, key="manage")
         if not muestras:
-            st.warning("No hay muestras en la base de datos.")
+            st.info("Ninguna muestra coincide con los filtros.")
             return
         
+        filtros = st.session_state["manage_filtros"]
+        hay_filtros = any(filtros.values())
+
+        # Selección múltiple en la página actual, o todas las que cumplen los filtros
+        muestra_options = {f"{m.id} - {m.nombre_muestra}": m.id for m in muestras}
+        todas = st.checkbox(
+            f"Aplicar a todas las muestras que cumplen los filtros ({total})",
+            disabled=not hay_filtros,
+            help="Requiere al menos un filtro (mineral, investigador o fechas)"
+        )
+        seleccion = [] if todas else st.multiselect(
+            "Selecciona las muestras:",
+            options=list(muestra_options.keys())
+        )
+        ids = None if todas else [muestra_options[opcion] for opcion in seleccion]
+        # Mismas muestras que el total mostrado (solo las que tienen espectro activo)
+        objetivo = dict(filtros, solo_con_espectro=True) if todas else {}
+        cantidad = total if todas else len(ids)
+
         # Selector de acción
         action = st.radio(
             "¿Qué deseas hacer?",
-            ["✏️ Editar Muestra", "🗑️ Eliminar Muestra"],
+            ["✏️ Editar Muestras", "🗑️ Eliminar Muestras"],
             horizontal=True
         )
         
         st.markdown("---")
         
-        if action == "✏️ Editar Muestra":
-            st.subheader("✏️ Editar Información de Muestra")
-            
-            # Selector de muestra
-            muestra_options = {f"{m.id} - {m.nombre_muestra}": m.id for m in muestras}
-            selected_muestra = st.selectbox(
-                "Selecciona la muestra a editar:",
-                options=list(muestra_options.keys())
-            )
+        if cantidad == 0:
+            st.info("Selecciona al menos una muestra.")
+        
+        elif action == "✏️ Editar Muestras":
+            st.subheader(f"✏️ Editar {cantidad} muestra(s)")
             
-            if selected_muestra:
-                muestra_id = muestra_options[selected_muestra]
-                muestra = get_muestra_by_id(session, muestra_id)
+            # Formulario de edición (los campos vacíos no se modifican)
+            with st.form(key="edit_form"):
+                new_name = st.text_input(
+                    "Nuevo nombre de muestra:",
+                    help="Vacío: se conserva el nombre de cada muestra"
+                )
+                new_investigador = st.text_input(
+                    "Investigador:",
+                    help="Vacío: se conserva el investigador de cada muestra"
+                )
                 
-                if muestra:
-                    st.info(f"**Muestra actual:** {muestra.nombre_muestra} | **Investigador:** {muestra.investigador or 'N/A'}")
-                    
-                    # Formulario de edición
-                    with st.form(key=f"edit_form_{muestra_id}"):
-                        new_name = st.text_input(
-                            "Nuevo nombre de muestra:",
-                            value=muestra.nombre_muestra,
-                            help="Ingresa el nuevo nombre para la muestra"
-                        )
-                        new_investigador = st.text_input(
-                            "Investigador:",
-                            value=muestra.investigador or "",
-                            help="Nombre del investigador responsable"
+                submit_edit = st.form_submit_button("💾 Guardar Cambios", type="primary")
+                
+                if submit_edit:
+                    if new_name.strip() or new_investigador.strip():
+                        actualizadas = update_muestras(
+                            session,
+                            ids=ids,
+                            nombre_muestra=new_name.strip() or None,
+                            nuevo_investigador=new_investigador.strip() or None,
+                            **objetivo
                         )
-                        
-                        col1, col2 = st.columns([1, 4])
-                        with col1:
-                            submit_edit = st.form_submit_button("💾 Guardar Cambios", type="primary")
-                        
-                        if submit_edit:
-                            if new_name.strip():
-                                updated_muestra = update_muestra(
-                                    session, 
-                                    muestra_id, 
-                                    nombre_muestra=new_name.strip(),
-                                    investigador=new_investigador.strip() or None
-                                )
-                                if updated_muestra:
-                                    st.success("✅ Muestra actualizada exitosamente!")
-                                    st.rerun()
-                                else:
-                                    st.error("❌ Error al actualizar la muestra.")
-                            else:
-                                st.error("❌ El nombre de la muestra no puede estar vacío.")
-        
-        elif action == "🗑️ Eliminar Muestra":
-            st.subheader("🗑️ Eliminar Muestra")
-            st.warning("⚠️ Esta acción eliminará permanentemente la muestra y su espectro asociado.")
-            
-            # Selector de muestra
-            muestra_options = {f"{m.id} - {m.nombre_muestra}": m.id for m in muestras}
-            selected_muestra = st.selectbox(
-                "Selecciona la muestra a eliminar:",
-                options=list(muestra_options.keys())
-            )
+                        st.success(f"✅ {actualizadas} muestra(s) actualizada(s)")
+                        st.rerun()
+                    else:
+                        st.error("❌ Indica un nuevo nombre o investigador.")
+        
+        elif action == "🗑️ Eliminar Muestras":
+            st.subheader(f"🗑️ Eliminar {cantidad} muestra(s)")
+            st.warning("⚠️ Esta acción eliminará permanentemente las muestras y sus espectros asociados.")
             
-            if selected_muestra:
-                muestra_id = muestra_options[selected_muestra]
-                muestra = get_muestra_by_id(session, muestra_id)
-                
-                if muestra:
-                    st.error(f"**¿Estás seguro de que deseas eliminar:** {muestra.nombre_muestra}?")
-                    st.write(f"**Investigador:** {muestra.investigador or 'N/A'}")
-                    st.write(f"**Fecha:** {muestra.fecha.strftime('%Y-%m-%d %H:%M') if muestra.fecha else 'N/A'}")
-                    
-                    # Confirmación de eliminación
-                    col1, col2, col3 = st.columns([1, 1, 3])
-                    with col1:
-                        if st.button("🗑️ Eliminar", type="primary", help="Esta acción no se puede deshacer"):
-                            if delete_muestra(session, muestra_id):
-                                st.success("✅ Muestra eliminada exitosamente!")
-                                st.rerun()
-                            else:
-                                st.error("❌ Error al eliminar la muestra.")
-                    with col2:
-                        st.button("❌ Cancelar", help="Cancelar eliminación")
+            # Confirmación de eliminación
+            confirmar = st.checkbox(f"Confirmo que deseo eliminar {cantidad} muestra(s)")
+            if st.button("🗑️ Eliminar", type="primary", disabled=not confirmar,
+                         help="Esta acción no se puede deshacer"):
+                eliminadas = delete_muestras(session, ids=ids, **objetivo)
+                st.success(f"✅ {eliminadas} muestra(s) eliminada(s)")
+                st.rerun()
         
         # Mostrar tabla actualizada
         st.markdown("---")
         st.subheader("📋 Estado Actual de Muestras")
-        show_mineral_database()
+        show_muestras_table(muestras)
         
     finally:
         session.close()
@@ -505,6 +617,9 @@ def main():
         st.header("📊 Base de Datos de Minerales")
         
         show_database_stats()
+        
+        with st.expander("📈 Estadísticas detalladas"):
+            show_statistics_panel()
         st.markdown("---")
         
         st.subheader("🗂️ Minerales en la Base de Datos")
@@ -4,103 +4,83 @@ Script para poblar la base de datos con todas las muestras EDS
 de la carpeta muestrasdatos/Muestras Tesis/
 """
 
-import glob
+import argparse
 import os
-from pathlib import Path
 
 from src.database.connection import SessionLocal
-from src.database.queries import (count_muestras, create_tables,
-                                  insert_espectro, insert_muestra)
-from src.parsers.docx_parser import extract_and_vectorize_spectrum
+from src.database.queries import count_muestras, create_tables
+from src.diagnostics import add_diagnostic_arguments, configure_from_args
+from src.ingestion.checkpoint import (DEFAULT_MEMORY_MB, DEFAULT_TIMEOUT_S, ERROR, OK, SIN_ESPECTRO,
+                                      TIMEOUT, get_quarantine, ingest_checkpointed)
+from src.ingestion.files import discover_files, extract_mineral_name
 
+MUESTRAS_PATH = "muestrasdatos/Muestras Tesis"
 
-def extract_mineral_name(filename):
-    """
-    Extrae el nombre del mineral del nombre del archivo.
-    Ejemplos:
-    - "EDS ALBITA_02.docx" -> "ALBITA"
-    - "Eds broncita_001.docx" -> "BRONCITA" 
-    - "EDS galena.docx" -> "GALENA"
-    """
-    # Quitar extensión
-    name = filename.replace('.docx', '')
-    
-    # Quitar prefijos comunes
-    name = name.replace('EDS ', '')
-    name = name.replace('Eds ', '')
-    name = name.replace('Element ', '')
-    
-    # Tomar la primera parte antes de _ o números
-    import re
-    name = re.split(r'[_\d]', name)[0]
-    
-    return name.strip().upper()
 
+def populate_database(timeout=DEFAULT_TIMEOUT_S, memory_mb=DEFAULT_MEMORY_MB, workers=1, retry_quarantine=False):
+    """
+    Procesa todos los archivos DOCX, de texto e imágenes de espectros y los agrega a la base de datos.
 
-def populate_database():
-    """Procesa todos los archivos DOCX y los agrega a la base de datos."""
+    Cada archivo se procesa en un proceso aparte con timeout y límite de memoria,
+    y su estado queda registrado: si el script se interrumpe, la siguiente
+    ejecución continúa donde quedó. Los archivos con error o timeout quedan en
+    cuarentena y se reintentan con --retry-quarantine.
+    """
     
     # Crear tablas si no existen
     create_tables()
     session = SessionLocal()
     
-    # Buscar todos los archivos DOCX en la carpeta de muestras
-    muestras_path = "muestrasdatos/Muestras Tesis/*.docx"
-    docx_files = glob.glob(muestras_path)
+    # Buscar todos los archivos de espectros en la carpeta de muestras
+    files = discover_files([MUESTRAS_PATH])
     
-    if not docx_files:
-        print(f"No se encontraron archivos DOCX en {muestras_path}")
+    if not files:
+        print(f"No se encontraron archivos en {MUESTRAS_PATH}")
+        session.close()
         return
     
-    print(f"Encontrados {len(docx_files)} archivos DOCX para procesar...")
-    
-    success_count = 0
-    error_count = 0
-    
-    for docx_file in docx_files:
-        filename = os.path.basename(docx_file)
-        mineral_name = extract_mineral_name(filename)
-        
-        print(f"\nProcesando: {filename}")
-        print(f"Mineral identificado: {mineral_name}")
-        
-        try:
-            # Extraer y vectorizar espectro
-            vector = extract_and_vectorize_spectrum(docx_file, vector_size=200)
-            
-            if vector is None:
-                print(f"❌ No se encontró espectro válido en {filename}")
-                error_count += 1
-                continue
-            
-            # Insertar muestra en la BD
-            nueva_muestra = insert_muestra(
-                session=session,
-                nombre_muestra=mineral_name,
-                investigador="Dataset Tesis",
-                ruta_imagen=docx_file
-            )
-            
-            # Insertar vector del espectro
-            insert_espectro(session, muestra_id=nueva_muestra.id, vector=vector)
-            
-            print(f"✅ Procesado exitosamente: ID={nueva_muestra.id}")
-            success_count += 1
-            
-        except Exception as e:
-            print(f"❌ Error procesando {filename}: {str(e)}")
-            error_count += 1
-            continue
+    print(f"Encontrados {len(files)} archivos para procesar...")
+
+    def log(line):
+        estado, path, *detalle = line.split("\t")
+        filename = os.path.basename(path)
+        if estado == OK:
+            print(f"✅ Procesado exitosamente: {filename} ({extract_mineral_name(filename)})")
+        elif estado == SIN_ESPECTRO:
+            print(f"❌ No se encontró espectro válido en {filename}")
+        else:
+            print(f"❌ {'Timeout' if estado == TIMEOUT else 'Error'} procesando {filename}: {' '.join(detalle)}")
+
+    resumen = ingest_checkpointed(session, files, investigador="Dataset Tesis", workers=workers,
+                                  timeout=timeout, memory_mb=memory_mb,
+                                  retry_quarantine=retry_quarantine, log=log)
     
     # Estadísticas finales
     total_muestras = count_muestras(session)
+    cuarentena = get_quarantine(session)
     print(f"\n=== RESUMEN ===")
-    print(f"Archivos procesados exitosamente: {success_count}")
-    print(f"Archivos con errores: {error_count}")
+    print(f"Archivos procesados exitosamente: {len(resumen[OK])}")
+    print(f"Archivos sin espectro: {len(resumen[SIN_ESPECTRO])}")
+    print(f"Archivos con errores: {len(resumen[ERROR])} | timeouts: {len(resumen[TIMEOUT])}")
+    print(f"Archivos ya procesados en ejecuciones anteriores: {resumen['omitidos']}")
+    print(f"Archivos en cuarentena: {len(cuarentena)}")
     print(f"Total de muestras en la base de datos: {total_muestras}")
     
     session.close()
 
 
 if __name__ == "__main__":
-    populate_database() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Pobla la base de datos con las muestras EDS")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT_S, help="Segundos máximos por archivo")
+    parser.add_argument("--memory-mb", type=int, default=DEFAULT_MEMORY_MB,
+                        help="Memoria máxima adicional por archivo (MB)")
+    parser.add_argument("--workers", type=int, default=1, help="Archivos procesados en paralelo")
+    parser.add_argument("--retry-quarantine", action="store_true",
+                        help="Reintentar los archivos en cuarentena (error o timeout)")
+    add_diagnostic_arguments(parser)
+    args = parser.parse_args()
+    # Con --profile cada archivo deja su perfil en profiles/ (ver src/profiling.py);
+    # --memory-report y --memory-budget-mb, ver src/memory.py
+    configure_from_args(args)
+    populate_database(timeout=args.timeout, memory_mb=args.memory_mb, workers=args.workers,
+                      retry_quarantine=args.retry_quarantine)
@@ -0,0 +1,124 @@
+# src/analysis/cache.py
+"""
+Caché de resultados de identificación.
+
+La clave combina el hash del vector de consulta (bytes float32), el modo de
+puntuación, top_k, el umbral, la versión del pipeline y la versión de la
+biblioteca (contador de la BD que cambia con cada inserción, actualización o
+eliminación). Tras un cambio en la biblioteca las entradas viejas ya no
+coinciden con ninguna consulta y el LRU las descarta.
+
+La memoria se acota por número de entradas y por el total de resultados
+guardados (una búsqueda sin top_k retorna toda la biblioteca).
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_MAX_RESULTADOS = 200_000
+
+# Modos de puntuación
+MODO_COSENO = "coseno"
+
+
+def score_mode(ventana=None, representacion=None):
+    """
+    Modo de puntuación de una consulta: coseno completo o restringido a una
+    ventana de bins, contra la biblioteca de una representación (por defecto
+    perfil_imagen).
+    """
+    from src.analysis.library import parse_window
+    from src.analysis.pipeline import PERFIL_IMAGEN
+
+    modo = MODO_COSENO
+    if representacion not in (None, PERFIL_IMAGEN):
+        modo += f"@{representacion}"
+    ventana = parse_window(ventana)
+    if ventana is not None:
+        modo += f":bins{ventana[0]}-{ventana[1]}"
+    return modo
+
+
+def vector_digest(vector):
+    """Hash del vector de consulta en float32 (independiente de lista/array y dtype)."""
+    return hashlib.sha1(np.ascontiguousarray(vector, dtype=np.float32).tobytes()).hexdigest()
+
+
+def result_key(vector, library_version, pipeline_version=None, top_k=None, similitud_umbral=0.0,
+               modo=MODO_COSENO, origen=None):
+    """
+    Clave de caché de una identificación. origen distingue bibliotecas
+    distintas que comparten caché en el mismo proceso (p. ej. la URL de la BD).
+    """
+    return (vector_digest(vector), modo, top_k, float(similitud_umbral), pipeline_version,
+            library_version, origen)
+
+
+class ResultCache:
+    """Caché LRU de resultados, segura entre hilos, con contadores de aciertos y fallos."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_resultados=DEFAULT_MAX_RESULTADOS):
+        self.max_entries = max_entries
+        self.max_resultados = max_resultados
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._resultados = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Retorna una copia de los resultados guardados o None."""
+        with self._lock:
+            resultados = self._entries.get(key)
+            if resultados is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(resultados)
+
+    def put(self, key, resultados):
+        resultados = tuple(tuple(r) for r in resultados)
+        if len(resultados) > self.max_resultados:
+            return
+        with self._lock:
+            anterior = self._entries.pop(key, None)
+            if anterior is not None:
+                self._resultados -= len(anterior)
+            self._entries[key] = resultados
+            self._resultados += len(resultados)
+            while len(self._entries) > self.max_entries or self._resultados > self.max_resultados:
+                _, descartado = self._entries.popitem(last=False)
+                self._resultados -= len(descartado)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._resultados = 0
+
+    def stats(self):
+        with self._lock:
+            consultas = self.hits + self.misses
+            return {
+                "entradas": len(self._entries),
+                "max_entradas": self.max_entries,
+                "resultados": self._resultados,
+                "aciertos": self.hits,
+                "fallos": self.misses,
+                "tasa_aciertos": round(self.hits / consultas, 4) if consultas else None,
+            }
+
+
+# Caché compartida del proceso (compare_vector y trabajos en segundo plano)
+_result_cache = ResultCache()
+
+
+def get_result_cache():
+    return _result_cache
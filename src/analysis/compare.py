@@ -2,6 +2,8 @@
 import numpy as np
 from sqlalchemy.orm import Session
 
+from src.analysis.library import cached_library
+from src.analysis.pipeline import PERFIL_IMAGEN
 from src.database.models import EspectroVectorizado, Muestra
 
 
@@ -21,15 +23,24 @@ def compare_spectrum(session: Session, muestra_id: int, similitud_umbral=0.5):
     Compara la muestra (muestra_id) contra todas las demás en la BD.
     Retorna una lista de (muestra_id, nombre_muestra, similitud) en orden descendente.
     """
-    # 1. Obtener el vector de la muestra base
-    base_espectro = session.query(EspectroVectorizado).filter_by(muestra_id=muestra_id).first()
+    from src.database.queries import get_active_pipeline_version
+
+    # 1. Obtener el vector de la muestra base (versión activa del pipeline)
+    pipeline_version = get_active_pipeline_version(session)
+    base_espectro = (session.query(EspectroVectorizado)
+                     .filter_by(muestra_id=muestra_id, pipeline_version=pipeline_version)
+                     .first())
     if not base_espectro:
         raise ValueError(f"La muestra con id={muestra_id} no tiene espectro almacenado.")
 
     base_vector = base_espectro.vector
 
-    # 2. Cargar todas las otras muestras con sus vectores
-    otras = session.query(EspectroVectorizado).filter(EspectroVectorizado.muestra_id != muestra_id).all()
+    # 2. Cargar todas las otras muestras con sus vectores de la misma versión y representación
+    otras = (session.query(EspectroVectorizado)
+             .filter(EspectroVectorizado.muestra_id != muestra_id,
+                     EspectroVectorizado.pipeline_version == pipeline_version,
+                     EspectroVectorizado.representacion == base_espectro.representacion)
+             .all())
 
     resultados = []
     for o in otras:
@@ -45,3 +56,32 @@ def compare_spectrum(session: Session, muestra_id: int, similitud_umbral=0.5):
     resultados_filtrados = [r for r in resultados if r[2] >= similitud_umbral]
 
     return resultados_filtrados
+
+
+def compare_vector(session: Session, vector, similitud_umbral=0.5, top_k=None, cache=None, ventana=None,
+                   representacion=PERFIL_IMAGEN):
+    """
+    Compara un vector (que no necesita estar guardado en la BD) contra todas las muestras
+    de su misma representación, opcionalmente solo dentro de una ventana de bins (ver parse_window).
+    Retorna una lista de (muestra_id, nombre_muestra, similitud) en orden descendente.
+    Las consultas repetidas se responden desde la caché de resultados y las
+    nuevas usan la biblioteca en memoria del proceso (cached_library) mientras
+    la BD no cambie.
+    """
+    from src.analysis.cache import get_result_cache, result_key, score_mode
+    from src.database.queries import get_active_pipeline_version, get_library_version
+
+    cache = cache if cache is not None else get_result_cache()
+    origen = str(session.get_bind().url)
+    modo = score_mode(ventana, representacion)
+    key = result_key(vector, get_library_version(session), get_active_pipeline_version(session),
+                     top_k, similitud_umbral, modo=modo, origen=origen)
+    resultados = cache.get(key)
+    if resultados is not None:
+        return resultados
+
+    library = cached_library(session, representacion=representacion)
+    resultados = library.search(vector, top_k=top_k, similitud_umbral=similitud_umbral, ventana=ventana)[0]
+    cache.put(result_key(vector, library.library_version, library.pipeline_version, top_k, similitud_umbral,
+                         modo=modo, origen=origen), resultados)
+    return resultados
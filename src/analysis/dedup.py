@@ -0,0 +1,137 @@
+# src/analysis/dedup.py
+"""
+Detección de espectros duplicados o casi idénticos en la biblioteca.
+
+Los pares con similitud >= umbral se buscan con productos de matrices por
+bloques (block_size x block_size), recorriendo solo el triángulo superior,
+de modo que nunca se materializa la matriz N x N completa. Para bibliotecas
+muy grandes se pueden generar candidatos con LSH de hiperplanos aleatorios y
+verificar solo esos pares. Los pares se agrupan en clusters con union-find.
+"""
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from src.analysis.library import SpectrumLibrary
+
+DEFAULT_UMBRAL = 0.995
+BLOCK_SIZE = 2048
+
+
+def find_duplicate_pairs(matrix, umbral=DEFAULT_UMBRAL, block_size=BLOCK_SIZE):
+    """
+    Retorna los pares (i, j, similitud) con i < j y similitud >= umbral.
+    matrix debe tener filas normalizadas (como SpectrumLibrary.matrix).
+    """
+    n = matrix.shape[0]
+    pares = []
+    for fila in range(0, n, block_size):
+        bloque = matrix[fila:fila + block_size]
+        for col in range(fila, n, block_size):
+            sims = bloque @ matrix[col:col + block_size].T
+            ii, jj = np.nonzero(sims >= umbral)
+            i, j = ii + fila, jj + col
+            arriba = i < j
+            pares.extend(zip(i[arriba].tolist(), j[arriba].tolist(), sims[ii[arriba], jj[arriba]].tolist()))
+    return pares
+
+
+def find_duplicate_pairs_lsh(matrix, umbral=DEFAULT_UMBRAL, n_bits=16, n_tables=4, seed=0,
+                             max_bucket=BLOCK_SIZE):
+    """
+    Variante aproximada: agrupa las filas por la firma de signos contra
+    n_bits hiperplanos aleatorios (n_tables tablas independientes) y solo
+    compara las filas que caen en el mismo bucket. Puede omitir pares reales
+    con muy baja probabilidad para umbrales altos; los pares retornados son
+    exactos (similitud verificada).
+    """
+    n, dim = matrix.shape
+    rng = np.random.default_rng(seed)
+    pesos = 1 << np.arange(n_bits, dtype=np.int64)
+    encontrados = {}
+    for _ in range(n_tables):
+        planos = rng.standard_normal((dim, n_bits)).astype(np.float32)
+        codigos = ((matrix @ planos) > 0).astype(np.int64) @ pesos
+        orden = np.argsort(codigos, kind="stable")
+        limites = np.flatnonzero(np.diff(codigos[orden])) + 1
+        for bucket in np.split(orden, limites):
+            if bucket.size < 2:
+                continue
+            # Los buckets enormes se verifican por bloques igual que el método exacto
+            for a, b, sim in find_duplicate_pairs(matrix[bucket], umbral, block_size=max_bucket):
+                i, j = sorted((int(bucket[a]), int(bucket[b])))
+                encontrados[(i, j)] = sim
+    return [(i, j, sim) for (i, j), sim in sorted(encontrados.items())]
+
+
+def cluster_pairs(n, pares):
+    """Agrupa los índices conectados por pares (union-find). Retorna clusters de tamaño >= 2."""
+    padre = list(range(n))
+
+    def raiz(x):
+        while padre[x] != x:
+            padre[x] = padre[padre[x]]
+            x = padre[x]
+        return x
+
+    for i, j, _ in pares:
+        ri, rj = raiz(i), raiz(j)
+        if ri != rj:
+            padre[max(ri, rj)] = min(ri, rj)
+
+    grupos = {}
+    for i, j, _ in pares:
+        for x in (i, j):
+            grupos.setdefault(raiz(x), set()).add(x)
+    return [sorted(miembros) for _, miembros in sorted(grupos.items())]
+
+
+def find_duplicates(session: Session, umbral=DEFAULT_UMBRAL, block_size=BLOCK_SIZE, lsh=False,
+                    n_bits=16, n_tables=4):
+    """
+    Busca clusters de duplicados en la versión activa de la biblioteca.
+    Retorna una lista de diccionarios con los ids, nombres y la similitud
+    mínima entre los pares que unen el cluster.
+    """
+    library = SpectrumLibrary.from_session(session)
+    if len(library) < 2:
+        return []
+    if lsh:
+        pares = find_duplicate_pairs_lsh(library.matrix, umbral, n_bits=n_bits, n_tables=n_tables,
+                                         max_bucket=block_size)
+    else:
+        pares = find_duplicate_pairs(library.matrix, umbral, block_size=block_size)
+
+    clusters = cluster_pairs(len(library), pares)
+    cluster_de = {x: c for c, miembros in enumerate(clusters) for x in miembros}
+    similitud_min = [1.0] * len(clusters)
+    for i, _, sim in pares:
+        similitud_min[cluster_de[i]] = min(similitud_min[cluster_de[i]], sim)
+
+    resultado = []
+    for c, miembros in enumerate(clusters):
+        # Se conserva la muestra más antigua (id menor) del cluster
+        miembros = sorted(miembros, key=lambda x: library.ids[x])
+        nombres = [library.nombres[x] for x in miembros]
+        resultado.append({
+            "ids": [int(library.ids[x]) for x in miembros],
+            "nombres": nombres,
+            "mezclado": len(set(nombres)) > 1,
+            "similitud_min": float(similitud_min[c]),
+        })
+    return resultado
+
+
+def remove_duplicates(session: Session, clusters, incluir_mezclados=False):
+    """
+    Elimina en una sola transacción todas las muestras de cada cluster excepto
+    la primera (la más antigua). Los clusters con nombres distintos se omiten
+    salvo que incluir_mezclados sea True. Retorna los ids eliminados.
+    """
+    from src.database.queries import delete_muestras
+
+    eliminados = [muestra_id for cluster in clusters if incluir_mezclados or not cluster["mezclado"]
+                  for muestra_id in cluster["ids"][1:]]
+    if eliminados:
+        delete_muestras(session, ids=eliminados)
+    return eliminados
@@ -0,0 +1,73 @@
+# src/analysis/evaluate.py
+"""
+Evaluación leave-one-out de la biblioteca.
+
+Cada muestra se identifica contra todas las demás usando la matriz de Gram
+(similitudes de coseno N x N) calculada por bloques de filas, de modo que la
+memoria queda acotada a block_size x N. La diagonal (la propia muestra) se
+enmascara. Solo se evalúan las muestras cuya etiqueta aparece al menos dos
+veces: las demás no tienen con quién acertar.
+"""
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from src.analysis.library import SpectrumLibrary, _normalize_rows
+
+BLOCK_SIZE = 1024
+
+
+def leave_one_out(vectors, labels, top_k=5, block_size=BLOCK_SIZE):
+    """
+    Retorna un diccionario con la precisión top-1 y top-k, la precisión por
+    etiqueta y la matriz de confusión (filas: etiqueta real, columnas: predicha).
+    """
+    vectors = _normalize_rows(np.asarray(vectors, dtype=np.float32))
+    etiquetas, codes, counts = np.unique(np.asarray(labels), return_inverse=True, return_counts=True)
+    n = len(codes)
+    evaluables = counts[codes] >= 2
+    resultado = {
+        "muestras": n,
+        "etiquetas": etiquetas.tolist(),
+        "evaluables": int(evaluables.sum()),
+        "top_k": top_k,
+        "precision_top1": None,
+        f"precision_top{top_k}": None,
+        "por_etiqueta": {},
+        "confusion": np.zeros((len(etiquetas), len(etiquetas)), dtype=np.int64),
+    }
+    if n < 2 or not evaluables.any():
+        return resultado
+
+    k = min(top_k, n - 1)
+    pred = np.empty(n, dtype=np.int64)
+    acierto_k = np.empty(n, dtype=bool)
+    for inicio in range(0, n, block_size):
+        fin = min(inicio + block_size, n)
+        sims = vectors[inicio:fin] @ vectors.T
+        filas = np.arange(fin - inicio)
+        sims[filas, inicio + filas] = -np.inf
+        vecinos = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        pred[inicio:fin] = codes[np.argmax(sims, axis=1)]
+        acierto_k[inicio:fin] = (codes[vecinos] == codes[inicio:fin, None]).any(axis=1)
+
+    acierto_1 = pred == codes
+    resultado["precision_top1"] = float(acierto_1[evaluables].mean())
+    resultado[f"precision_top{top_k}"] = float(acierto_k[evaluables].mean())
+    np.add.at(resultado["confusion"], (codes[evaluables], pred[evaluables]), 1)
+    for code in np.unique(codes[evaluables]):
+        de_etiqueta = codes == code
+        resultado["por_etiqueta"][str(etiquetas[code])] = {
+            "muestras": int(de_etiqueta.sum()),
+            "precision_top1": float(acierto_1[de_etiqueta].mean()),
+            f"precision_top{top_k}": float(acierto_k[de_etiqueta].mean()),
+        }
+    return resultado
+
+
+def evaluate_library(session: Session, top_k=5, block_size=BLOCK_SIZE, pipeline_version=None):
+    """Evalúa los vectores de la BD (por defecto los de la versión activa del pipeline)."""
+    library = SpectrumLibrary.from_session(session, pipeline_version=pipeline_version)
+    resultado = leave_one_out(library.matrix, library.nombres, top_k=top_k, block_size=block_size)
+    resultado["pipeline_version"] = library.pipeline_version
+    return resultado
@@ -0,0 +1,246 @@
+# src/analysis/library.py
+import json
+import re
+import threading
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from src.analysis.pipeline import PERFIL_IMAGEN, normalize_params
+from src.database.models import EspectroVectorizado, Muestra, PipelineVersion
+from src.database.queries import get_active_pipeline, get_library_version
+from src.memory import stage
+from src.parsers.spectrum_text_parser import ENERGY_RANGE_KEV
+
+
+# "inicio,fin", "inicio:fin" o "inicio-fin"; el signo se acepta solo para rechazarlo con un mensaje claro
+_VENTANA_RE = re.compile(r"\s*(-?\d+(?:\.\d*)?)\s*[,:-]\s*(-?\d+(?:\.\d*)?)\s*")
+
+
+def parse_window(ventana, dimension=None):
+    """
+    Ventana del vector como rango de bins [inicio, fin) a partir de una
+    tupla/lista o de un texto "inicio,fin". None o vacío: vector completo.
+
+    La ventana se expresa en índices de bin (0..dimensión del vector) porque
+    el eje de los perfiles de imagen no está calibrado en energía; solo en la
+    representación conteos_energia el bin i cubre una energía conocida (ver
+    bin_energy_kev). Con dimension se verifica que la ventana quepa en el vector.
+    """
+    if ventana is None or ventana == "":
+        return None
+    try:
+        if isinstance(ventana, str):
+            partes = _VENTANA_RE.fullmatch(ventana).groups()
+        else:
+            partes = ventana
+        inicio, fin = (float(x) for x in partes)
+    except (AttributeError, TypeError, ValueError):
+        raise ValueError(f"Ventana inválida: {ventana!r} (se espera inicio,fin en bins del vector).")
+    if inicio < 0 or fin < 0:
+        raise ValueError(f"La ventana {inicio:g},{fin:g} tiene bins negativos.")
+    if not (inicio.is_integer() and fin.is_integer()):
+        raise ValueError(f"La ventana {inicio:g},{fin:g} debe indicar bins enteros.")
+    inicio, fin = int(inicio), int(fin)
+    if not inicio < fin:
+        raise ValueError(f"Ventana vacía: bins {inicio}-{fin}.")
+    if dimension is not None and fin > dimension:
+        raise ValueError(f"La ventana {inicio},{fin} queda fuera del vector (bins 0-{dimension}).")
+    return inicio, fin
+
+
+def bin_energy_kev(ventana, dimension):
+    """
+    Rango de energía (keV) que cubre una ventana de bins en la representación
+    conteos_energia (cada bin mide 1/dimension de ENERGY_RANGE_KEV).
+    """
+    inicio, fin = parse_window(ventana, dimension)
+    origen, final = ENERGY_RANGE_KEV
+    ancho = (final - origen) / dimension
+    return origen + inicio * ancho, origen + fin * ancho
+
+
+def _normalize_rows(matrix):
+    """Normaliza cada fila con norma L2 (las filas nulas quedan en cero)."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class SpectrumLibrary:
+    """
+    Biblioteca de espectros en memoria.
+
+    Mantiene los vectores de la BD como una matriz (N, D) de filas normalizadas,
+    de modo que comparar M consultas contra toda la biblioteca es un solo
+    producto de matrices (M, D) x (D, N) en lugar de N llamadas a calcular_similitud.
+    """
+
+    def __init__(self, ids, nombres, matrix, pipeline_version=None, params=None, library_version=None,
+                 representacion=PERFIL_IMAGEN):
+        self.pipeline_version = pipeline_version
+        # Representación de los vectores cargados: las consultas deben ser de la misma
+        self.representacion = representacion
+        # Versión de la biblioteca (contador de la BD) al momento de cargarla
+        self.library_version = library_version
+        # Parámetros de vectorización con los que deben generarse las consultas
+        self.params = params
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.nombres = list(nombres)
+        matrix = np.asarray(matrix, dtype=np.float32)
+        if matrix.ndim != 2:
+            matrix = matrix.reshape(len(self.ids), -1)
+        self.matrix = _normalize_rows(matrix)
+        # Sumas acumuladas de cuadrados por fila (N, D) en float32, calculadas en
+        # la primera búsqueda con ventana: la norma de cualquier ventana sale en O(1)
+        self._sq_prefix = None
+
+    @classmethod
+    def from_session(cls, session: Session, exclude_ids=None, pipeline_version=None,
+                     representacion=PERFIL_IMAGEN):
+        """
+        Carga los espectros de la BD (solo columnas, sin objetos ORM).
+        Solo se cargan los de una versión del pipeline (por defecto la activa)
+        y una representación, de modo que nunca se mezclan vectores de
+        versiones o ejes distintos.
+        """
+        if pipeline_version is None:
+            version = get_active_pipeline(session)
+        else:
+            version = session.get(PipelineVersion, pipeline_version)
+        pipeline_version = version.id if version is not None else pipeline_version
+        params = version.params if version is not None else normalize_params()
+        library_version = get_library_version(session)
+
+        query = session.query(
+            EspectroVectorizado.muestra_id,
+            Muestra.nombre_muestra,
+            EspectroVectorizado.vector_json,
+        ).join(Muestra, Muestra.id == EspectroVectorizado.muestra_id).filter(
+            EspectroVectorizado.pipeline_version == pipeline_version,
+            EspectroVectorizado.representacion == representacion,
+        )
+        if exclude_ids:
+            query = query.filter(EspectroVectorizado.muestra_id.notin_(list(exclude_ids)))
+
+        ids, nombres, vectores = [], [], []
+        for muestra_id, nombre, vector_json in query:
+            ids.append(muestra_id)
+            nombres.append(nombre)
+            vectores.append(json.loads(vector_json))
+
+        if not vectores:
+            return cls([], [], np.zeros((0, 0), dtype=np.float32), pipeline_version, params, library_version,
+                       representacion)
+        return cls(ids, nombres, np.asarray(vectores, dtype=np.float32), pipeline_version, params,
+                   library_version, representacion)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def dimension(self):
+        return self.matrix.shape[1] if len(self) else None
+
+    def similarity_matrix(self, queries):
+        """
+        Retorna la matriz (M, N) de similitudes de coseno entre las consultas
+        (M, D) y la biblioteca. Las consultas con norma cero dan similitud 0.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if not len(self):
+            return np.zeros((queries.shape[0], 0), dtype=np.float32)
+        if queries.shape[1] != self.dimension:
+            raise ValueError(
+                f"El vector tiene {queries.shape[1]} dimensiones y la biblioteca {self.dimension}."
+            )
+        return _normalize_rows(queries) @ self.matrix.T
+
+    def _window_norms(self, a, b):
+        prefix = self._sq_prefix
+        if prefix is None:
+            # Ocupa lo mismo que la matriz; se acumula en float64 por bloques de
+            # filas para no perder precisión sin duplicar la memoria
+            prefix = np.empty_like(self.matrix)
+            for inicio in range(0, len(self), 4096):
+                bloque = self.matrix[inicio:inicio + 4096]
+                prefix[inicio:inicio + 4096] = np.cumsum(np.square(bloque, dtype=np.float64), axis=1)
+            self._sq_prefix = prefix
+        cuadrados = prefix[:, b - 1] - prefix[:, a - 1] if a > 0 else prefix[:, b - 1].copy()
+        # Las filas normalizadas suman 1: en float32 la resta pierde precisión
+        # cuando la ventana tiene poca energía (suele ser angosta), y esas filas
+        # se calculan directo
+        imprecisas = np.flatnonzero(cuadrados < 1e-2)
+        if imprecisas.size:
+            sub = self.matrix[imprecisas, a:b]
+            cuadrados[imprecisas] = np.einsum("ij,ij->i", sub, sub)
+        return np.sqrt(np.maximum(cuadrados, 0.0))
+
+    def window_similarity_matrix(self, queries, ventana):
+        """
+        Similitud de coseno restringida a una ventana de bins [inicio, fin):
+        solo cuentan los bins de la ventana, sin re-vectorizar. Los productos punto
+        son un único producto de matrices sobre las columnas de la ventana y
+        las normas de la biblioteca salen de las sumas acumuladas de cuadrados.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if not len(self):
+            return np.zeros((queries.shape[0], 0), dtype=np.float32)
+        if queries.shape[1] != self.dimension:
+            raise ValueError(
+                f"El vector tiene {queries.shape[1]} dimensiones y la biblioteca {self.dimension}."
+            )
+        a, b = parse_window(ventana, self.dimension)
+        sims = _normalize_rows(queries[:, a:b]) @ self.matrix[:, a:b].T
+        norms = self._window_norms(a, b)
+        # Muestras sin señal en la ventana: similitud 0
+        norms[norms == 0] = np.inf
+        return sims / norms
+
+    def top_matches(self, sims, top_k=None, similitud_umbral=0.0):
+        """
+        Convierte una fila de similitudes en una lista de
+        (muestra_id, nombre_muestra, similitud) en orden descendente.
+        """
+        if top_k is not None and top_k < sims.size:
+            candidatos = np.argpartition(-sims, top_k)[:top_k]
+        else:
+            candidatos = np.arange(sims.size)
+        candidatos = candidatos[sims[candidatos] >= similitud_umbral]
+        candidatos = candidatos[np.argsort(-sims[candidatos], kind="stable")]
+        return [(int(self.ids[i]), self.nombres[i], float(sims[i])) for i in candidatos]
+
+    def search(self, queries, top_k=None, similitud_umbral=0.0, ventana=None):
+        """
+        Compara una o varias consultas contra la biblioteca, opcionalmente solo
+        dentro de una ventana de bins (ver parse_window).
+        Retorna una lista de resultados (uno por consulta) con el formato de compare_spectrum.
+        """
+        with stage("busqueda"):
+            if parse_window(ventana) is None:
+                sims = self.similarity_matrix(queries)
+            else:
+                sims = self.window_similarity_matrix(queries, ventana)
+            return [self.top_matches(fila, top_k=top_k, similitud_umbral=similitud_umbral) for fila in sims]
+
+
+# Bibliotecas cargadas por este proceso (app, CLI, trabajos): (BD, representación) -> SpectrumLibrary
+_libraries = {}
+_libraries_lock = threading.Lock()
+
+
+def cached_library(session: Session, representacion=PERFIL_IMAGEN):
+    """
+    SpectrumLibrary de la versión activa compartida por el proceso. Se recarga
+    solo cuando cambia get_library_version (cualquier escritura o activación),
+    así que las consultas repetidas (p. ej. al mover la ventana) no releen la BD.
+    """
+    clave = (str(session.get_bind().url), representacion)
+    version = get_library_version(session)
+    with _libraries_lock:
+        library = _libraries.get(clave)
+    if library is None or library.library_version != version:
+        library = SpectrumLibrary.from_session(session, representacion=representacion)
+        with _libraries_lock:
+            _libraries[clave] = library
+    return library
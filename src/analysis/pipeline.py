@@ -0,0 +1,73 @@
+# src/analysis/pipeline.py
+"""
+Versiones del pipeline de vectorización.
+
+Cada vector guardado en la BD se etiqueta con la versión del pipeline que lo
+generó. El identificador de versión se deriva de los parámetros de
+vectorize_spectrum (vector_size, threshold, row_bounds, method), de modo que
+los mismos parámetros producen siempre la misma versión.
+"""
+
+import hashlib
+import json
+
+# Parámetros con los que se generaron los vectores existentes
+DEFAULT_PARAMS = {
+    "vector_size": 200,
+    "threshold": 0.99,
+    "row_bounds": (150, 250),
+    "method": "mean",
+}
+
+PIPELINE_PARAM_NAMES = tuple(DEFAULT_PARAMS)
+
+# Representación de cada vector guardado. Los ejes no son comparables entre
+# sí, así que las búsquedas solo comparan vectores de la misma representación:
+#   perfil_imagen    perfil de columnas de la máscara de la imagen (DOCX, TIFF,
+#                    JPEG); eje en píxeles recortado a la señal, sin calibrar.
+#   conteos_energia  conteos de EMSA/MSA o CSV re-muestreados en ENERGY_RANGE_KEV.
+#   serie_grafico    serie de un gráfico nativo de Word re-muestreada sobre su
+#                    propio eje x.
+PERFIL_IMAGEN = "perfil_imagen"
+CONTEOS_ENERGIA = "conteos_energia"
+SERIE_GRAFICO = "serie_grafico"
+REPRESENTACIONES = (PERFIL_IMAGEN, CONTEOS_ENERGIA, SERIE_GRAFICO)
+
+
+def normalize_params(params=None, **overrides):
+    """
+    Completa los parámetros con los valores por defecto y los deja en forma
+    canónica (row_bounds como tupla de enteros).
+    """
+    merged = dict(DEFAULT_PARAMS)
+    merged.update(params or {})
+    merged.update({k: v for k, v in overrides.items() if v is not None})
+    unknown = set(merged) - set(PIPELINE_PARAM_NAMES)
+    if unknown:
+        raise ValueError(f"Parámetros de pipeline desconocidos: {', '.join(sorted(unknown))}")
+    if merged["method"] not in ("mean", "max"):
+        raise ValueError(f"Método de firma no soportado: {merged['method']}")
+    merged["vector_size"] = int(merged["vector_size"])
+    merged["threshold"] = float(merged["threshold"])
+    if merged["row_bounds"] is not None:
+        merged["row_bounds"] = tuple(int(b) for b in merged["row_bounds"])
+    return merged
+
+
+def params_to_json(params):
+    """Serializa los parámetros de forma determinista."""
+    params = normalize_params(params)
+    serializable = dict(params, row_bounds=list(params["row_bounds"]) if params["row_bounds"] else None)
+    return json.dumps(serializable, sort_keys=True, separators=(",", ":"))
+
+
+def params_from_json(params_json):
+    return normalize_params(json.loads(params_json))
+
+
+def pipeline_version_id(params=None):
+    """Identificador estable de la versión del pipeline, p. ej. 'v-3f2a9c1b0d'."""
+    return "v-" + hashlib.sha1(params_to_json(params).encode("utf-8")).hexdigest()[:10]
+
+
+DEFAULT_PIPELINE_VERSION = pipeline_version_id(DEFAULT_PARAMS)
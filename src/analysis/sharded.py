@@ -0,0 +1,179 @@
+# src/analysis/sharded.py
+"""
+Búsqueda scatter-gather sobre una biblioteca particionada en shards.
+
+Cada shard tiene un proceso propio que mantiene su SpectrumLibrary en memoria;
+el coordinador envía el lote de consultas a todos los shards en paralelo y
+mezcla sus listas top-k (ya ordenadas) en una sola. Antes de cada búsqueda se
+relee el registro si el archivo cambió, así que los shards agregados con
+`python -m src shards add` entran en servicio sin reiniciar.
+
+Los ids de muestra solo son únicos dentro de su shard: los resultados son
+(muestra_id, nombre_muestra, similitud, shard).
+"""
+
+import heapq
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from src.analysis.library import SpectrumLibrary
+from src.analysis.pipeline import PERFIL_IMAGEN, normalize_params
+from src.profiling import reset_inherited_profiler
+
+# Biblioteca del shard, cargada en el proceso que lo atiende
+_libraries = {}
+
+
+def _load_shard(url):
+    from src.database.shards import shard_session
+
+    session = shard_session(url)
+    try:
+        library = _libraries[url] = SpectrumLibrary.from_session(session)
+    finally:
+        session.close()
+    return library
+
+
+def _shard_info(url, reload=False):
+    library = _libraries.get(url)
+    if library is None or reload:
+        library = _load_shard(url)
+    return {"muestras": len(library), "dimension": library.dimension,
+            "pipeline_version": library.pipeline_version, "params": library.params,
+            "library_version": library.library_version}
+
+
+def _shard_search(url, queries, top_k, similitud_umbral, ventana=None):
+    library = _libraries.get(url)
+    if library is None:
+        library = _load_shard(url)
+    if not len(library):
+        return [[] for _ in range(len(queries))]
+    return library.search(queries, top_k=top_k, similitud_umbral=similitud_umbral, ventana=ventana)
+
+
+class ShardedSearch:
+    """
+    Coordinador de búsqueda con la misma interfaz de consulta que
+    SpectrumLibrary (search, params, dimension, pipeline_version, len).
+    """
+
+    # Los shards cargan solo los perfiles de imagen (representación por defecto)
+    representacion = PERFIL_IMAGEN
+
+    def __init__(self, registry_path=None):
+        from src.database.shards import get_registry_path
+
+        self.registry_path = get_registry_path(registry_path)
+        self._shards = {}  # nombre -> (url, executor)
+        self._info = {}  # nombre -> resumen del shard
+        self._mtime = None
+        self.refresh()
+
+    def refresh(self, force=False):
+        """Relee el registro si cambió: inicia los shards nuevos y cierra los retirados."""
+        from src.database.shards import load_registry
+
+        try:
+            mtime = os.stat(self.registry_path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime == self._mtime and not force:
+            return False
+
+        registry = load_registry(self.registry_path)
+        actuales = {s["nombre"]: s["url"] for s in registry["shards"]}
+        for nombre in list(self._shards):
+            url, executor = self._shards[nombre]
+            if actuales.get(nombre) != url:
+                executor.shutdown(wait=False, cancel_futures=True)
+                del self._shards[nombre]
+                self._info.pop(nombre, None)
+
+        nuevos = {}
+        for nombre, url in actuales.items():
+            if nombre not in self._shards:
+                # El shard puede iniciarse dentro de una petición perfilada (fork)
+                executor = ProcessPoolExecutor(max_workers=1, initializer=reset_inherited_profiler)
+                self._shards[nombre] = (url, executor)
+                nuevos[nombre] = self._shards[nombre][1].submit(_shard_info, url)
+        for nombre, future in nuevos.items():
+            self._info[nombre] = future.result()
+        self._mtime = mtime
+        self._check_versions()
+        return True
+
+    def reload(self):
+        """Recarga la biblioteca de cada shard desde su BD. Retorna self."""
+        self.refresh()
+        futures = {nombre: executor.submit(_shard_info, url, True)
+                   for nombre, (url, executor) in self._shards.items()}
+        self._info = {nombre: future.result() for nombre, future in futures.items()}
+        self._check_versions()
+        return self
+
+    def _check_versions(self):
+        versiones = {info["pipeline_version"] for info in self._info.values() if info["muestras"]}
+        if len(versiones) > 1:
+            raise ValueError(f"Los shards tienen versiones del pipeline distintas: {', '.join(sorted(versiones))}.")
+
+    def _con_datos(self):
+        return [info for info in self._info.values() if info["muestras"]]
+
+    def __len__(self):
+        return sum(info["muestras"] for info in self._info.values())
+
+    @property
+    def shards(self):
+        return {nombre: dict(info) for nombre, info in self._info.items()}
+
+    @property
+    def pipeline_version(self):
+        con_datos = self._con_datos()
+        return con_datos[0]["pipeline_version"] if con_datos else None
+
+    @property
+    def params(self):
+        con_datos = self._con_datos()
+        return con_datos[0]["params"] if con_datos else normalize_params()
+
+    @property
+    def library_version(self):
+        """Versiones de las bibliotecas cargadas en cada shard (para claves de caché)."""
+        return tuple(sorted((nombre, info["library_version"]) for nombre, info in self._info.items()))
+
+    @property
+    def dimension(self):
+        con_datos = self._con_datos()
+        return con_datos[0]["dimension"] if con_datos else None
+
+    def search(self, queries, top_k=None, similitud_umbral=0.0, ventana=None):
+        """
+        Compara una o varias consultas contra todos los shards en paralelo
+        (opcionalmente solo dentro de una ventana de bins, ver parse_window).
+        Retorna una lista de resultados por consulta con el top-k global.
+        """
+        self.refresh()
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        futures = {nombre: executor.submit(_shard_search, url, queries, top_k, similitud_umbral, ventana)
+                   for nombre, (url, executor) in self._shards.items()}
+        parciales = [
+            [[(mid, nombre_muestra, sim, nombre) for mid, nombre_muestra, sim in resultado]
+             for resultado in future.result()]
+            for nombre, future in futures.items()
+        ]
+
+        resultados = []
+        for i in range(len(queries)):
+            mezcla = heapq.merge(*(parcial[i] for parcial in parciales), key=lambda r: -r[2])
+            resultados.append(list(itertools.islice(mezcla, top_k)))
+        return resultados
+
+    def close(self):
+        for _, executor in self._shards.values():
+            executor.shutdown(cancel_futures=True)
+        self._shards.clear()
@@ -0,0 +1,194 @@
+# src/analysis/sweep.py
+"""
+Barrido de parámetros del pipeline de vectorización.
+
+Cada espectro etiquetado se extrae y decodifica una sola vez. El filtro
+Gaussiano y la conversión a grises no dependen de los parámetros, así que se
+guarda en caché la franja de grises que cubre todos los row_bounds de la
+grilla, junto con el mínimo por columna y por fila (lo único que necesita el
+recorte de crop_mask). Cada combinación de threshold, row_bounds, vector_size
+y method se evalúa en un pool de procesos a partir de esa caché y se reporta
+su precisión de identificación (leave-one-out, ver evaluate.py) y su rendimiento.
+
+Las etiquetas salen de extract_mineral_name.
+"""
+
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+from src.analysis.evaluate import leave_one_out
+from src.analysis.vectorize import (compute_signature, convert_to_grayscale, normalize_vector,
+                                    preprocess_image, resize_signature)
+
+DEFAULT_GRID = {
+    "threshold": (0.95, 0.97, 0.99),
+    "row_bounds": ((150, 250), (100, 250), (150, 300), (100, 300)),
+    "vector_size": (100, 200, 400),
+    "method": ("mean", "max"),
+}
+
+# Caché compartida con los procesos del pool (ver _init_worker)
+_cache = None
+_labels = None
+
+
+def load_labeled_images(paths, workers=4):
+    """
+    Extrae y decodifica la imagen de espectro de cada archivo (DOCX o imagen).
+    Retorna (rutas, etiquetas, imagenes_gris); los archivos sin espectro se omiten.
+    """
+    from src.ingestion.files import DOCX_EXTENSIONS, extract_mineral_name
+    from src.ingestion.images import IMAGE_EXTENSIONS, decode_spectrum_pages
+    from src.parsers.docx_parser import extract_spectrum_image
+
+    def _load(path):
+        try:
+            if path.lower().endswith(DOCX_EXTENSIONS):
+                img = extract_spectrum_image(path)
+                imagenes = [(path, img)] if img is not None else []
+            elif path.lower().endswith(IMAGE_EXTENSIONS):
+                paginas = decode_spectrum_pages(path)
+                imagenes = [(path if page == 0 else f"{path}#{page}", img) for page, img in paginas]
+            else:
+                imagenes = []
+        except Exception:
+            imagenes = []
+        etiqueta = extract_mineral_name(os.path.basename(path))
+        return [(ruta, etiqueta, convert_to_grayscale(preprocess_image(img))) for ruta, img in imagenes]
+
+    rutas, etiquetas, grises = [], [], []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for cargadas in pool.map(_load, paths):
+            for ruta, etiqueta, gris in cargadas:
+                rutas.append(ruta)
+                etiquetas.append(etiqueta)
+                grises.append(gris)
+    return rutas, etiquetas, grises
+
+
+class GrayBandCache:
+    """
+    Franja de grises de todas las muestras (N, filas, ancho) más los mínimos por
+    columna y por fila de la imagen completa: una columna (o fila) de la máscara
+    tiene píxeles activos si y solo si su mínimo es menor que el umbral.
+    """
+
+    def __init__(self, grises, row_bounds_grid):
+        grises = np.stack(grises)
+        self.height = grises.shape[1]
+        self.width = grises.shape[2]
+        bounds = [rb for rb in row_bounds_grid if rb is not None]
+        if not bounds or len(bounds) < len(row_bounds_grid):
+            self.row_offset, fin = 0, self.height  # row_bounds=None necesita la imagen completa
+        else:
+            self.row_offset, fin = min(a for a, _ in bounds), max(b for _, b in bounds)
+        self.band = np.ascontiguousarray(grises[:, self.row_offset:fin])
+        self.col_min = grises.min(axis=1)
+        self.row_min = grises.min(axis=2)
+
+    def __len__(self):
+        return self.band.shape[0]
+
+    def vectorize(self, i, vector_size=200, threshold=0.99, row_bounds=(150, 250), method="mean"):
+        """Equivalente a vectorize_image sobre la imagen i, sin repetir filtro ni conversión."""
+        cols = np.flatnonzero(self.col_min[i] < threshold)
+        col_start, col_end = (0, self.width) if cols.size == 0 else (cols[0], cols[-1] + 1)
+        if row_bounds is None:
+            rows = np.flatnonzero(self.row_min[i] < threshold)
+            row_start, row_end = (0, self.height) if rows.size == 0 else (rows[0], rows[-1] + 1)
+        else:
+            row_start, row_end = row_bounds
+
+        franja = self.band[i, row_start - self.row_offset:row_end - self.row_offset, col_start:col_end]
+        mask = (franja < threshold).astype(np.uint8) * 255
+        resized_sig = resize_signature(compute_signature(mask, method=method), vector_size=vector_size)
+        if resized_sig is None:
+            return None
+        return normalize_vector(resized_sig)
+
+
+def parameter_grid(grid=None):
+    """Expande la grilla {parametro: valores} en una lista de diccionarios."""
+    grid = {**DEFAULT_GRID, **(grid or {})}
+    names = ("threshold", "row_bounds", "vector_size", "method")
+    return [dict(zip(names, valores)) for valores in itertools.product(*(grid[n] for n in names))]
+
+
+def _init_worker(cache, labels):
+    global _cache, _labels
+    _cache, _labels = cache, labels
+
+
+def evaluate_setting(params, top_k=3):
+    """Vectoriza todas las muestras de la caché con params y mide precisión y rendimiento."""
+    inicio = time.perf_counter()
+    vectors = np.zeros((len(_cache), params["vector_size"]), dtype=np.float32)
+    fallidos = 0
+    for i in range(len(_cache)):
+        vector = _cache.vectorize(i, **params)
+        if vector is None:
+            fallidos += 1
+        else:
+            vectors[i] = vector
+    segundos = time.perf_counter() - inicio
+
+    evaluacion = leave_one_out(vectors, _labels, top_k=top_k)
+    return {
+        **params,
+        "precision_top1": evaluacion["precision_top1"],
+        f"precision_top{top_k}": evaluacion[f"precision_top{top_k}"],
+        "evaluables": evaluacion["evaluables"],
+        "fallidos": fallidos,
+        "vectores_por_segundo": round(len(_cache) / segundos, 1) if segundos > 0 else None,
+    }
+
+
+def run_sweep(paths, grid=None, workers=None, top_k=3, log=None):
+    """
+    Ejecuta el barrido sobre los archivos etiquetados.
+    Retorna un diccionario con el resumen y los resultados ordenados por precisión.
+    """
+    inicio = time.perf_counter()
+    rutas, etiquetas, grises = load_labeled_images(paths)
+    if len(grises) < 2:
+        raise ValueError("Se necesitan al menos dos espectros etiquetados para el barrido.")
+    segundos_carga = time.perf_counter() - inicio
+    if log:
+        log(f"{len(grises)} espectros decodificados en {segundos_carga:.2f} s")
+
+    settings = parameter_grid(grid)
+    cache = GrayBandCache(grises, sorted({s["row_bounds"] for s in settings}, key=str))
+    del grises
+
+    resultados = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(cache, etiquetas)) as pool:
+        for resultado in pool.map(evaluate_setting, settings, itertools.repeat(top_k)):
+            resultados.append(resultado)
+            if log:
+                log(f"{len(resultados)}/{len(settings)}\t{format_setting(resultado)}")
+
+    clave_topk = f"precision_top{top_k}"
+    resultados.sort(key=lambda r: (r["precision_top1"] or 0, r[clave_topk] or 0,
+                                   r["vectores_por_segundo"] or 0), reverse=True)
+    return {
+        "muestras": len(rutas),
+        "etiquetas": len(set(etiquetas)),
+        "segundos_carga": round(segundos_carga, 3),
+        "segundos_total": round(time.perf_counter() - inicio, 3),
+        "resultados": resultados,
+    }
+
+
+def format_setting(resultado):
+    """Representación corta de una combinación evaluada."""
+    rb = resultado["row_bounds"]
+    precision = resultado["precision_top1"]
+    return (f"threshold={resultado['threshold']} row_bounds={f'{rb[0]}:{rb[1]}' if rb else 'auto'} "
+            f"vector_size={resultado['vector_size']} method={resultado['method']} "
+            f"top1={'-' if precision is None else f'{precision:.3f}'} "
+            f"vec/s={resultado['vectores_por_segundo']}")
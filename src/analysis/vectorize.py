@@ -2,15 +2,51 @@ import cv2
 import numpy as np
 
 
+def to_float_image(img):
+    """Convierte una imagen uint8 (BGR o gris) a BGR float normalizado."""
+    if len(img.shape) == 2 or img.shape[2] == 1:
+        img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+    img = img.astype(np.float32) / 255.0
+    return img
+
+
 def read_image_float(image_path):
     """Lee una imagen y la convierte a formato float normalizado."""
     img = cv2.imread(image_path)
     if img is None:
         return None
+    return to_float_image(img)
+
+
+def decode_image_float(data):
+    """Decodifica una imagen desde bytes en memoria a formato float normalizado."""
+    img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        return None
+    return to_float_image(img)
+
+
+def decode_image(data):
+    """Decodifica una imagen desde bytes a BGR uint8 (sin convertir a float)."""
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def to_gray_float(img):
+    """
+    Convierte una imagen uint8 (BGR o gris) a gris float normalizado sin pasar
+    por la copia BGR float: se acumula un canal a la vez con los mismos pesos
+    que cv2.COLOR_BGR2GRAY.
+    """
     if len(img.shape) == 2 or img.shape[2] == 1:
-        img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
-    img = img.astype(np.float32) / 255.0
-    return img
+        gray = img.reshape(img.shape[:2]).astype(np.float32)
+        gray /= 255.0
+        return gray
+    gray = np.zeros(img.shape[:2], dtype=np.float32)
+    for canal, peso in enumerate((0.114, 0.587, 0.299)):
+        valores = img[..., canal].astype(np.float32)
+        valores *= peso / 255.0
+        gray += valores
+    return gray
 
 
 def preprocess_image(img):
@@ -84,6 +120,43 @@ def normalize_vector(vec):
     return normalized
 
 
+def vectorize_image(img, vector_size=200, threshold=0.99, row_bounds=(150,250), method="mean"):
+    """
+    Vectoriza una imagen de espectro ya cargada (BGR float normalizado, ver read_image_float).
+    Retorna el vector normalizado o None si falla.
+    """
+    img = preprocess_image(img)
+    gray = convert_to_grayscale(img)
+    return vectorize_gray(gray, vector_size=vector_size, threshold=threshold,
+                          row_bounds=row_bounds, method=method)
+
+
+def vectorize_gray(gray, vector_size=200, threshold=0.99, row_bounds=(150,250), method="mean"):
+    """Vectoriza una imagen ya suavizada y en gris (float normalizado)."""
+    mask = extract_mask(gray, threshold=threshold)
+    mask_cropped, r_st, r_ed, c_st, c_ed = crop_mask(mask, row_bounds=row_bounds)
+    signature = compute_signature(mask_cropped, method=method)
+    resized_sig = resize_signature(signature, vector_size=vector_size)
+    
+    if resized_sig is None:
+        return None
+        
+    normalized_sig = normalize_vector(resized_sig)
+    return normalized_sig
+
+
+def vectorize_image_low_memory(img, vector_size=200, threshold=0.99, row_bounds=(150,250), method="mean"):
+    """
+    Variante de bajo consumo de vectorize_image para imágenes uint8: suaviza
+    directamente el gris float (el filtro y la conversión a gris son lineales,
+    así que el resultado coincide salvo redondeo) y evita las copias BGR float:
+    la mitad de memoria por píxel.
+    """
+    gray = preprocess_image(to_gray_float(img))
+    return vectorize_gray(gray, vector_size=vector_size, threshold=threshold,
+                          row_bounds=row_bounds, method=method)
+
+
 def vectorize_spectrum(image_path, vector_size=200, threshold=0.99, row_bounds=(150,250), method="mean"):
     """
     Pipeline completo de vectorización de espectros EDS.
@@ -98,20 +171,8 @@ def vectorize_spectrum(image_path, vector_size=200, threshold=0.99, row_bounds=(
     Returns:
         numpy.array: Vector normalizado del espectro o None si falla
     """
-    # Pipeline de procesamiento
     img = read_image_float(image_path)
     if img is None:
         return None
-        
-    img = preprocess_image(img)
-    gray = convert_to_grayscale(img)
-    mask = extract_mask(gray, threshold=threshold)
-    mask_cropped, r_st, r_ed, c_st, c_ed = crop_mask(mask, row_bounds=row_bounds)
-    signature = compute_signature(mask_cropped, method=method)
-    resized_sig = resize_signature(signature, vector_size=vector_size)
-    
-    if resized_sig is None:
-        return None
-        
-    normalized_sig = normalize_vector(resized_sig)
-    return normalized_sig
+    return vectorize_image(img, vector_size=vector_size, threshold=threshold,
+                           row_bounds=row_bounds, method=method)
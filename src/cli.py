@@ -0,0 +1,805 @@
+# src/cli.py
+"""
+Interfaz de línea de comandos unificada.
+
+Uso:
+    python -m src ingest [RUTAS...]        Vectoriza e inserta archivos de espectros
+    python -m src quarantine               Archivos que fallaron en la ingesta
+    python -m src watch CARPETAS...        Ingesta continua de los archivos nuevos
+    python -m src identify ARCHIVO         Identifica el mineral de un archivo DOCX
+    python -m src stats                    Estadísticas de la biblioteca
+    python -m src export SALIDA            Exporta muestras y vectores (jsonl/csv/parquet/npz)
+    python -m src import PAQUETE           Importa un paquete .parquet/.npz de otra biblioteca
+    python -m src shards [add|split|...]   Biblioteca particionada en varias BD SQLite
+    python -m src pipelines                Lista (o activa) las versiones del pipeline
+    python -m src revectorize [opciones]   Re-vectoriza la biblioteca con otros parámetros
+    python -m src sweep [RUTAS...]         Barrido de parámetros del pipeline
+    python -m src evaluate                 Precisión leave-one-out de la biblioteca
+    python -m src dedup                    Detecta (y elimina) espectros duplicados
+    python -m src delete [filtros]         Elimina muestras en bloque (ids o filtros)
+    python -m src relabel [filtros]        Renombra muestras en bloque
+    python -m src startup-check            Mide el tiempo de arranque del CLI
+
+Los módulos pesados (SQLAlchemy, NumPy, OpenCV, python-docx) se importan dentro
+de cada comando, de modo que `--help` y los errores de argumentos no los cargan.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+# Tiempo de arranque objetivo para `python -m src --help` (milisegundos)
+STARTUP_TARGET_MS = 150
+
+DEFAULT_SAMPLES_PATH = "muestrasdatos/Muestras Tesis"
+
+
+def cmd_ingest(args):
+    from src.database.connection import SessionLocal
+    from src.database.queries import count_muestras, create_tables
+    from src.ingestion.checkpoint import ERROR, OK, SIN_ESPECTRO, TIMEOUT, ingest_checkpointed
+    from src.ingestion.files import discover_files
+
+    files = discover_files(args.paths or [DEFAULT_SAMPLES_PATH])
+    if not files:
+        print("No se encontraron archivos para procesar.", file=sys.stderr)
+        return 1
+
+    create_tables()
+    if args.async_pipeline:
+        return _ingest_async(args, files)
+    session = SessionLocal()
+    try:
+        # Cada archivo en un proceso hijo con timeout y límite de memoria; el
+        # estado queda en ingestion_status y una nueva ejecución retoma desde ahí.
+        resumen = ingest_checkpointed(session, files, investigador=args.investigador, workers=args.workers,
+                                      timeout=args.timeout, memory_mb=args.memory_mb,
+                                      retry_quarantine=args.retry_quarantine, log=print)
+        total = count_muestras(session)
+    finally:
+        session.close()
+
+    fallidos = len(resumen[ERROR]) + len(resumen[TIMEOUT])
+    print(f"Procesados: {len(resumen[OK])} | sin espectro: {len(resumen[SIN_ESPECTRO])} | "
+          f"errores: {len(resumen[ERROR])} | timeouts: {len(resumen[TIMEOUT])} | "
+          f"ya procesados: {resumen['omitidos']} | total en BD: {total}", file=sys.stderr)
+    return 0 if fallidos == 0 else 1
+
+
+def _ingest_async(args, files):
+    from src.database.connection import SessionLocal
+    from src.ingestion.async_pipeline import run_ingest_async
+    from src.ingestion.checkpoint import ERROR, OK, SIN_ESPECTRO
+
+    # Lectura, vectorización y escritura solapadas con colas acotadas entre etapas
+    resumen = run_ingest_async(SessionLocal, files, investigador=args.investigador, workers=args.workers,
+                               readers=args.readers, queue_size=args.queue_size, batch_size=args.batch_size,
+                               retry_quarantine=args.retry_quarantine, log=print)
+    print(f"Procesados: {len(resumen[OK])} | sin espectro: {len(resumen[SIN_ESPECTRO])} | "
+          f"errores: {len(resumen[ERROR])} | ya procesados: {resumen['omitidos']} | "
+          f"{resumen['segundos']} s | cuello de botella: {resumen['cuello_de_botella']}", file=sys.stderr)
+    return 0 if not resumen[ERROR] else 1
+
+
+def cmd_quarantine(args):
+    from src.database.connection import SessionLocal
+    from src.database.queries import create_tables
+    from src.ingestion.checkpoint import get_quarantine
+
+    create_tables()
+    session = SessionLocal()
+    try:
+        registros = get_quarantine(session)
+        for registro in registros:
+            print(f"{registro.estado}\t{registro.intentos}\t{registro.ruta}\t{registro.mensaje or ''}")
+    finally:
+        session.close()
+    print(f"{len(registros)} archivos en cuarentena "
+          f"(reintentar con: python -m src ingest --retry-quarantine RUTAS...)", file=sys.stderr)
+    return 0
+
+
+def cmd_memory(args):
+    from src.memory import read_reports
+
+    reportes = read_reports(args.log)
+    reportes.sort(key=lambda r: r["pico_mb"], reverse=True)
+    for reporte in reportes[:args.top]:
+        etapas = " ".join(f"{etapa}={mb}" for etapa, mb in reporte["etapas"].items())
+        print(f"{reporte['pico_mb']:.2f}\t{reporte.get('rss_max_mb')}\t{reporte.get('modo', '')}\t"
+              f"{reporte['etiqueta']}\t{etapas}")
+        if args.sitios:
+            for sitio in reporte["sitios"]:
+                print(f"\t\t{sitio['kb']} KB\t{sitio['sitio']}")
+    print(f"{len(reportes)} reportes (pico MB, RSS máx MB, modo, archivo, etapas MB)", file=sys.stderr)
+    return 0
+
+
+def cmd_watch(args):
+    from src.database.connection import SessionLocal
+    from src.database.queries import create_tables
+    from src.ingestion.watcher import FolderWatcher
+
+    create_tables()
+    watcher = FolderWatcher(
+        SessionLocal,
+        args.folders,
+        investigador=args.investigador,
+        workers=args.workers,
+        poll_interval=args.interval,
+        settle_seconds=args.settle,
+        metrics_path=args.metrics_file,
+        metrics_interval=args.metrics_interval,
+    )
+    watcher.run()
+    return 0
+
+
+def _load_identify_library(args, representacion=None):
+    """SpectrumLibrary de la BD principal o coordinador de shards (--shards)."""
+    from src.analysis.pipeline import PERFIL_IMAGEN
+
+    if args.shards:
+        from src.analysis.sharded import ShardedSearch
+
+        return ShardedSearch(args.shards)
+
+    from src.analysis.library import cached_library
+    from src.database.connection import SessionLocal
+    from src.database.queries import create_tables
+
+    create_tables()
+    session = SessionLocal()
+    try:
+        return cached_library(session, representacion=representacion or PERFIL_IMAGEN)
+    finally:
+        session.close()
+
+
+def cmd_identify(args):
+    from src.analysis.library import parse_window
+    from src.ingestion.files import vectorize_file
+    from src.ingestion.images import IMAGE_EXTENSIONS, spectrum_pages
+    from src.memory import BAJO_CONSUMO, plan_memory, track_memory
+    from src.profiling import profile
+
+    try:
+        ventana = parse_window(args.ventana)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    # Un TIFF con varias páginas de espectro no se reduce en silencio a la primera
+    if args.file.lower().endswith(IMAGE_EXTENSIONS):
+        paginas = spectrum_pages(args.file)
+        if args.page is None and len(paginas) > 1:
+            print(f"{args.file} tiene {len(paginas)} páginas con espectro "
+                  f"({', '.join(map(str, paginas))}); indique una con --page", file=sys.stderr)
+            return 2
+        if args.page is not None and args.page not in paginas:
+            print(f"La página {args.page} de {args.file} no es un espectro "
+                  f"(páginas con espectro: {', '.join(map(str, paginas)) or 'ninguna'})", file=sys.stderr)
+            return 2
+    elif args.page is not None:
+        print("--page solo se aplica a imágenes (TIFF de varias páginas)", file=sys.stderr)
+        return 2
+    library = _load_identify_library(args)
+    etiqueta = f"identify-{os.path.basename(args.file)}"
+    try:
+        with profile(etiqueta), track_memory(etiqueta):
+            # Se vectoriza con los parámetros de la versión activa del pipeline
+            vector, representacion = vectorize_file(
+                args.file, low_memory=plan_memory(args.file) == BAJO_CONSUMO, page=args.page, **library.params)
+            if vector is None:
+                print(f"No se encontró un espectro válido en {args.file}", file=sys.stderr)
+                return 2
+            # Solo se compara contra vectores de la misma representación
+            if representacion != library.representacion:
+                if args.shards:
+                    print(f"Los shards solo guardan '{library.representacion}'; "
+                          f"{args.file} es '{representacion}'", file=sys.stderr)
+                    return 2
+                library = _load_identify_library(args, representacion)
+            try:
+                parse_window(ventana, len(vector))
+            except ValueError as e:
+                print(e, file=sys.stderr)
+                return 2
+            resultados = library.search(vector, top_k=args.top_k, similitud_umbral=args.umbral,
+                                        ventana=ventana)[0]
+    finally:
+        if args.shards:
+            library.close()
+
+    # Con shards cada resultado trae además el nombre del shard
+    if args.json:
+        print(json.dumps([
+            dict(zip(("muestra_id", "nombre_muestra", "similitud", "shard"), resultado))
+            for resultado in resultados
+        ], ensure_ascii=False))
+    else:
+        for mid, nombre, sim, *shard in resultados:
+            print("\t".join([str(mid), nombre, f"{sim:.4f}"] + shard))
+    return 0
+
+
+def cmd_stats(args):
+    from src.database.connection import SessionLocal
+    from src.database.queries import create_tables
+    from src.database.stats import get_database_stats
+
+    create_tables()
+    session = SessionLocal()
+    try:
+        stats = get_database_stats(session, granularity=args.granularity, use_cache=False)
+    finally:
+        session.close()
+
+    if args.json:
+        print(json.dumps(stats, ensure_ascii=False))
+        return 0
+
+    print(f"Total de muestras:        {stats['total_muestras']}")
+    print(f"Muestras con espectro:    {stats['muestras_con_espectro']}")
+    print(f"Minerales distintos:      {stats['minerales_distintos']}")
+    print("Por mineral:")
+    for nombre, cantidad in stats["por_mineral"]:
+        print(f"  {nombre}\t{cantidad}")
+    print("Por investigador:")
+    for investigador, cantidad in stats["por_investigador"]:
+        print(f"  {investigador}\t{cantidad}")
+    print("Por fecha:")
+    for periodo, cantidad in stats["por_fecha"]:
+        print(f"  {periodo}\t{cantidad}")
+    return 0
+
+
+def cmd_export(args):
+    import csv
+
+    from src.database.connection import SessionLocal
+    from src.database.models import EspectroVectorizado, Muestra
+    from src.database.queries import create_tables, get_active_pipeline_version
+
+    fmt = args.format
+    if fmt is None:
+        ext = os.path.splitext(args.output)[1].lower().lstrip(".")
+        fmt = ext if ext in ("csv", "parquet", "npz") else "jsonl"
+
+    create_tables()
+    session = SessionLocal()
+    try:
+        if fmt in ("parquet", "npz"):
+            from src.database.transfer import export_bundle
+
+            try:
+                count = export_bundle(session, args.output, fmt=fmt)
+            except (RuntimeError, ValueError) as e:
+                print(e, file=sys.stderr)
+                return 2
+            print(f"Exportadas {count} muestras a {args.output}", file=sys.stderr)
+            return 0
+
+        rows = (session.query(Muestra.id, Muestra.nombre_muestra, Muestra.investigador,
+                              Muestra.fecha, Muestra.ruta_imagen, EspectroVectorizado.vector_json)
+                .join(EspectroVectorizado, EspectroVectorizado.muestra_id == Muestra.id)
+                .filter(EspectroVectorizado.pipeline_version == get_active_pipeline_version(session))
+                .order_by(Muestra.id)
+                .yield_per(1000))
+        count = 0
+        with open(args.output, "w", newline="", encoding="utf-8") as f:
+            if fmt == "csv":
+                writer = csv.writer(f)
+                writer.writerow(["id", "nombre_muestra", "investigador", "fecha", "ruta_imagen", "vector"])
+            for mid, nombre, investigador, fecha, ruta, vector_json in rows:
+                fecha = fecha.isoformat() if fecha else None
+                if fmt == "csv":
+                    writer.writerow([mid, nombre, investigador, fecha, ruta, vector_json])
+                else:
+                    f.write(json.dumps({
+                        "id": mid, "nombre_muestra": nombre, "investigador": investigador,
+                        "fecha": fecha, "ruta_imagen": ruta, "vector": json.loads(vector_json),
+                    }, ensure_ascii=False) + "\n")
+                count += 1
+    finally:
+        session.close()
+
+    print(f"Exportadas {count} muestras a {args.output}", file=sys.stderr)
+    return 0
+
+
+def cmd_import(args):
+    from src.database.connection import SessionLocal
+    from src.database.queries import count_muestras, create_tables
+    from src.database.transfer import import_bundle
+
+    create_tables()
+    session = SessionLocal()
+    try:
+        try:
+            resumen = import_bundle(session, args.bundle, batch_size=args.batch_size, investigador=args.investigador,
+                                    log=lambda msg: print(msg, file=sys.stderr))
+        except (RuntimeError, ValueError, KeyError, OSError) as e:
+            print(f"No se pudo importar {args.bundle}: {e}", file=sys.stderr)
+            return 2
+        total = count_muestras(session)
+    finally:
+        session.close()
+
+    print(f"Importadas: {resumen['importadas']} | duplicadas (omitidas): {resumen['duplicadas']} | "
+          f"total en BD: {total}", file=sys.stderr)
+    if not resumen["version_activa"]:
+        print(f"Los vectores importados son de la versión {resumen['pipeline_version']}, que no es la activa "
+              f"(ver python -m src pipelines).", file=sys.stderr)
+    return 0
+
+
+def cmd_shards(args):
+    from src.database import shards
+
+    try:
+        if args.accion == "add":
+            entrada = shards.add_shard(args.nombre, args.destino, grupos=args.grupos,
+                                       particion=args.particion, path=args.registry)
+            print(f"Shard {entrada['nombre']} agregado: {entrada['url']}", file=sys.stderr)
+        elif args.accion in ("split", "import"):
+            log = lambda msg: print(msg, file=sys.stderr)  # noqa: E731
+            if args.accion == "split":
+                from src.database.connection import SessionLocal
+                from src.database.queries import create_tables
+
+                create_tables()
+                session = SessionLocal()
+                try:
+                    resumen = shards.partition_library(session, path=args.registry,
+                                                       batch_size=args.batch_size, log=log)
+                finally:
+                    session.close()
+            else:
+                from src.analysis.pipeline import DEFAULT_PARAMS, params_from_json
+                from src.database.transfer import iter_bundle
+
+                metadata, lotes = iter_bundle(args.bundle, batch_size=args.batch_size)
+                params = (params_from_json(metadata["params_json"]) if metadata.get("params_json")
+                          else dict(DEFAULT_PARAMS))
+                resumen = shards.distribute_batches(lotes, params, path=args.registry,
+                                                    investigador=args.investigador, log=log)
+            print(f"Insertadas: {sum(resumen['insertadas'].values())} | "
+                  f"duplicadas (omitidas): {resumen['duplicadas']}", file=sys.stderr)
+    except (RuntimeError, ValueError, KeyError, OSError) as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    particion = shards.load_registry(args.registry)["particion"]
+    print(f"Registro {shards.get_registry_path(args.registry)} (partición: {particion})")
+    for shard in shards.shard_status(args.registry):
+        grupos = ",".join(shard["grupos"]) or "-"
+        print(f"{shard['nombre']}\t{shard['muestras']}\t{shard['pipeline_version']}\t{grupos}\t{shard['url']}")
+    return 0
+
+
+def cmd_pipelines(args):
+    from src.database.connection import SessionLocal
+    from src.database.queries import activate_pipeline_version, create_tables, list_pipeline_versions
+
+    create_tables()
+    session = SessionLocal()
+    try:
+        if args.activate:
+            try:
+                activate_pipeline_version(session, args.activate)
+            except ValueError as e:
+                print(e, file=sys.stderr)
+                return 2
+            print(f"Versión activa: {args.activate}", file=sys.stderr)
+        for version in list_pipeline_versions(session):
+            marca = "*" if version.activa else " "
+            print(f"{marca} {version.id}\t{version.estado}\t{version.params_json}")
+    finally:
+        session.close()
+    return 0
+
+
+def cmd_revectorize(args):
+    from src.analysis.pipeline import normalize_params
+    from src.database.connection import SessionLocal
+    from src.database.queries import create_tables, get_active_pipeline_params
+    from src.ingestion.revectorize import revectorize
+
+    create_tables()
+    session = SessionLocal()
+    try:
+        # Los parámetros no indicados se toman de la versión activa
+        params = normalize_params(get_active_pipeline_params(session), vector_size=args.vector_size,
+                                  threshold=args.threshold, row_bounds=args.row_bounds, method=args.method)
+        resumen = revectorize(session, params, workers=args.workers, chunk_size=args.chunk_size,
+                              activate=not args.no_activate, force=args.force,
+                              log=lambda msg: print(msg, file=sys.stderr))
+    finally:
+        session.close()
+
+    print(f"Versión {resumen['pipeline_version']}: {resumen['procesadas']} procesadas | "
+          f"sin archivo: {len(resumen['sin_fuente'])} | sin espectro: {len(resumen['sin_espectro'])} | "
+          f"errores: {len(resumen['errores'])} | faltantes: {resumen['faltantes']} | "
+          f"{'activada' if resumen['activada'] else 'no activada'}", file=sys.stderr)
+    return 0 if resumen["faltantes"] == 0 else 1
+
+
+def _parse_row_bounds(value):
+    """'150:250' -> (150, 250); 'auto' -> None (recorte por máscara)."""
+    if value.lower() in ("auto", "none"):
+        return None
+    try:
+        inicio, fin = value.split(":")
+        return int(inicio), int(fin)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"row_bounds inválido: {value!r} (formato INICIO:FIN o auto)")
+
+
+def cmd_sweep(args):
+    from src.analysis.sweep import format_setting, run_sweep
+    from src.ingestion.files import DOCX_EXTENSIONS, discover_files
+    from src.ingestion.images import IMAGE_EXTENSIONS
+
+    files = discover_files(args.paths or [DEFAULT_SAMPLES_PATH], DOCX_EXTENSIONS + IMAGE_EXTENSIONS)
+    grid = {}
+    if args.thresholds:
+        grid["threshold"] = args.thresholds
+    if args.row_bounds:
+        grid["row_bounds"] = args.row_bounds
+    if args.vector_sizes:
+        grid["vector_size"] = args.vector_sizes
+    if args.methods:
+        grid["method"] = args.methods
+
+    try:
+        resumen = run_sweep(files, grid, workers=args.workers, top_k=args.top_k,
+                            log=lambda msg: print(msg, file=sys.stderr))
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    if args.json:
+        print(json.dumps(resumen, ensure_ascii=False))
+        return 0
+    print(f"{resumen['muestras']} espectros, {resumen['etiquetas']} etiquetas | "
+          f"carga {resumen['segundos_carga']} s | total {resumen['segundos_total']} s")
+    for resultado in resumen["resultados"][:args.limit]:
+        print(format_setting(resultado))
+    return 0
+
+
+def cmd_evaluate(args):
+    from src.analysis.evaluate import evaluate_library
+    from src.database.connection import SessionLocal
+    from src.database.queries import create_tables
+
+    create_tables()
+    session = SessionLocal()
+    try:
+        resultado = evaluate_library(session, top_k=args.top_k, block_size=args.block_size,
+                                     pipeline_version=args.pipeline_version)
+    finally:
+        session.close()
+
+    clave_topk = f"precision_top{args.top_k}"
+    top1 = resultado["precision_top1"]
+    if args.json:
+        print(json.dumps(dict(resultado, confusion=resultado["confusion"].tolist()), ensure_ascii=False))
+    else:
+        print(f"Versión {resultado['pipeline_version']}: {resultado['muestras']} muestras, "
+              f"{resultado['evaluables']} evaluables ({len(resultado['etiquetas'])} etiquetas)")
+        if top1 is None:
+            print("Ninguna etiqueta tiene dos o más muestras: no hay nada que evaluar.")
+        else:
+            print(f"Top-1: {top1:.4f} | Top-{args.top_k}: {resultado[clave_topk]:.4f}")
+            print("\nPor etiqueta (muestras, top-1, top-k):")
+            for etiqueta, fila in sorted(resultado["por_etiqueta"].items(), key=lambda kv: kv[1]["precision_top1"]):
+                print(f"  {etiqueta}\t{fila['muestras']}\t{fila['precision_top1']:.3f}\t{fila[clave_topk]:.3f}")
+            print("\nConfusiones (real -> predicha: cantidad):")
+            confusion = resultado["confusion"]
+            etiquetas = resultado["etiquetas"]
+            errores = [(r, p) for r, p in zip(*confusion.nonzero()) if r != p]
+            for real, predicha in errores:
+                print(f"  {etiquetas[real]} -> {etiquetas[predicha]}: {confusion[real, predicha]}")
+            if not errores:
+                print("  (ninguna)")
+
+    # Umbral de regresión: falla si la precisión top-1 baja del mínimo indicado
+    if args.min_top1 is not None and (top1 is None or top1 < args.min_top1):
+        print(f"Precisión top-1 por debajo del mínimo {args.min_top1}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def cmd_dedup(args):
+    from src.analysis.dedup import find_duplicates, remove_duplicates
+    from src.database.connection import SessionLocal
+    from src.database.queries import create_tables
+
+    create_tables()
+    session = SessionLocal()
+    try:
+        clusters = find_duplicates(session, umbral=args.umbral, block_size=args.block_size, lsh=args.lsh,
+                                   n_bits=args.lsh_bits, n_tables=args.lsh_tables)
+        eliminados = remove_duplicates(session, clusters, args.incluir_mezclados) if args.delete else []
+    finally:
+        session.close()
+
+    if args.json:
+        print(json.dumps({"clusters": clusters, "eliminados": eliminados}, ensure_ascii=False))
+    else:
+        for cluster in clusters:
+            marca = " (nombres distintos)" if cluster["mezclado"] else ""
+            miembros = ", ".join(f"{mid}:{nombre}" for mid, nombre in zip(cluster["ids"], cluster["nombres"]))
+            print(f"{cluster['similitud_min']:.4f}\t{miembros}{marca}")
+    duplicados = sum(len(c["ids"]) - 1 for c in clusters)
+    print(f"{len(clusters)} clusters, {duplicados} duplicados"
+          + (f", {len(eliminados)} eliminados" if args.delete else " (usar --delete para eliminarlos)"),
+          file=sys.stderr)
+    return 0
+
+
+def _bulk_filters(args):
+    """Filtros de delete/relabel (mismos que los listados de la app)."""
+    from datetime import date
+
+    return {
+        "nombre_prefix": args.prefix,
+        "investigador": args.investigador,
+        "fecha_desde": date.fromisoformat(args.desde) if args.desde else None,
+        "fecha_hasta": date.fromisoformat(args.hasta) if args.hasta else None,
+    }
+
+
+def cmd_delete(args):
+    from src.database.connection import SessionLocal
+    from src.database.queries import create_tables, delete_muestras
+
+    create_tables()
+    session = SessionLocal()
+    try:
+        eliminadas = delete_muestras(session, ids=args.ids, **_bulk_filters(args))
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    finally:
+        session.close()
+    print(f"{eliminadas} muestras eliminadas", file=sys.stderr)
+    return 0
+
+
+def cmd_relabel(args):
+    from src.database.connection import SessionLocal
+    from src.database.queries import create_tables, update_muestras
+
+    if args.nombre is None and args.nuevo_investigador is None:
+        print("Indique --nombre y/o --nuevo-investigador.", file=sys.stderr)
+        return 2
+    create_tables()
+    session = SessionLocal()
+    try:
+        actualizadas = update_muestras(session, ids=args.ids, nombre_muestra=args.nombre,
+                                       nuevo_investigador=args.nuevo_investigador, **_bulk_filters(args))
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    finally:
+        session.close()
+    print(f"{actualizadas} muestras actualizadas", file=sys.stderr)
+    return 0
+
+
+def cmd_startup_check(args):
+    import statistics
+    import subprocess
+    import time
+
+    command = [sys.executable, "-m", "src", "--help"]
+    tiempos = []
+    for _ in range(args.runs):
+        t0 = time.perf_counter()
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+        tiempos.append((time.perf_counter() - t0) * 1000)
+
+    mediana = statistics.median(tiempos)
+    print(f"Arranque de 'python -m src --help': mediana {mediana:.1f} ms "
+          f"(mín {min(tiempos):.1f}, máx {max(tiempos):.1f}, {args.runs} ejecuciones) "
+          f"- objetivo {args.target_ms} ms")
+    if mediana <= args.target_ms:
+        return 0
+
+    # Mostrar los módulos que más tiempo consumen al importarse
+    result = subprocess.run([sys.executable, "-X", "importtime"] + command[1:],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    modulos = []
+    for line in result.stderr.splitlines()[1:]:
+        partes = line.split("|")
+        if len(partes) == 3:
+            modulos.append((int(partes[1]), partes[2].strip()))
+    print("Importaciones más costosas (acumulado, µs):")
+    for cumulative, name in sorted(modulos, reverse=True)[:10]:
+        print(f"  {cumulative:>9}  {name}")
+    return 1
+
+
+def build_parser():
+    from src.diagnostics import add_diagnostic_arguments
+
+    parser = argparse.ArgumentParser(prog="python -m src", description="Herramientas del sistema de identificación de minerales EDS")
+    parser.add_argument("--database-url", help="URL de la base de datos (por defecto sqlite:///minerales_eds.db)")
+    parser.add_argument("--echo-sql", action="store_true", help="Mostrar las sentencias SQL ejecutadas")
+    add_diagnostic_arguments(parser)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("ingest", help="Vectoriza e inserta archivos de espectros")
+    p.add_argument("paths", nargs="*", help=f"Archivos, directorios o patrones (default: {DEFAULT_SAMPLES_PATH})")
+    p.add_argument("--investigador", default="Dataset Tesis")
+    p.add_argument("--workers", type=int, default=2, help="Procesos de vectorización simultáneos")
+    p.add_argument("--timeout", type=float, default=120, help="Segundos máximos por archivo")
+    p.add_argument("--memory-mb", type=int, default=1024, help="Memoria máxima adicional por archivo (MB)")
+    p.add_argument("--retry-quarantine", action="store_true",
+                   help="Reintentar los archivos en cuarentena (error o timeout)")
+    p.add_argument("--async", dest="async_pipeline", action="store_true",
+                   help="Pipeline asyncio: lectura, vectorización y escritura por lotes solapadas "
+                        "(sin timeout ni límite de memoria por archivo)")
+    p.add_argument("--readers", type=int, default=4, help="Lecturas simultáneas (--async)")
+    p.add_argument("--queue-size", type=int, help="Capacidad de las colas entre etapas (--async, default 2*workers)")
+    p.add_argument("--batch-size", type=int, default=32, help="Archivos por commit (--async)")
+    p.set_defaults(func=cmd_ingest)
+
+    p = sub.add_parser("quarantine", help="Lista los archivos que fallaron en la ingesta")
+    p.set_defaults(func=cmd_quarantine)
+
+    p = sub.add_parser("memory", help="Archivos/peticiones con mayor pico de memoria (ver --memory-report)")
+    p.add_argument("--log", help="Registro de reportes (default: profiles/memory.jsonl o EDS_MEMORY_LOG)")
+    p.add_argument("--top", type=int, default=20)
+    p.add_argument("--sitios", action="store_true", help="Mostrar los sitios de asignación de cada reporte")
+    p.set_defaults(func=cmd_memory)
+
+    p = sub.add_parser("watch", help="Vigila carpetas e ingiere los archivos nuevos de forma continua")
+    p.add_argument("folders", nargs="+")
+    p.add_argument("--investigador", default="Dataset Tesis")
+    p.add_argument("--workers", type=int, default=2)
+    p.add_argument("--interval", type=float, default=2.0, help="Segundos entre sondeos")
+    p.add_argument("--settle", type=float, default=5.0,
+                   help="Segundos sin cambios antes de procesar un archivo (escrituras parciales)")
+    p.add_argument("--metrics-file", help="Archivo JSON donde se publican las métricas")
+    p.add_argument("--metrics-interval", type=float, default=30.0)
+    p.set_defaults(func=cmd_watch)
+
+    p = sub.add_parser("identify", help="Identifica el mineral de un archivo")
+    p.add_argument("file")
+    p.add_argument("--top-k", type=int, default=10)
+    p.add_argument("--umbral", type=float, default=0.0)
+    p.add_argument("--ventana", metavar="INICIO,FIN",
+                   help="Comparar solo los bins [INICIO, FIN) del vector (ej. 10,150)")
+    p.add_argument("--page", type=int, help="Página (desde 0) de un TIFF con varios espectros")
+    p.add_argument("--json", action="store_true", help="Salida en formato JSON")
+    p.add_argument("--shards", metavar="REGISTRO", help="Buscar en los shards del registro (ej. shards.json)")
+    p.set_defaults(func=cmd_identify)
+
+    p = sub.add_parser("stats", help="Estadísticas de la biblioteca")
+    p.add_argument("--granularity", choices=["day", "month", "year"], default="month")
+    p.add_argument("--json", action="store_true", help="Salida en formato JSON")
+    p.set_defaults(func=cmd_stats)
+
+    p = sub.add_parser("export", help="Exporta las muestras con sus vectores")
+    p.add_argument("output")
+    p.add_argument("--format", choices=["jsonl", "csv", "parquet", "npz"],
+                   help="Por defecto se deduce de la extensión (jsonl si no es .csv/.parquet/.npz)")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("import", help="Importa un paquete .parquet/.npz exportado por otra biblioteca")
+    p.add_argument("bundle")
+    p.add_argument("--batch-size", type=int, default=5000)
+    p.add_argument("--investigador", help="Reemplaza el investigador de las muestras importadas")
+    p.set_defaults(func=cmd_import)
+
+    p = sub.add_parser("shards", help="Biblioteca particionada en varias BD (shards)")
+    p.add_argument("--registry", help="Registro de shards (default: EDS_SHARDS_FILE o shards.json)")
+    acciones = p.add_subparsers(dest="accion")
+    a = acciones.add_parser("list", help="Lista los shards con sus muestras")
+    a = acciones.add_parser("add", help="Crea un shard y lo agrega al registro")
+    a.add_argument("nombre")
+    a.add_argument("destino", help="Archivo SQLite o URL de SQLAlchemy")
+    a.add_argument("--grupos", nargs="+", help="Minerales que van a este shard (partición por grupo)")
+    a.add_argument("--particion", choices=["hash", "grupo"], help="Regla de partición del registro")
+    a = acciones.add_parser("split", help="Reparte la biblioteca de la BD principal entre los shards")
+    a.add_argument("--batch-size", type=int, default=5000)
+    a = acciones.add_parser("import", help="Reparte un paquete .parquet/.npz entre los shards")
+    a.add_argument("bundle")
+    a.add_argument("--batch-size", type=int, default=5000)
+    a.add_argument("--investigador", help="Reemplaza el investigador de las muestras importadas")
+    p.set_defaults(func=cmd_shards, accion="list")
+
+    p = sub.add_parser("pipelines", help="Lista las versiones del pipeline de vectorización")
+    p.add_argument("--activate", metavar="VERSION", help="Activa una versión ya calculada")
+    p.set_defaults(func=cmd_pipelines)
+
+    p = sub.add_parser("revectorize", help="Re-vectoriza la biblioteca con una nueva versión del pipeline")
+    p.add_argument("--vector-size", type=int)
+    p.add_argument("--threshold", type=float)
+    p.add_argument("--row-bounds", type=int, nargs=2, metavar=("INICIO", "FIN"))
+    p.add_argument("--method", choices=["mean", "max"])
+    p.add_argument("--workers", type=int, default=None, help="Procesos de vectorización")
+    p.add_argument("--chunk-size", type=int, default=64, help="Muestras por checkpoint")
+    p.add_argument("--no-activate", action="store_true", help="No activar la versión al terminar")
+    p.add_argument("--force", action="store_true",
+                   help="Activar aunque algunas muestras no se hayan podido re-vectorizar")
+    p.set_defaults(func=cmd_revectorize)
+
+    p = sub.add_parser("sweep", help="Evalúa una grilla de parámetros del pipeline")
+    p.add_argument("paths", nargs="*", help=f"Archivos etiquetados (default: {DEFAULT_SAMPLES_PATH})")
+    p.add_argument("--thresholds", type=float, nargs="+")
+    p.add_argument("--row-bounds", type=_parse_row_bounds, nargs="+", help="INICIO:FIN o auto")
+    p.add_argument("--vector-sizes", type=int, nargs="+")
+    p.add_argument("--methods", choices=["mean", "max"], nargs="+")
+    p.add_argument("--workers", type=int, default=None, help="Procesos del pool")
+    p.add_argument("--top-k", type=int, default=3)
+    p.add_argument("--limit", type=int, default=20, help="Combinaciones a mostrar")
+    p.add_argument("--json", action="store_true", help="Salida en formato JSON")
+    p.set_defaults(func=cmd_sweep)
+
+    p = sub.add_parser("evaluate", help="Precisión leave-one-out de la biblioteca")
+    p.add_argument("--top-k", type=int, default=5)
+    p.add_argument("--block-size", type=int, default=1024, help="Filas de la matriz de Gram por bloque")
+    p.add_argument("--pipeline-version", help="Versión a evaluar (por defecto la activa)")
+    p.add_argument("--min-top1", type=float, help="Falla (código 1) si la precisión top-1 es menor")
+    p.add_argument("--json", action="store_true", help="Salida en formato JSON")
+    p.set_defaults(func=cmd_evaluate)
+
+    p = sub.add_parser("dedup", help="Detecta espectros duplicados o casi idénticos")
+    p.add_argument("--umbral", type=float, default=0.995, help="Similitud mínima para considerar duplicado")
+    p.add_argument("--block-size", type=int, default=2048, help="Tamaño de bloque de los productos de matrices")
+    p.add_argument("--lsh", action="store_true", help="Candidatos aproximados por LSH (bibliotecas muy grandes)")
+    p.add_argument("--lsh-bits", type=int, default=16)
+    p.add_argument("--lsh-tables", type=int, default=4)
+    p.add_argument("--delete", action="store_true",
+                   help="Eliminar los duplicados (se conserva la muestra más antigua de cada cluster)")
+    p.add_argument("--incluir-mezclados", action="store_true",
+                   help="Eliminar también en clusters con nombres de mineral distintos")
+    p.add_argument("--json", action="store_true", help="Salida en formato JSON")
+    p.set_defaults(func=cmd_dedup)
+
+    def _add_bulk_filters(p):
+        p.add_argument("--ids", type=int, nargs="+", help="Ids de las muestras")
+        p.add_argument("--prefix", help="Mineral que comienza con (ej. TEMP_COMPARISON_)")
+        p.add_argument("--investigador")
+        p.add_argument("--desde", help="Fecha inicial AAAA-MM-DD")
+        p.add_argument("--hasta", help="Fecha final AAAA-MM-DD (inclusiva)")
+
+    p = sub.add_parser("delete", help="Elimina muestras por ids y/o filtros en una sola transacción")
+    _add_bulk_filters(p)
+    p.set_defaults(func=cmd_delete)
+
+    p = sub.add_parser("relabel", help="Cambia nombre y/o investigador de muestras por ids y/o filtros")
+    _add_bulk_filters(p)
+    p.add_argument("--nombre", help="Nuevo nombre de mineral")
+    p.add_argument("--nuevo-investigador")
+    p.set_defaults(func=cmd_relabel)
+
+    p = sub.add_parser("startup-check", help="Mide el tiempo de arranque del CLI")
+    p.add_argument("--runs", type=int, default=5)
+    p.add_argument("--target-ms", type=float, default=STARTUP_TARGET_MS)
+    p.set_defaults(func=cmd_startup_check)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    # La configuración de la BD se lee al importar src.database.connection,
+    # por eso se fija antes de ejecutar el comando.
+    if args.database_url:
+        os.environ["EDS_DATABASE_URL"] = args.database_url
+    if args.echo_sql:
+        os.environ["EDS_SQL_ECHO"] = "1"
+    else:
+        os.environ.setdefault("EDS_SQL_ECHO", "0")
+    from src.diagnostics import configure_from_args
+
+    configure_from_args(args)
+
+    return args.func(args)
@@ -1,20 +1,38 @@
 # src/database/connection.py
 import os
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 
 # Configuración de base de datos según el entorno
 def get_database_url():
     """Retorna la URL de la base de datos según el entorno."""
+    if os.getenv('EDS_DATABASE_URL'):
+        return os.getenv('EDS_DATABASE_URL')  # URL explícita (CLI, scripts, pruebas de carga)
     if os.getenv('TESTING'):
         return "sqlite:///:memory:"  # Base de datos en memoria para tests
     return "sqlite:///minerales_eds.db"  # Base de datos normal
 
 DATABASE_URL = get_database_url()
 
-# Configurar echo basado en el entorno (silencioso durante tests)
-echo_sql = not bool(os.getenv('TESTING'))
+# Configurar echo basado en el entorno (silencioso durante tests o si EDS_SQL_ECHO=0)
+if os.getenv('EDS_SQL_ECHO') is not None:
+    echo_sql = os.getenv('EDS_SQL_ECHO') not in ('', '0', 'false', 'False')
+else:
+    echo_sql = not bool(os.getenv('TESTING'))
 
-engine = create_engine(DATABASE_URL, echo=echo_sql)
+def enable_sqlite_foreign_keys(engine):
+    """SQLite no aplica las claves foráneas (ni ON DELETE CASCADE) si no se activan por conexión."""
+    if engine.dialect.name != "sqlite":
+        return engine
+
+    @event.listens_for(engine, "connect")
+    def _foreign_keys_on(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+    return engine
+
+engine = enable_sqlite_foreign_keys(create_engine(DATABASE_URL, echo=echo_sql))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
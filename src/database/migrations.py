@@ -0,0 +1,195 @@
+# src/database/migrations.py
+"""
+Migraciones versionadas del esquema.
+
+create_tables ejecuta create_all (tablas nuevas) y luego las migraciones que
+falten según la tabla schema_migrations, cada una en su propia transacción.
+Las migraciones son idempotentes: en una BD recién creada por create_all el
+esquema ya está al día y solo se registran.
+"""
+
+from sqlalchemy import inspect, text
+
+from src.analysis.pipeline import DEFAULT_PARAMS, params_to_json, pipeline_version_id
+
+
+def _versionar_pipeline(conn):
+    """
+    BD creadas antes del versionado del pipeline: agrega la columna
+    pipeline_version, registra la versión por defecto y etiqueta con ella los
+    vectores sin versión. Si ninguna versión está activa, activa la por defecto.
+    """
+    columnas = {c["name"] for c in inspect(conn).get_columns("espectros_vectorizados")}
+    default_id = pipeline_version_id(DEFAULT_PARAMS)
+    if "pipeline_version" not in columnas:
+        conn.execute(text("ALTER TABLE espectros_vectorizados ADD COLUMN pipeline_version VARCHAR"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_espectros_vectorizados_pipeline_version "
+                          "ON espectros_vectorizados (pipeline_version)"))
+    existe = conn.execute(text("SELECT 1 FROM pipeline_versions WHERE id = :id"), {"id": default_id}).first()
+    if existe is None:
+        conn.execute(
+            text("INSERT INTO pipeline_versions (id, params_json, activa, estado) "
+                 "VALUES (:id, :params, 0, 'completa')"),
+            {"id": default_id, "params": params_to_json(DEFAULT_PARAMS)},
+        )
+    conn.execute(text("UPDATE espectros_vectorizados SET pipeline_version = :id "
+                      "WHERE pipeline_version IS NULL"), {"id": default_id})
+    if conn.execute(text("SELECT 1 FROM pipeline_versions WHERE activa")).first() is None:
+        conn.execute(text("UPDATE pipeline_versions SET activa = 1 WHERE id = :id"), {"id": default_id})
+
+
+def _indices_muestras(conn):
+    """Índices para los filtros y el orden del listado de muestras."""
+    for columna in ("nombre_muestra", "investigador", "fecha"):
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_muestras_{columna} ON muestras ({columna})"))
+
+
+def _espectro_unico_en_cascada(conn):
+    """
+    Un espectro por muestra y versión del pipeline (el índice único también
+    sirve las búsquedas por muestra_id) y ON DELETE CASCADE desde muestras.
+    En ambos casos se conservan solo los espectros con muestra y, si hay
+    repetidos, el más reciente. SQLite no permite agregar restricciones a una
+    tabla existente, así que se reconstruye; en los demás motores se usa ALTER.
+    """
+    if conn.dialect.name != "sqlite":
+        _espectro_unico_en_cascada_alter(conn)
+        return
+    sql = conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' "
+                            "AND name = 'espectros_vectorizados'")).scalar() or ""
+    if "ON DELETE CASCADE" in sql.upper():
+        return
+
+    conn.execute(text("DROP TABLE IF EXISTS espectros_vectorizados_nueva"))
+    conn.execute(text("""
+        CREATE TABLE espectros_vectorizados_nueva (
+            id INTEGER NOT NULL,
+            muestra_id INTEGER NOT NULL,
+            vector_json TEXT NOT NULL,
+            pipeline_version VARCHAR,
+            PRIMARY KEY (id),
+            CONSTRAINT uq_espectro_muestra_version UNIQUE (muestra_id, pipeline_version),
+            FOREIGN KEY(muestra_id) REFERENCES muestras (id) ON DELETE CASCADE,
+            FOREIGN KEY(pipeline_version) REFERENCES pipeline_versions (id)
+        )
+    """))
+    conn.execute(text("""
+        INSERT INTO espectros_vectorizados_nueva (id, muestra_id, vector_json, pipeline_version)
+        SELECT id, muestra_id, vector_json, pipeline_version FROM espectros_vectorizados
+        WHERE id IN (SELECT MAX(e.id) FROM espectros_vectorizados e JOIN muestras m ON m.id = e.muestra_id
+                     GROUP BY e.muestra_id, e.pipeline_version)
+    """))
+    conn.execute(text("DROP TABLE espectros_vectorizados"))
+    conn.execute(text("ALTER TABLE espectros_vectorizados_nueva RENAME TO espectros_vectorizados"))
+    conn.execute(text("CREATE INDEX ix_espectros_vectorizados_id ON espectros_vectorizados (id)"))
+    conn.execute(text("CREATE INDEX ix_espectros_vectorizados_pipeline_version "
+                      "ON espectros_vectorizados (pipeline_version)"))
+
+
+def _espectro_unico_en_cascada_alter(conn):
+    """Versión con ALTER TABLE de la migración 3 (PostgreSQL, MySQL y otros)."""
+    conn.execute(text("DELETE FROM espectros_vectorizados WHERE muestra_id IS NULL "
+                      "OR muestra_id NOT IN (SELECT id FROM muestras)"))
+    # La subconsulta derivada evita el error de MySQL al leer la tabla que se borra
+    conn.execute(text("""
+        DELETE FROM espectros_vectorizados WHERE id NOT IN (
+            SELECT id FROM (SELECT MAX(id) AS id FROM espectros_vectorizados
+                            GROUP BY muestra_id, pipeline_version) ultimos)
+    """))
+
+    inspector = inspect(conn)
+    drop_fk = "DROP FOREIGN KEY" if conn.dialect.name in ("mysql", "mariadb") else "DROP CONSTRAINT"
+    en_cascada = False
+    for fk in inspector.get_foreign_keys("espectros_vectorizados"):
+        if fk["referred_table"] != "muestras":
+            continue
+        if (fk.get("options") or {}).get("ondelete", "").upper() == "CASCADE":
+            en_cascada = True
+        elif fk.get("name"):
+            conn.execute(text(f"ALTER TABLE espectros_vectorizados {drop_fk} {fk['name']}"))
+        else:
+            raise RuntimeError("No se puede reemplazar la clave foránea sin nombre de "
+                               "espectros_vectorizados.muestra_id; agregue ON DELETE CASCADE a mano.")
+    if not en_cascada:
+        conn.execute(text("ALTER TABLE espectros_vectorizados ADD CONSTRAINT fk_espectro_muestra "
+                          "FOREIGN KEY (muestra_id) REFERENCES muestras (id) ON DELETE CASCADE"))
+
+    unicas = {u["name"] for u in inspector.get_unique_constraints("espectros_vectorizados")}
+    if "uq_espectro_muestra_version" not in unicas:
+        conn.execute(text("ALTER TABLE espectros_vectorizados ADD CONSTRAINT uq_espectro_muestra_version "
+                          "UNIQUE (muestra_id, pipeline_version)"))
+
+
+def _version_biblioteca(conn):
+    """
+    Contador persistente de versión de la biblioteca (tabla library_state):
+    los triggers lo incrementan con cada inserción, actualización o eliminación
+    de muestras y espectros y con cada cambio de la versión activa, sin importar
+    qué proceso hizo el cambio. Las cachés lo usan para invalidarse. Los
+    triggers son solo de SQLite; en los demás motores lo incrementan las
+    sesiones de la aplicación (ver models._bump_library_version).
+    """
+    if conn.execute(text("SELECT 1 FROM library_state WHERE id = 1")).first() is None:
+        conn.execute(text("INSERT INTO library_state (id, version) VALUES (1, 0)"))
+    if conn.dialect.name != "sqlite":
+        return
+    bump = "UPDATE library_state SET version = version + 1 WHERE id = 1;"
+    for tabla in ("muestras", "espectros_vectorizados"):
+        for evento in ("INSERT", "UPDATE", "DELETE"):
+            conn.execute(text(f"CREATE TRIGGER IF NOT EXISTS tr_{tabla}_{evento.lower()}_version "
+                              f"AFTER {evento} ON {tabla} BEGIN {bump} END"))
+    conn.execute(text("CREATE TRIGGER IF NOT EXISTS tr_pipeline_versions_activa_version "
+                      f"AFTER UPDATE OF activa ON pipeline_versions BEGIN {bump} END"))
+
+
+def _representacion_espectros(conn):
+    """
+    Representación de cada vector (ver src/analysis/pipeline.py). Los vectores
+    existentes quedan como perfil_imagen salvo los de archivos EMSA/MSA/CSV
+    (conteos por energía). Los de gráficos nativos de Word no se distinguen por
+    la ruta: quedan como perfil_imagen hasta re-vectorizarlos.
+    """
+    columnas = {c["name"] for c in inspect(conn).get_columns("espectros_vectorizados")}
+    if "representacion" not in columnas:
+        conn.execute(text("ALTER TABLE espectros_vectorizados ADD COLUMN representacion VARCHAR "
+                          "NOT NULL DEFAULT 'perfil_imagen'"))
+        conn.execute(text("""
+            UPDATE espectros_vectorizados SET representacion = 'conteos_energia'
+            WHERE muestra_id IN (SELECT id FROM muestras WHERE lower(ruta_imagen) LIKE '%.msa'
+                                 OR lower(ruta_imagen) LIKE '%.emsa' OR lower(ruta_imagen) LIKE '%.csv')
+        """))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_espectros_vectorizados_representacion "
+                      "ON espectros_vectorizados (representacion)"))
+
+
+# (versión, nombre, función): nunca se modifican las ya publicadas, solo se agregan nuevas
+MIGRATIONS = [
+    (1, "versiones_pipeline", _versionar_pipeline),
+    (2, "indices_muestras", _indices_muestras),
+    (3, "espectro_unico_en_cascada", _espectro_unico_en_cascada),
+    (4, "version_biblioteca", _version_biblioteca),
+    (5, "representacion_espectros", _representacion_espectros),
+]
+
+
+def applied_migrations(bind):
+    """Versiones ya aplicadas en la BD."""
+    with bind.connect() as conn:
+        return {v for (v,) in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def apply_migrations(bind, log=None):
+    """Aplica las migraciones pendientes en orden. Retorna las versiones aplicadas."""
+    aplicadas = applied_migrations(bind)
+    nuevas = []
+    for version, nombre, migracion in MIGRATIONS:
+        if version in aplicadas:
+            continue
+        with bind.begin() as conn:
+            migracion(conn)
+            conn.execute(text("INSERT INTO schema_migrations (version, nombre) VALUES (:v, :n)"),
+                         {"v": version, "n": nombre})
+        nuevas.append(version)
+        if log:
+            log(f"migración {version} ({nombre}) aplicada")
+    return nuevas
@@ -1,10 +1,10 @@
 # src/database/models.py
 import json
 
-from sqlalchemy import (Column, DateTime, ForeignKey, Integer, String, Text,
-                        func)
+from sqlalchemy import (Boolean, Column, DateTime, Float, ForeignKey, Integer,
+                        String, Text, UniqueConstraint, event, func, update)
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import Session, relationship
 
 from .connection import engine
 
@@ -14,23 +14,33 @@ class Muestra(Base):
     __tablename__ = "muestras"
 
     id = Column(Integer, primary_key=True, index=True)
-    nombre_muestra = Column(String, nullable=False)
-    fecha = Column(DateTime(timezone=True), server_default=func.now())
-    investigador = Column(String, nullable=True)
+    nombre_muestra = Column(String, nullable=False, index=True)
+    fecha = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    investigador = Column(String, nullable=True, index=True)
     ruta_imagen = Column(String, nullable=True)
 
-    # Relación con la tabla de espectros vectorizados
-    espectro_vector = relationship("EspectroVectorizado", uselist=False, back_populates="muestra")
+    # Relación con los espectros vectorizados (uno por versión del pipeline).
+    # La BD los elimina en cascada junto con la muestra (ON DELETE CASCADE).
+    espectros = relationship("EspectroVectorizado", back_populates="muestra",
+                             cascade="all, delete-orphan", passive_deletes=True)
 
 class EspectroVectorizado(Base):
     __tablename__ = "espectros_vectorizados"
+    # Un espectro por muestra y versión; el índice único también sirve las búsquedas por muestra_id
+    __table_args__ = (UniqueConstraint("muestra_id", "pipeline_version", name="uq_espectro_muestra_version"),)
 
     id = Column(Integer, primary_key=True, index=True)
-    muestra_id = Column(Integer, ForeignKey("muestras.id"))
+    muestra_id = Column(Integer, ForeignKey("muestras.id", ondelete="CASCADE"), nullable=False)
     # Almacenamos el vector como JSON string (compatible con SQLite)
     vector_json = Column(Text, nullable=False)
+    # Versión del pipeline que generó el vector (ver src/analysis/pipeline.py)
+    pipeline_version = Column(String, ForeignKey("pipeline_versions.id"), nullable=True, index=True)
+    # Representación del vector (perfil de imagen, conteos por energía o serie de
+    # gráfico): solo se comparan vectores de la misma
+    representacion = Column(String, nullable=False, default="perfil_imagen", server_default="perfil_imagen",
+                            index=True)
 
-    muestra = relationship("Muestra", back_populates="espectro_vector")
+    muestra = relationship("Muestra", back_populates="espectros")
 
     @property
     def vector(self):
@@ -44,3 +54,89 @@ class EspectroVectorizado(Base):
         if isinstance(value, np.ndarray):
             value = value.tolist()
         self.vector_json = json.dumps(value)
+
+
+class PipelineVersion(Base):
+    __tablename__ = "pipeline_versions"
+
+    # Hash de los parámetros (pipeline_version_id)
+    id = Column(String, primary_key=True)
+    params_json = Column(Text, nullable=False)
+    # Solo una versión está activa: es la que usan búsquedas, listados y estadísticas
+    activa = Column(Boolean, nullable=False, default=False)
+    # 'en_proceso' mientras se re-vectoriza, 'completa' cuando todas las muestras tienen vector
+    estado = Column(String, nullable=False, default="en_proceso")
+    creada = Column(DateTime(timezone=True), server_default=func.now())
+    activada = Column(DateTime(timezone=True), nullable=True)
+
+    @property
+    def params(self):
+        from src.analysis.pipeline import params_from_json
+        return params_from_json(self.params_json)
+
+
+class SchemaMigration(Base):
+    """Migraciones del esquema ya aplicadas (ver src/database/migrations.py)."""
+    __tablename__ = "schema_migrations"
+
+    version = Column(Integer, primary_key=True)
+    nombre = Column(String, nullable=False)
+    aplicada = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class LibraryState(Base):
+    """
+    Fila única con el contador de versión de la biblioteca. Lo incrementan los
+    triggers de SQLite (cambios de cualquier proceso) y, en cualquier motor,
+    las sesiones de la aplicación (ver _bump_library_version).
+    """
+    __tablename__ = "library_state"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+class EstadoIngesta(Base):
+    """Estado de ingesta de cada archivo (checkpoint y cuarentena de populate_database.py)."""
+    __tablename__ = "ingestion_status"
+
+    # Ruta absoluta del archivo de origen
+    ruta = Column(String, primary_key=True)
+    # Tamaño y fecha de modificación al procesarlo (detecta archivos que cambiaron)
+    tamano = Column(Integer, nullable=True)
+    mtime = Column(Float, nullable=True)
+    # 'ok', 'sin_espectro', 'error' o 'timeout'
+    estado = Column(String, nullable=False, index=True)
+    mensaje = Column(Text, nullable=True)
+    intentos = Column(Integer, nullable=False, default=0)
+    muestra_id = Column(Integer, ForeignKey("muestras.id", ondelete="SET NULL"), nullable=True)
+    actualizado = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+# Tablas cuyos cambios invalidan las cachés de resultados
+_TABLAS_BIBLIOTECA = {"muestras", "espectros_vectorizados", "pipeline_versions"}
+
+
+def _bump_library_version(session):
+    session.connection().execute(
+        update(LibraryState).where(LibraryState.id == 1).values(version=LibraryState.version + 1)
+    )
+
+
+@event.listens_for(Session, "after_flush")
+def _version_tras_flush(session, flush_context):
+    """Incrementa la versión si el flush tocó muestras, espectros o versiones del pipeline."""
+    tablas = {obj.__tablename__ for obj in session.new | session.deleted}
+    tablas |= {obj.__tablename__ for obj in session.dirty if session.is_modified(obj)}
+    if tablas & _TABLAS_BIBLIOTECA:
+        _bump_library_version(session)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _version_tras_dml(orm_execute_state):
+    """Lo mismo para INSERT/UPDATE/DELETE por lotes (query.delete(), insert(Muestra), ...)."""
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    tabla = getattr(orm_execute_state.statement, "table", None)
+    if tabla is not None and tabla.name in _TABLAS_BIBLIOTECA:
+        _bump_library_version(orm_execute_state.session)
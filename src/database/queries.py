@@ -1,15 +1,84 @@
 # src/database/queries.py
 import json
+from datetime import datetime, timedelta
 
-import numpy as np
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 
+from src.analysis.pipeline import DEFAULT_PARAMS, PERFIL_IMAGEN, params_to_json, pipeline_version_id
+
 from .connection import SessionLocal, engine
-from .models import Base, EspectroVectorizado, Muestra
+from .migrations import apply_migrations
+from .models import Base, EspectroVectorizado, LibraryState, Muestra, PipelineVersion
+
+
+def get_library_version(session: Session):
+    """
+    Retorna la versión actual de la biblioteca: un contador guardado en la BD
+    que aumenta con cada inserción, actualización o eliminación, hecha desde
+    cualquier proceso (sesiones de la aplicación en cualquier motor, y además
+    triggers de la migración 4 en SQLite). Se usa para invalidar cachés.
+    """
+    return session.query(LibraryState.version).filter(LibraryState.id == 1).scalar() or 0
+
+def create_tables(bind=None):
+    """
+    Crea las tablas en la BD principal o en la indicada por bind (p. ej. un
+    shard) y aplica las migraciones pendientes del esquema.
+    """
+    bind = bind if bind is not None else engine
+    Base.metadata.create_all(bind=bind)
+    apply_migrations(bind)
+
+def get_active_pipeline(session: Session):
+    """Retorna la PipelineVersion activa (la que usan búsquedas, listados y estadísticas)."""
+    return session.query(PipelineVersion).filter(PipelineVersion.activa.is_(True)).first()
 
+def get_active_pipeline_version(session: Session):
+    """Retorna el id de la versión activa del pipeline."""
+    activa = get_active_pipeline(session)
+    return activa.id if activa is not None else pipeline_version_id(DEFAULT_PARAMS)
 
-def create_tables():
-    Base.metadata.create_all(bind=engine)
+def get_active_pipeline_params(session: Session):
+    """Retorna los parámetros de vectorización de la versión activa."""
+    activa = get_active_pipeline(session)
+    return activa.params if activa is not None else dict(DEFAULT_PARAMS)
+
+def list_pipeline_versions(session: Session):
+    return session.query(PipelineVersion).order_by(PipelineVersion.creada, PipelineVersion.id).all()
+
+def register_pipeline_version(session: Session, params):
+    """Registra (si no existe) la versión del pipeline para estos parámetros y la retorna."""
+    version_id = pipeline_version_id(params)
+    version = session.get(PipelineVersion, version_id)
+    if version is None:
+        version = PipelineVersion(id=version_id, params_json=params_to_json(params),
+                                  activa=False, estado="en_proceso")
+        session.add(version)
+        session.commit()
+    return version
+
+def activate_pipeline_version(session: Session, version_id: str):
+    """
+    Activa una versión del pipeline en una sola transacción: a partir del
+    commit todas las búsquedas usan solo los vectores de esa versión.
+    """
+    version = session.get(PipelineVersion, version_id)
+    if version is None:
+        raise ValueError(f"No existe la versión de pipeline {version_id}.")
+    session.query(PipelineVersion).filter(PipelineVersion.id != version_id).update(
+        {PipelineVersion.activa: False}, synchronize_session=False
+    )
+    version.activa = True
+    version.activada = func.now()
+    session.commit()
+    return version
+
+def _join_espectros_activos(session: Session, query):
+    """Une la consulta con los espectros de la versión activa del pipeline."""
+    return query.join(EspectroVectorizado).filter(
+        EspectroVectorizado.pipeline_version == get_active_pipeline_version(session)
+    )
 
 def insert_muestra(session: Session, nombre_muestra: str, investigador: str = None, ruta_imagen: str = None):
     nueva = Muestra(
@@ -22,12 +91,17 @@ def insert_muestra(session: Session, nombre_muestra: str, investigador: str = No
     session.refresh(nueva)
     return nueva
 
-def insert_espectro(session: Session, muestra_id: int, vector):
+def insert_espectro(session: Session, muestra_id: int, vector, pipeline_version: str = None,
+                    representacion: str = PERFIL_IMAGEN):
     """
     Crea un EspectroVectorizado asociado a la muestra y retorna el objeto.
     'vector' debe ser una lista (o np.array) con floats normalizados.
+    pipeline_version por defecto es la versión activa.
     """
-    e = EspectroVectorizado(muestra_id=muestra_id)
+    if pipeline_version is None:
+        pipeline_version = get_active_pipeline_version(session)
+    e = EspectroVectorizado(muestra_id=muestra_id, pipeline_version=pipeline_version,
+                            representacion=representacion)
     e.vector = vector  # Usa el setter que convierte a JSON
     session.add(e)
     session.commit()
@@ -40,16 +114,88 @@ def get_all_muestras(session: Session):
 def get_muestra_by_id(session: Session, muestra_id: int):
     return session.query(Muestra).filter(Muestra.id == muestra_id).first()
 
-def get_espectro_by_muestra_id(session: Session, muestra_id: int):
-    return session.query(EspectroVectorizado).filter_by(muestra_id=muestra_id).first()
+def get_espectro_by_muestra_id(session: Session, muestra_id: int, pipeline_version: str = None):
+    """Retorna el espectro de la muestra en la versión indicada (por defecto la activa)."""
+    if pipeline_version is None:
+        pipeline_version = get_active_pipeline_version(session)
+    return (session.query(EspectroVectorizado)
+            .filter_by(muestra_id=muestra_id, pipeline_version=pipeline_version)
+            .first())
 
 def count_muestras(session: Session):
     """Retorna el número total de muestras en la base de datos."""
     return session.query(Muestra).count()
 
+def count_muestras_with_vectors(session: Session):
+    """Retorna el número de muestras que tienen un espectro asociado."""
+    return _join_espectros_activos(session, session.query(func.count(func.distinct(Muestra.id)))).scalar()
+
 def get_all_muestras_with_vectors(session: Session):
     """Retorna todas las muestras que tienen vectores asociados."""
-    return session.query(Muestra).join(EspectroVectorizado).all()
+    return _join_espectros_activos(session, session.query(Muestra)).all()
+
+def _escape_like(value: str):
+    """Escapa los comodines de LIKE para búsquedas por prefijo."""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def _filter_muestras(query, nombre_prefix: str = None, investigador: str = None,
+                     fecha_desde=None, fecha_hasta=None):
+    """
+    Aplica los filtros comunes de listados de muestras.
+    fecha_hasta es inclusiva: si es una fecha (sin hora) incluye todo ese día.
+    """
+    if nombre_prefix:
+        query = query.filter(Muestra.nombre_muestra.like(f"{_escape_like(nombre_prefix)}%", escape="\\"))
+    if investigador:
+        query = query.filter(Muestra.investigador == investigador)
+    if fecha_desde is not None:
+        if not isinstance(fecha_desde, datetime):
+            fecha_desde = datetime.combine(fecha_desde, datetime.min.time())
+        query = query.filter(Muestra.fecha >= fecha_desde)
+    if fecha_hasta is not None:
+        if isinstance(fecha_hasta, datetime):
+            query = query.filter(Muestra.fecha <= fecha_hasta)
+        else:
+            siguiente_dia = datetime.combine(fecha_hasta + timedelta(days=1), datetime.min.time())
+            query = query.filter(Muestra.fecha < siguiente_dia)
+    return query
+
+def get_muestras_page(session: Session, nombre_prefix: str = None, investigador: str = None,
+                      fecha_desde=None, fecha_hasta=None, after_id: int = None, limit: int = 50,
+                      solo_con_espectro: bool = True):
+    """
+    Retorna una página de muestras ordenadas por id (paginación por cursor/keyset).
+
+    Retorna (muestras, next_after_id): next_after_id es el cursor para pedir la
+    página siguiente, o None si no hay más resultados.
+    """
+    query = session.query(Muestra)
+    if solo_con_espectro:
+        query = _join_espectros_activos(session, query)
+    query = _filter_muestras(query, nombre_prefix, investigador, fecha_desde, fecha_hasta)
+    if after_id is not None:
+        query = query.filter(Muestra.id > after_id)
+
+    muestras = query.order_by(Muestra.id).limit(limit + 1).all()
+    if len(muestras) > limit:
+        return muestras[:limit], muestras[limit - 1].id
+    return muestras, None
+
+def count_muestras_filtered(session: Session, nombre_prefix: str = None, investigador: str = None,
+                            fecha_desde=None, fecha_hasta=None, solo_con_espectro: bool = True):
+    """Cuenta las muestras que cumplen los filtros de get_muestras_page."""
+    query = session.query(Muestra.id)
+    if solo_con_espectro:
+        query = _join_espectros_activos(session, query)
+    return _filter_muestras(query, nombre_prefix, investigador, fecha_desde, fecha_hasta).count()
+
+def get_investigadores(session: Session):
+    """Retorna la lista ordenada de investigadores distintos."""
+    rows = (session.query(Muestra.investigador)
+            .filter(Muestra.investigador.isnot(None))
+            .distinct()
+            .order_by(Muestra.investigador))
+    return [investigador for (investigador,) in rows]
 
 def update_muestra(session: Session, muestra_id: int, nombre_muestra: str = None, investigador: str = None):
     """Actualiza los campos de una muestra existente."""
@@ -67,16 +213,70 @@ def update_muestra(session: Session, muestra_id: int, nombre_muestra: str = None
     return muestra
 
 def delete_muestra(session: Session, muestra_id: int):
-    """Elimina una muestra y su espectro asociado de la base de datos."""
-    # Primero eliminar el espectro asociado
-    espectro = session.query(EspectroVectorizado).filter_by(muestra_id=muestra_id).first()
-    if espectro:
-        session.delete(espectro)
-    
-    # Luego eliminar la muestra
-    muestra = session.query(Muestra).filter(Muestra.id == muestra_id).first()
-    if muestra:
-        session.delete(muestra)
+    """Elimina una muestra; sus espectros (de todas las versiones) se eliminan en cascada."""
+    return delete_muestras(session, ids=[muestra_id]) > 0
+
+# Ids por sentencia IN (...) en las operaciones masivas (límite de variables de SQLite)
+BULK_CHUNK = 10000
+
+def _bulk_muestras(session: Session, ids=None, solo_con_espectro: bool = False, **filtros):
+    """
+    Consultas sobre las muestras indicadas por ids y/o filtros de _filter_muestras.
+    Exige al menos uno de los dos para no modificar toda la tabla por error.
+    solo_con_espectro restringe a las mismas muestras que cuenta
+    count_muestras_filtered (con espectro de la versión activa); se aplica como
+    subconsulta porque UPDATE/DELETE masivos no admiten joins.
+    """
+    if ids is None and not any(filtros.values()):
+        raise ValueError("Indique ids o al menos un filtro (no se modifican todas las muestras).")
+    query = _filter_muestras(session.query(Muestra), **filtros)
+    if solo_con_espectro:
+        con_espectro = _join_espectros_activos(session, session.query(Muestra.id))
+        query = query.filter(Muestra.id.in_(con_espectro.scalar_subquery()))
+    if ids is None:
+        return [query]
+    ids = sorted(set(ids))
+    return [query.filter(Muestra.id.in_(ids[i:i + BULK_CHUNK])) for i in range(0, len(ids), BULK_CHUNK)]
+
+def delete_muestras(session: Session, ids=None, nombre_prefix: str = None, investigador: str = None,
+                    fecha_desde=None, fecha_hasta=None, solo_con_espectro: bool = False):
+    """
+    Elimina en una sola transacción las muestras por lista de ids y/o filtros
+    (p. ej. nombre_prefix="TEMP_COMPARISON_"). Los espectros se eliminan en
+    cascada. solo_con_espectro: ver _bulk_muestras. Retorna el número de
+    muestras eliminadas.
+    """
+    consultas = _bulk_muestras(session, ids, solo_con_espectro, nombre_prefix=nombre_prefix,
+                               investigador=investigador, fecha_desde=fecha_desde, fecha_hasta=fecha_hasta)
+    try:
+        eliminadas = sum(q.delete(synchronize_session=False) for q in consultas)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    return eliminadas
+
+def update_muestras(session: Session, ids=None, nombre_muestra: str = None, nuevo_investigador: str = None,
+                    nombre_prefix: str = None, investigador: str = None, fecha_desde=None, fecha_hasta=None,
+                    solo_con_espectro: bool = False):
+    """
+    Cambia el nombre y/o el investigador de las muestras por lista de ids y/o
+    filtros en una sola transacción. solo_con_espectro: ver _bulk_muestras.
+    Retorna el número de muestras actualizadas.
+    """
+    valores = {}
+    if nombre_muestra is not None:
+        valores[Muestra.nombre_muestra] = nombre_muestra
+    if nuevo_investigador is not None:
+        valores[Muestra.investigador] = nuevo_investigador
+    if not valores:
+        return 0
+    consultas = _bulk_muestras(session, ids, solo_con_espectro, nombre_prefix=nombre_prefix,
+                               investigador=investigador, fecha_desde=fecha_desde, fecha_hasta=fecha_hasta)
+    try:
+        actualizadas = sum(q.update(valores, synchronize_session=False) for q in consultas)
         session.commit()
-        return True
-    return False
+    except Exception:
+        session.rollback()
+        raise
+    return actualizadas
@@ -0,0 +1,236 @@
+# src/database/shards.py
+"""
+Biblioteca particionada en varias BD SQLite (shards).
+
+Un archivo de registro JSON (por defecto shards.json, o EDS_SHARDS_FILE) lista
+los shards y la regla de partición:
+
+    {"particion": "hash",
+     "shards": [{"nombre": "a", "url": "sqlite:////datos/shard_a.db", "grupos": []}, ...]}
+
+  - hash: cada mineral va al shard de mayor peso hash(shard, nombre)
+    (rendezvous hashing; todas las muestras de un mineral quedan juntas).
+  - grupo: el mineral va al shard que lo lista en "grupos"; los que no están en
+    ningún grupo se reparten por hash entre los shards sin grupos.
+
+Cada shard es una BD completa con el esquema de la biblioteca. Las búsquedas
+consultan todos los shards (ver src/analysis/sharded.py), así que agregar un
+shard solo cambia a dónde van las inserciones nuevas: no hay que mover datos
+ni detener el servicio, que relee el registro cuando cambia. Con rendezvous
+hashing el shard nuevo solo se lleva los minerales que gana (~1/N); sus
+muestras viejas quedan en el shard anterior, por eso la deduplicación de las
+inserciones revisa los hashes de contenido de todos los shards.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+DEFAULT_REGISTRY_PATH = "shards.json"
+PARTICIONES = ("hash", "grupo")
+
+# Motores por URL (uno por shard y proceso)
+_engines = {}
+
+
+def get_registry_path(path=None):
+    """Ruta del registro: la indicada, EDS_SHARDS_FILE o shards.json."""
+    return path or os.getenv("EDS_SHARDS_FILE") or DEFAULT_REGISTRY_PATH
+
+
+def load_registry(path=None):
+    """Lee el registro de shards (vacío si el archivo no existe)."""
+    path = get_registry_path(path)
+    if not os.path.exists(path):
+        return {"particion": "hash", "shards": []}
+    with open(path, encoding="utf-8") as f:
+        registry = json.load(f)
+    registry.setdefault("particion", "hash")
+    registry.setdefault("shards", [])
+    return registry
+
+
+def save_registry(registry, path=None):
+    """Escribe el registro de forma atómica (los lectores nunca ven un archivo a medias)."""
+    path = get_registry_path(path)
+    directorio = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directorio, prefix=".shards-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(registry, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def shard_url(destino):
+    """Acepta una URL de SQLAlchemy o la ruta de un archivo SQLite."""
+    if "://" in destino:
+        return destino
+    return f"sqlite:///{os.path.abspath(destino)}"
+
+
+def get_engine(url):
+    engine = _engines.get(url)
+    if engine is None:
+        from .connection import echo_sql, enable_sqlite_foreign_keys
+
+        engine = _engines[url] = enable_sqlite_foreign_keys(create_engine(url, echo=echo_sql))
+    return engine
+
+
+def shard_session(url) -> Session:
+    """Abre una sesión sobre la BD de un shard."""
+    return sessionmaker(autocommit=False, autoflush=False, bind=get_engine(url))()
+
+
+def add_shard(nombre, destino, grupos=None, particion=None, path=None):
+    """
+    Crea (si no existe) la BD del shard con el esquema de la biblioteca y lo
+    agrega al registro. Retorna la entrada agregada.
+    """
+    from .queries import create_tables
+
+    registry = load_registry(path)
+    if any(s["nombre"] == nombre for s in registry["shards"]):
+        raise ValueError(f"Ya existe un shard llamado {nombre!r}.")
+    if particion is not None:
+        if particion not in PARTICIONES:
+            raise ValueError(f"Partición desconocida: {particion!r} (use {' o '.join(PARTICIONES)}).")
+        registry["particion"] = particion
+
+    url = shard_url(destino)
+    create_tables(get_engine(url))
+    entrada = {"nombre": nombre, "url": url, "grupos": sorted({g.upper() for g in grupos or []})}
+    registry["shards"].append(entrada)
+    save_registry(registry, path)
+    return entrada
+
+
+def route(registry, nombre_muestra):
+    """Retorna la entrada del shard que le corresponde a un mineral."""
+    shards = registry["shards"]
+    if not shards:
+        raise ValueError("El registro no tiene shards (ver python -m src shards add).")
+    clave = (nombre_muestra or "").upper()
+    candidatos = shards
+    if registry.get("particion") == "grupo":
+        for shard in shards:
+            if clave in shard.get("grupos", ()):
+                return shard
+        candidatos = [s for s in shards if not s.get("grupos")] or shards
+    return max(candidatos, key=lambda shard: _peso(shard["nombre"], clave))
+
+
+def _peso(nombre_shard, clave):
+    """Peso de rendezvous hashing de un mineral en un shard."""
+    digest = hashlib.blake2b(f"{nombre_shard}\0{clave}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def distribute_batches(lotes, params, path=None, investigador=None, log=None):
+    """
+    Reparte lotes (columnas, vectores) con el formato de transfer.iter_bundle
+    entre los shards del registro. Cada shard recibe sus filas con inserciones
+    por lotes en su propia BD; las muestras cuyo hash de contenido ya existe en
+    cualquier shard se omiten, de modo que repetir la operación (también después
+    de agregar un shard) no duplica datos.
+    Retorna {"insertadas": {shard: n}, "duplicadas": n, "pipeline_version": id}.
+    """
+    from datetime import datetime
+
+    from src.analysis.pipeline import PERFIL_IMAGEN
+
+    from .models import EspectroVectorizado
+    from .queries import activate_pipeline_version, get_active_pipeline_version, register_pipeline_version
+    from .transfer import _existing_hashes, bulk_insert, content_hash
+
+    registry = load_registry(path)
+    if not registry["shards"]:
+        raise ValueError("El registro no tiene shards (ver python -m src shards add).")
+    sesiones, vistos = {}, set()
+    resumen = {"insertadas": {s["nombre"]: 0 for s in registry["shards"]}, "duplicadas": 0,
+               "pipeline_version": None}
+    ahora = datetime.now()
+    try:
+        for shard in registry["shards"]:
+            session = sesiones[shard["nombre"]] = shard_session(shard["url"])
+            version = register_pipeline_version(session, params)
+            resumen["pipeline_version"] = version.id
+            vistos |= _existing_hashes(session, version.id)
+
+        for columnas, vectores in lotes:
+            por_shard = {}
+            for i, vector in enumerate(vectores):
+                nombre = columnas["nombre_muestra"][i]
+                shard = route(registry, nombre)
+                digest = content_hash(nombre, vector)
+                if digest in vistos:
+                    resumen["duplicadas"] += 1
+                    continue
+                vistos.add(digest)
+                fecha = columnas["fecha"][i]
+                filas, nuevos, representaciones = por_shard.setdefault(shard["nombre"], ([], [], []))
+                filas.append({
+                    "nombre_muestra": nombre,
+                    "investigador": investigador or columnas["investigador"][i],
+                    "fecha": datetime.fromisoformat(fecha) if fecha else ahora,
+                    "ruta_imagen": columnas["ruta_imagen"][i],
+                })
+                nuevos.append(vector)
+                representaciones.append(columnas["representacion"][i] or PERFIL_IMAGEN)
+
+            for nombre_shard, (filas, nuevos, representaciones) in por_shard.items():
+                session = sesiones[nombre_shard]
+                bulk_insert(session, filas, nuevos, resumen["pipeline_version"], representaciones)
+                session.commit()
+                resumen["insertadas"][nombre_shard] += len(filas)
+            if log:
+                log(f"insertadas {sum(resumen['insertadas'].values())} (duplicadas {resumen['duplicadas']})")
+
+        # Un shard nuevo arranca con la versión por defecto: si su versión activa
+        # no tiene vectores, se activa la de los datos recibidos
+        for nombre_shard, session in sesiones.items():
+            activa = get_active_pipeline_version(session)
+            if activa == resumen["pipeline_version"] or not resumen["insertadas"][nombre_shard]:
+                continue
+            if session.query(EspectroVectorizado.id).filter(EspectroVectorizado.pipeline_version == activa).first():
+                if log:
+                    log(f"{nombre_shard}: los vectores recibidos no son de la versión activa ({activa})")
+            else:
+                activate_pipeline_version(session, resumen["pipeline_version"])
+    finally:
+        for session in sesiones.values():
+            session.close()
+    return resumen
+
+
+def partition_library(session: Session, path=None, batch_size=5000, log=None):
+    """Copia la versión activa de la BD principal a los shards del registro."""
+    from .queries import get_active_pipeline_params, get_active_pipeline_version
+    from .transfer import _iter_library_batches
+
+    params = get_active_pipeline_params(session)
+    lotes = _iter_library_batches(session, get_active_pipeline_version(session), batch_size)
+    return distribute_batches(lotes, params, path=path, log=log)
+
+
+def shard_status(path=None):
+    """Retorna por shard su URL, grupos, versión activa y número de muestras de esa versión."""
+    from .queries import count_muestras_with_vectors, get_active_pipeline_version
+
+    estado = []
+    for shard in load_registry(path)["shards"]:
+        session = shard_session(shard["url"])
+        try:
+            estado.append({**shard, "pipeline_version": get_active_pipeline_version(session),
+                           "muestras": count_muestras_with_vectors(session)})
+        finally:
+            session.close()
+    return estado
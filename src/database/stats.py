@@ -0,0 +1,119 @@
+# src/database/stats.py
+"""
+Estadísticas de la biblioteca calculadas con agregados SQL.
+
+Los resultados se guardan en caché por proceso y se invalidan cuando cambia la
+versión de la biblioteca, que se guarda en la BD y aumenta con cualquier
+inserción, actualización o eliminación (también las hechas por otros procesos,
+p. ej. populate_database.py). STATS_TTL_SECONDS es solo un límite adicional.
+"""
+
+import copy
+import threading
+import time
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from .models import EspectroVectorizado, Muestra
+from .queries import (count_muestras, count_muestras_with_vectors, get_active_pipeline_version,
+                      get_library_version)
+
+STATS_TTL_SECONDS = 60
+
+# Formatos de strftime (SQLite, MySQL) y to_char (PostgreSQL) para los histogramas por fecha
+DATE_GRANULARITIES = {
+    "day": "%Y-%m-%d",
+    "month": "%Y-%m",
+    "year": "%Y",
+}
+PG_DATE_FORMATS = {
+    "day": "YYYY-MM-DD",
+    "month": "YYYY-MM",
+    "year": "YYYY",
+}
+
+_cache_lock = threading.Lock()
+_cache = {}
+
+
+def count_by_mineral(session: Session, limit: int = None):
+    """Retorna [(nombre_muestra, cantidad)] ordenado por cantidad descendente."""
+    query = (session.query(Muestra.nombre_muestra, func.count(Muestra.id))
+             .group_by(Muestra.nombre_muestra)
+             .order_by(func.count(Muestra.id).desc(), Muestra.nombre_muestra))
+    if limit is not None:
+        query = query.limit(limit)
+    return [(nombre, cantidad) for nombre, cantidad in query]
+
+
+def count_by_investigador(session: Session):
+    """Retorna [(investigador, cantidad)] ordenado por cantidad descendente."""
+    query = (session.query(Muestra.investigador, func.count(Muestra.id))
+             .group_by(Muestra.investigador)
+             .order_by(func.count(Muestra.id).desc()))
+    return [(investigador or "N/A", cantidad) for investigador, cantidad in query]
+
+
+def histogram_by_date(session: Session, granularity: str = "month"):
+    """Retorna [(periodo, cantidad)] en orden cronológico ('day', 'month' o 'year')."""
+    if granularity not in DATE_GRANULARITIES:
+        raise ValueError(f"Granularidad no soportada: {granularity}")
+    periodo = _date_period(session.get_bind().dialect.name, granularity)
+    query = (session.query(periodo, func.count(Muestra.id))
+             .filter(Muestra.fecha.isnot(None))
+             .group_by(periodo)
+             .order_by(periodo))
+    return [(p, cantidad) for p, cantidad in query]
+
+
+def _date_period(dialect, granularity):
+    """Expresión SQL con el periodo ('2024-05', ...) de Muestra.fecha según el motor."""
+    if dialect == "postgresql":
+        return func.to_char(Muestra.fecha, PG_DATE_FORMATS[granularity])
+    if dialect in ("mysql", "mariadb"):
+        return func.date_format(Muestra.fecha, DATE_GRANULARITIES[granularity])
+    return func.strftime(DATE_GRANULARITIES[granularity], Muestra.fecha)
+
+
+def _compute_stats(session: Session, granularity: str):
+    pipeline_version = get_active_pipeline_version(session)
+    return {
+        "pipeline_version": pipeline_version,
+        "total_muestras": count_muestras(session),
+        "muestras_con_espectro": count_muestras_with_vectors(session),
+        "total_espectros": (session.query(func.count(EspectroVectorizado.id))
+                            .filter(EspectroVectorizado.pipeline_version == pipeline_version)
+                            .scalar()),
+        "minerales_distintos": session.query(func.count(func.distinct(Muestra.nombre_muestra))).scalar(),
+        "por_mineral": count_by_mineral(session),
+        "por_investigador": count_by_investigador(session),
+        "por_fecha": histogram_by_date(session, granularity),
+    }
+
+
+def get_database_stats(session: Session, granularity: str = "month", use_cache: bool = True):
+    """
+    Retorna un diccionario con las estadísticas de la biblioteca.
+    Se recalcula solo si cambió la versión de la biblioteca o expiró el TTL.
+    La caché distingue cada BD del proceso (shards, destinos de importación) y
+    retorna copias, de modo que el llamador puede modificar el resultado.
+    """
+    key = (str(session.get_bind().url), granularity)
+    version = get_library_version(session)
+    now = time.monotonic()
+    with _cache_lock:
+        entry = _cache.get(key)
+        if use_cache and entry and entry[0] == version and now - entry[1] < STATS_TTL_SECONDS:
+            return copy.deepcopy(entry[2])
+
+    stats = _compute_stats(session, granularity)
+    with _cache_lock:
+        _cache[key] = (version, now, stats)
+    return copy.deepcopy(stats)
+
+
+def invalidate_stats_cache():
+    """Descarta las estadísticas en caché."""
+    with _cache_lock:
+        _cache.clear()
@@ -0,0 +1,250 @@
+# src/database/transfer.py
+"""
+Exportación e importación de la biblioteca en formato columnar.
+
+El paquete contiene una fila por muestra (nombre, investigador, fecha, ruta,
+hash de contenido, representación del vector) y su vector como columna
+float32 de tamaño fijo, más los parámetros de la versión del pipeline que
+generó los vectores:
+
+  - .parquet con pyarrow (escritura y lectura por lotes), o
+  - .npz (sin dependencias extra): matriz de vectores + tabla de metadatos.
+
+La importación inserta por lotes con INSERT ... RETURNING (sin un
+insert_muestra/insert_espectro por fila) y omite las muestras cuyo hash de
+contenido (nombre + vector float32) ya existe en esa versión del pipeline.
+El hash se recalcula siempre al importar; la columna content_hash del paquete
+es solo informativa y no se confía en ella.
+"""
+
+import hashlib
+import json
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from src.analysis.pipeline import PERFIL_IMAGEN
+
+from .models import EspectroVectorizado, Muestra, PipelineVersion
+
+BUNDLE_FORMAT_VERSION = 2
+BATCH_SIZE = 5000
+METADATA_KEY = b"eds_bundle"
+
+# representacion se agregó en el formato 2: en paquetes viejos se lee vacía (perfil_imagen)
+COLUMNAS = ("nombre_muestra", "investigador", "fecha", "ruta_imagen", "content_hash", "representacion")
+
+
+def _pyarrow():
+    """Retorna (pyarrow, pyarrow.parquet) o None si pyarrow no está instalado."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        return None
+    return pa, pq
+
+
+def bundle_format(path, fmt=None):
+    """Formato del paquete según fmt o la extensión ('parquet' o 'npz')."""
+    if fmt is None:
+        fmt = "npz" if path.lower().endswith(".npz") else "parquet"
+    if fmt == "parquet" and _pyarrow() is None:
+        raise RuntimeError("Exportar a Parquet requiere pyarrow; use el formato .npz.")
+    return fmt
+
+
+def content_hash(nombre_muestra, vector):
+    """Hash de contenido de una muestra: nombre + bytes del vector en float32."""
+    digest = hashlib.sha256((nombre_muestra or "").encode("utf-8"))
+    digest.update(np.ascontiguousarray(vector, dtype=np.float32).tobytes())
+    return digest.hexdigest()
+
+
+def _iter_library_batches(session: Session, pipeline_version, batch_size):
+    """Recorre las muestras de la versión indicada en lotes de columnas."""
+    rows = (session.query(Muestra.nombre_muestra, Muestra.investigador, Muestra.fecha,
+                          Muestra.ruta_imagen, EspectroVectorizado.representacion, EspectroVectorizado.vector_json)
+            .join(EspectroVectorizado, EspectroVectorizado.muestra_id == Muestra.id)
+            .filter(EspectroVectorizado.pipeline_version == pipeline_version)
+            .order_by(Muestra.id)
+            .yield_per(batch_size))
+    lote = {c: [] for c in COLUMNAS}
+    vectores = []
+    for nombre, investigador, fecha, ruta, representacion, vector_json in rows:
+        vector = np.asarray(json.loads(vector_json), dtype=np.float32)
+        lote["nombre_muestra"].append(nombre)
+        lote["investigador"].append(investigador)
+        lote["fecha"].append(fecha.isoformat() if fecha else None)
+        lote["ruta_imagen"].append(ruta)
+        lote["content_hash"].append(content_hash(nombre, vector))
+        lote["representacion"].append(representacion)
+        vectores.append(vector)
+        if len(vectores) >= batch_size:
+            yield lote, np.stack(vectores)
+            lote = {c: [] for c in COLUMNAS}
+            vectores = []
+    if vectores:
+        yield lote, np.stack(vectores)
+
+
+def export_bundle(session: Session, path, fmt=None, batch_size=BATCH_SIZE, pipeline_version=None):
+    """
+    Exporta la biblioteca (por defecto la versión activa del pipeline).
+    Retorna el número de muestras exportadas.
+    """
+    from .queries import get_active_pipeline_version
+
+    fmt = bundle_format(path, fmt)
+    if pipeline_version is None:
+        pipeline_version = get_active_pipeline_version(session)
+    version = session.get(PipelineVersion, pipeline_version)
+    metadata = {
+        "formato": BUNDLE_FORMAT_VERSION,
+        "pipeline_version": pipeline_version,
+        "params_json": version.params_json if version is not None else None,
+        "exportado": datetime.now().isoformat(),
+    }
+
+    total = 0
+    if fmt == "parquet":
+        pa, pq = _pyarrow()
+        writer = None
+        try:
+            for lote, vectores in _iter_library_batches(session, pipeline_version, batch_size):
+                columnas = [pa.array(lote[c], type=pa.string()) for c in COLUMNAS]
+                columnas.append(pa.FixedSizeListArray.from_arrays(pa.array(vectores.ravel()), vectores.shape[1]))
+                tabla = pa.Table.from_arrays(columnas, names=list(COLUMNAS) + ["vector"])
+                if writer is None:
+                    schema = tabla.schema.with_metadata({METADATA_KEY: json.dumps(metadata).encode("utf-8")})
+                    writer = pq.ParquetWriter(path, schema)
+                writer.write_table(tabla)
+                total += len(vectores)
+            if writer is None:
+                raise ValueError("La biblioteca no tiene espectros para exportar.")
+        finally:
+            if writer is not None:
+                writer.close()
+        return total
+
+    # .npz: matriz de vectores + tabla de metadatos (columnas de texto)
+    columnas = {c: [] for c in COLUMNAS}
+    bloques = []
+    for lote, vectores in _iter_library_batches(session, pipeline_version, batch_size):
+        for c in COLUMNAS:
+            columnas[c].extend("" if v is None else v for v in lote[c])
+        bloques.append(vectores)
+    if not bloques:
+        raise ValueError("La biblioteca no tiene espectros para exportar.")
+    vectores = np.concatenate(bloques)
+    np.savez(path, vector=vectores, metadata=np.array(json.dumps(metadata)),
+             **{c: np.array(columnas[c], dtype=str) for c in COLUMNAS})
+    return len(vectores)
+
+
+def iter_bundle(path, batch_size=BATCH_SIZE):
+    """
+    Lee un paquete por lotes. Retorna (metadata, generador de (columnas, vectores)).
+    """
+    fmt = bundle_format(path)
+    if fmt == "parquet":
+        pa, pq = _pyarrow()
+        archivo = pq.ParquetFile(path)
+        metadata = json.loads((archivo.schema_arrow.metadata or {}).get(METADATA_KEY, b"{}"))
+
+        def _lotes():
+            for batch in archivo.iter_batches(batch_size=batch_size):
+                columnas = {c: batch.column(c).to_pylist() if c in batch.schema.names else [None] * batch.num_rows
+                            for c in COLUMNAS}
+                vectores = batch.column("vector")
+                dim = vectores.type.list_size
+                yield columnas, vectores.values.to_numpy(zero_copy_only=False).reshape(-1, dim)
+        return metadata, _lotes()
+
+    datos = np.load(path, allow_pickle=False)
+    metadata = json.loads(str(datos["metadata"]))
+
+    def _lotes():
+        vectores = datos["vector"]
+        columnas = {c: datos[c] if c in datos.files else np.full(len(vectores), "") for c in COLUMNAS}
+        for inicio in range(0, len(vectores), batch_size):
+            fin = inicio + batch_size
+            yield ({c: [v or None for v in columnas[c][inicio:fin].tolist()] for c in COLUMNAS},
+                   vectores[inicio:fin])
+    return metadata, _lotes()
+
+
+def _existing_hashes(session: Session, pipeline_version):
+    rows = (session.query(Muestra.nombre_muestra, EspectroVectorizado.vector_json)
+            .join(EspectroVectorizado, EspectroVectorizado.muestra_id == Muestra.id)
+            .filter(EspectroVectorizado.pipeline_version == pipeline_version)
+            .yield_per(BATCH_SIZE))
+    return {content_hash(nombre, json.loads(vector_json)) for nombre, vector_json in rows}
+
+
+def bulk_insert(session: Session, muestras, vectores, pipeline_version, representacion=PERFIL_IMAGEN):
+    """
+    Inserta muestras (diccionarios de columnas) y sus vectores con dos
+    sentencias por lote. representacion es una sola para todo el lote o una
+    lista con la de cada vector. No hace commit. Retorna los ids asignados, en orden.
+    """
+    ids = session.scalars(
+        insert(Muestra).returning(Muestra.id, sort_by_parameter_order=True), list(muestras)
+    ).all()
+    if isinstance(representacion, str):
+        representacion = [representacion] * len(ids)
+    session.execute(insert(EspectroVectorizado), [
+        {"muestra_id": muestra_id, "pipeline_version": pipeline_version, "representacion": rep,
+         "vector_json": json.dumps(np.asarray(vector, dtype=np.float32).tolist())}
+        for muestra_id, vector, rep in zip(ids, vectores, representacion)
+    ])
+    return ids
+
+
+def import_bundle(session: Session, path, batch_size=BATCH_SIZE, investigador=None, log=None):
+    """
+    Importa un paquete en la BD con inserciones por lotes.
+    Las muestras cuyo hash de contenido ya existe (en la BD o antes en el
+    mismo paquete) se omiten. Retorna un diccionario con el resumen.
+    """
+    from src.analysis.pipeline import DEFAULT_PARAMS, params_from_json
+
+    from .queries import get_active_pipeline_version, register_pipeline_version
+
+    metadata, lotes = iter_bundle(path, batch_size=batch_size)
+    params = params_from_json(metadata["params_json"]) if metadata.get("params_json") else dict(DEFAULT_PARAMS)
+    version = register_pipeline_version(session, params)
+    vistos = _existing_hashes(session, version.id)
+    resumen = {"pipeline_version": version.id, "importadas": 0, "duplicadas": 0,
+               "version_activa": version.id == get_active_pipeline_version(session)}
+
+    ahora = datetime.now()
+    for columnas, vectores in lotes:
+        muestras, nuevos, representaciones = [], [], []
+        for i, vector in enumerate(vectores):
+            nombre = columnas["nombre_muestra"][i]
+            digest = content_hash(nombre, vector)
+            if digest in vistos:
+                resumen["duplicadas"] += 1
+                continue
+            vistos.add(digest)
+            fecha = columnas["fecha"][i]
+            muestras.append({
+                "nombre_muestra": nombre,
+                "investigador": investigador or columnas["investigador"][i],
+                "fecha": datetime.fromisoformat(fecha) if fecha else ahora,
+                "ruta_imagen": columnas["ruta_imagen"][i],
+            })
+            nuevos.append(vector)
+            representaciones.append(columnas["representacion"][i] or PERFIL_IMAGEN)
+        if not muestras:
+            continue
+
+        ids = bulk_insert(session, muestras, nuevos, version.id, representaciones)
+        session.commit()
+        resumen["importadas"] += len(ids)
+        if log:
+            log(f"importadas {resumen['importadas']} (duplicadas {resumen['duplicadas']})")
+    return resumen
@@ -0,0 +1,40 @@
+# src/diagnostics.py
+"""
+Opciones de diagnóstico comunes a los scripts: perfilado (src/profiling.py) y
+memoria (src/memory.py).
+
+La configuración se guarda en variables de entorno para que la hereden los
+procesos hijos (pools de vectorización, shards, ingesta con checkpoint).
+"""
+
+import os
+
+
+def set_env(**valores):
+    """Fija en el entorno las variables cuyo valor no es None."""
+    for nombre, valor in valores.items():
+        if valor is not None:
+            os.environ[nombre] = str(valor)
+
+
+def add_diagnostic_arguments(parser):
+    """Opciones --profile* y --memory-* para scripts con argparse."""
+    from src.memory import DEFAULT_LOG
+    from src.profiling import DEFAULT_DIR, MODES
+
+    parser.add_argument("--profile", choices=MODES, help="Perfilar cada archivo/petición (cprofile o sample)")
+    parser.add_argument("--profile-dir", help=f"Carpeta de los perfiles (default: {DEFAULT_DIR})")
+    parser.add_argument("--profile-rate", type=float, help="Fracción de archivos/peticiones perfilados")
+    parser.add_argument("--memory-report", action="store_true",
+                        help=f"Registrar el pico de memoria por archivo/petición (en {DEFAULT_LOG})")
+    parser.add_argument("--memory-budget-mb", type=float,
+                        help="Presupuesto de memoria por archivo: bajo consumo u omitir si se supera")
+
+
+def configure_from_args(args):
+    """Aplica las opciones de add_diagnostic_arguments."""
+    from src.memory import configure as configure_memory
+    from src.profiling import configure as configure_profile
+
+    configure_profile(mode=args.profile, directory=args.profile_dir, rate=args.profile_rate)
+    configure_memory(track=args.memory_report or None, budget_mb=args.memory_budget_mb)
@@ -0,0 +1,285 @@
+# src/ingestion/async_pipeline.py
+"""
+Ingesta en etapas con asyncio: lectura, vectorización y escritura solapadas.
+
+  lectura        `readers` tareas leen los DOCX con asyncio.to_thread (útil en
+                 carpetas de red, donde la lectura bloquea más que la CPU).
+  vectorización  `workers` procesos parsean y vectorizan los bytes leídos.
+  escritura      una sola tarea junta los resultados en lotes y los inserta
+                 con un commit por lote (un único escritor: sin bloqueos de SQLite).
+
+Entre etapas hay colas acotadas: si la vectorización o la BD se atrasan, las
+etapas anteriores esperan, de modo que en memoria hay a lo sumo
+readers + queue_size + workers archivos leídos.
+
+El estado de cada archivo se guarda en ingestion_status en la misma
+transacción que sus muestras (el mismo checkpoint de la ingesta con procesos
+hijos, ver checkpoint.py), así que una ejecución interrumpida se retoma sin
+duplicar. A diferencia de ingest_checkpointed no hay timeout ni límite de
+memoria por archivo (usar EDS_MEMORY_BUDGET_MB). Las imágenes y espectros en
+texto se leen en el proceso que los vectoriza.
+
+Al terminar (y cada `report_interval` segundos) se informa por etapa el
+rendimiento, la ocupación y el tiempo bloqueado en las colas; la etapa con
+mayor ocupación es el cuello de botella.
+"""
+
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from sqlalchemy.orm import Session
+
+from src.ingestion.checkpoint import ERROR, OK, SIN_ESPECTRO, pending_files, status_record
+
+DEFAULT_READERS = 4
+DEFAULT_BATCH_SIZE = 32
+DEFAULT_BATCH_SECONDS = 2.0
+DEFAULT_REPORT_INTERVAL = 10.0
+
+# Fin de la entrada de una etapa
+_FIN = None
+
+
+class StageStats:
+    """Contadores de una etapa: archivos, tiempo ocupado y tiempo bloqueado en las colas."""
+
+    def __init__(self, nombre, concurrencia):
+        self.nombre = nombre
+        self.concurrencia = concurrencia
+        self.archivos = 0
+        self.ocupado = 0.0
+        self.espera_entrada = 0.0  # sin trabajo: la etapa anterior no da abasto
+        self.espera_salida = 0.0  # cola siguiente llena: la etapa siguiente no da abasto
+
+    def resumen(self, transcurrido):
+        transcurrido = max(transcurrido, 1e-9)
+        return {
+            "archivos": self.archivos,
+            "por_segundo": round(self.archivos / transcurrido, 2),
+            "ocupacion": round(self.ocupado / (transcurrido * self.concurrencia), 3),
+            "espera_entrada_s": round(self.espera_entrada, 2),
+            "espera_salida_s": round(self.espera_salida, 2),
+        }
+
+
+def _read_bytes(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def vectorize_item(path, data, params):
+    """Proceso del pool: retorna (estado, espectros o mensaje de error)."""
+    from src.ingestion.watcher import vectorize_path
+
+    try:
+        espectros = vectorize_path(path, params, data=data)
+    except Exception as e:
+        return ERROR, f"{type(e).__name__}: {e}"
+    return (OK if espectros else SIN_ESPECTRO), [(ruta, [float(x) for x in v], rep) for ruta, v, rep in espectros]
+
+
+def write_batch(session: Session, lote, investigador, pipeline_version):
+    """
+    Inserta las muestras de un lote de resultados (ruta, estado, datos) y el
+    estado de cada archivo en una sola transacción.
+    """
+    from src.database.transfer import bulk_insert
+    from src.ingestion.files import extract_mineral_name
+
+    filas, vectores, representaciones, origen = [], [], [], []
+    for path, estado, datos in lote:
+        if estado != OK:
+            continue
+        nombre = extract_mineral_name(os.path.basename(path))
+        for ruta, vector, representacion in datos:
+            filas.append({"nombre_muestra": nombre, "investigador": investigador, "ruta_imagen": ruta})
+            vectores.append(vector)
+            representaciones.append(representacion)
+            origen.append(path)
+    try:
+        ids = bulk_insert(session, filas, vectores, pipeline_version, representaciones) if filas else []
+        muestra_de = dict(zip(origen, ids))
+        for path, estado, datos in lote:
+            registro = status_record(session, path, estado, datos if estado == ERROR else None)
+            registro.muestra_id = muestra_de.get(path, registro.muestra_id)
+            session.add(registro)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+
+
+async def ingest_async(session_factory, paths, investigador="Dataset Tesis", workers=None,
+                       readers=DEFAULT_READERS, queue_size=None, batch_size=DEFAULT_BATCH_SIZE,
+                       batch_seconds=DEFAULT_BATCH_SECONDS, retry_quarantine=False, params=None,
+                       report_interval=DEFAULT_REPORT_INTERVAL, log=None):
+    """
+    Ingiere los archivos pendientes con el pipeline de etapas. Retorna un
+    diccionario {estado: [rutas]} más 'omitidos', 'segundos', 'etapas'
+    (rendimiento por etapa) y 'cuello_de_botella'.
+    """
+    from src.database.queries import get_active_pipeline_params, register_pipeline_version
+
+    workers = workers or os.cpu_count() or 1
+    queue_size = queue_size or 2 * workers
+
+    session = session_factory()
+    try:
+        if params is None:
+            params = get_active_pipeline_params(session)
+        pipeline_version = register_pipeline_version(session, params).id
+        pendientes = pending_files(session, paths, retry_quarantine=retry_quarantine)
+    finally:
+        session.close()
+
+    resumen = {OK: [], SIN_ESPECTRO: [], ERROR: [], "omitidos": len(paths) - len(pendientes)}
+    etapas = {
+        "lectura": StageStats("lectura", readers),
+        "vectorizacion": StageStats("vectorizacion", workers),
+        "escritura": StageStats("escritura", 1),
+    }
+    entrada = asyncio.Queue()
+    for path in pendientes:
+        entrada.put_nowait(path)
+    leidos = asyncio.Queue(maxsize=queue_size)
+    resultados = asyncio.Queue(maxsize=queue_size)
+    loop = asyncio.get_running_loop()
+    pool = [ProcessPoolExecutor(max_workers=workers)]
+    inicio = time.perf_counter()
+
+    async def put(cola, item, stats):
+        t = time.perf_counter()
+        await cola.put(item)
+        stats.espera_salida += time.perf_counter() - t
+
+    async def get(cola, stats):
+        t = time.perf_counter()
+        item = await cola.get()
+        stats.espera_entrada += time.perf_counter() - t
+        return item
+
+    async def lector():
+        stats = etapas["lectura"]
+        while not entrada.empty():
+            path = entrada.get_nowait()
+            t = time.perf_counter()
+            try:
+                # Solo los DOCX se vectorizan desde memoria
+                data = await asyncio.to_thread(_read_bytes, path) if path.lower().endswith(".docx") else None
+            except OSError as e:
+                stats.ocupado += time.perf_counter() - t
+                await put(resultados, (path, ERROR, f"{type(e).__name__}: {e}"), stats)
+                continue
+            stats.ocupado += time.perf_counter() - t
+            stats.archivos += 1
+            await put(leidos, (path, data), stats)
+
+    async def vectorizador():
+        stats = etapas["vectorizacion"]
+        while True:
+            item = await get(leidos, stats)
+            if item is _FIN:
+                return
+            path, data = item
+            t = time.perf_counter()
+            executor = pool[0]
+            try:
+                estado, datos = await loop.run_in_executor(executor, vectorize_item, path, data, params)
+            except BrokenProcessPool:
+                # Un proceso murió (p. ej. sin memoria): el primero que lo nota reemplaza el pool
+                estado, datos = ERROR, "El proceso de vectorización terminó inesperadamente"
+                if pool[0] is executor:
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    pool[0] = ProcessPoolExecutor(max_workers=workers)
+            stats.ocupado += time.perf_counter() - t
+            stats.archivos += 1
+            await put(resultados, (path, estado, datos), stats)
+
+    async def escritor():
+        stats = etapas["escritura"]
+        lote, fin = [], False
+        while not fin:
+            # Espera el primer resultado; luego junta hasta batch_size o batch_seconds
+            item = await get(resultados, stats)
+            fin = item is _FIN
+            if not fin:
+                lote.append(item)
+            limite = time.monotonic() + batch_seconds
+            while not fin and len(lote) < batch_size:
+                try:
+                    item = await asyncio.wait_for(resultados.get(), max(0.0, limite - time.monotonic()))
+                except asyncio.TimeoutError:
+                    break
+                fin = item is _FIN
+                if not fin:
+                    lote.append(item)
+            if not lote:
+                continue
+
+            t = time.perf_counter()
+            await asyncio.to_thread(_write, lote)
+            stats.ocupado += time.perf_counter() - t
+            stats.archivos += len(lote)
+            for path, estado, datos in lote:
+                resumen[estado].append(path)
+                if log:
+                    detalle = f"{len(datos)} espectros" if estado == OK else ("" if estado == SIN_ESPECTRO else datos)
+                    log(f"{estado}\t{path}\t{detalle}".rstrip("\t"))
+            lote = []
+
+    def _write(lote):
+        session = session_factory()
+        try:
+            write_batch(session, lote, investigador, pipeline_version)
+        finally:
+            session.close()
+
+    async def reportar():
+        while True:
+            await asyncio.sleep(report_interval)
+            if log:
+                log(_format_stages(etapas, time.perf_counter() - inicio, leidos, resultados))
+
+    async def lectores():
+        await asyncio.gather(*(lector() for _ in range(readers)))
+        for _ in range(workers):
+            await leidos.put(_FIN)
+
+    async def vectorizadores():
+        await asyncio.gather(*(vectorizador() for _ in range(workers)))
+        await resultados.put(_FIN)
+
+    monitor = asyncio.create_task(reportar())
+    tareas = [asyncio.create_task(c) for c in (lectores(), vectorizadores(), escritor())]
+    try:
+        await asyncio.gather(*tareas)
+    finally:
+        monitor.cancel()
+        for tarea in tareas:
+            tarea.cancel()
+        pool[0].shutdown(wait=True, cancel_futures=True)
+
+    transcurrido = time.perf_counter() - inicio
+    resumen["segundos"] = round(transcurrido, 2)
+    resumen["etapas"] = {nombre: stats.resumen(transcurrido) for nombre, stats in etapas.items()}
+    resumen["cuello_de_botella"] = max(resumen["etapas"], key=lambda n: resumen["etapas"][n]["ocupacion"])
+    if log:
+        log(_format_stages(etapas, transcurrido, leidos, resultados))
+    return resumen
+
+
+def _format_stages(etapas, transcurrido, leidos, resultados):
+    partes = []
+    for nombre, stats in etapas.items():
+        r = stats.resumen(transcurrido)
+        partes.append(f"{nombre}: {r['archivos']} ({r['por_segundo']}/s, ocupación {r['ocupacion']:.0%})")
+    colas = f"colas {leidos.qsize()}/{leidos.maxsize} leídos, {resultados.qsize()}/{resultados.maxsize} resultados"
+    return "etapas\t" + " | ".join(partes) + f" | {colas}"
+
+
+def run_ingest_async(session_factory, paths, **kwargs):
+    """Versión síncrona de ingest_async (para el CLI y scripts)."""
+    return asyncio.run(ingest_async(session_factory, paths, **kwargs))
@@ -0,0 +1,234 @@
+# src/ingestion/checkpoint.py
+"""
+Ingesta tolerante a fallos con checkpoint por archivo.
+
+Cada archivo se vectoriza en un proceso hijo con un tiempo máximo y un límite
+de memoria (RLIMIT_AS), de modo que un DOCX corrupto que cuelga o infla
+python-docx/OpenCV no detiene ni tumba el proceso principal. El resultado de
+cada archivo se guarda en la tabla ingestion_status en la misma transacción
+que sus muestras:
+
+  - ok / sin_espectro: no se vuelven a procesar (salvo que el archivo cambie).
+  - error / timeout: quedan en cuarentena y solo se reintentan a pedido.
+
+Si la ejecución se interrumpe, la siguiente continúa desde el último archivo
+registrado sin duplicar muestras.
+"""
+
+import multiprocessing
+import os
+import time
+from multiprocessing.connection import wait
+
+from sqlalchemy.orm import Session
+
+from src.database.models import EspectroVectorizado, EstadoIngesta, Muestra
+
+try:
+    import resource
+except ImportError:  # Windows: sin límite de memoria por proceso
+    resource = None
+
+# Estados de ingesta
+OK = "ok"
+SIN_ESPECTRO = "sin_espectro"
+ERROR = "error"
+TIMEOUT = "timeout"
+CUARENTENA = (ERROR, TIMEOUT)
+
+DEFAULT_TIMEOUT_S = 120
+DEFAULT_MEMORY_MB = 1024
+
+
+def _mp_context():
+    # fork hereda los módulos ya importados (NumPy, OpenCV) y arranca en milisegundos
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context()
+
+
+def _address_space_bytes():
+    """Espacio de direcciones actual del proceso (Linux), o 0 si no se puede leer."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _worker(conn, path, params, memory_mb):
+    """Proceso hijo: aplica el límite de memoria, vectoriza y envía el resultado."""
+    from src.ingestion.watcher import vectorize_path
+
+    try:
+        if memory_mb and resource is not None:
+            # El límite se suma a lo que ya ocupa el proceso (módulos heredados)
+            limit = _address_space_bytes() + memory_mb * 1024 * 1024
+            _, hard = resource.getrlimit(resource.RLIMIT_AS)
+            if hard != resource.RLIM_INFINITY:
+                limit = min(limit, hard)
+            resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+        espectros = vectorize_path(path, params)
+        conn.send((OK, [(ruta, [float(x) for x in vector], representacion)
+                        for ruta, vector, representacion in espectros]))
+    except MemoryError:
+        conn.send((ERROR, f"Se superó el límite de memoria ({memory_mb} MB)"))
+    except BaseException as e:
+        conn.send((ERROR, f"{type(e).__name__}: {e}"))
+    finally:
+        conn.close()
+
+
+def file_signature(path):
+    """Retorna (tamaño, mtime) del archivo, o (None, None) si no existe."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None, None
+    return stat.st_size, stat.st_mtime
+
+
+def get_quarantine(session: Session):
+    """Retorna los EstadoIngesta en cuarentena (error o timeout)."""
+    return (session.query(EstadoIngesta)
+            .filter(EstadoIngesta.estado.in_(CUARENTENA))
+            .order_by(EstadoIngesta.ruta)
+            .all())
+
+
+def pending_files(session: Session, paths, retry_quarantine=False):
+    """
+    Filtra los archivos que faltan por procesar según el checkpoint.
+    Los archivos ya registrados como muestras (ingestas anteriores a la tabla
+    de estados) también se omiten.
+    """
+    estados = {e.ruta: e for e in session.query(EstadoIngesta)}
+    conocidos = {
+        os.path.abspath(ruta.split("#")[0])
+        for (ruta,) in session.query(Muestra.ruta_imagen).filter(Muestra.ruta_imagen.isnot(None))
+    }
+
+    pendientes = []
+    for path in paths:
+        ruta = os.path.abspath(path)
+        estado = estados.get(ruta)
+        if estado is None:
+            if ruta not in conocidos:
+                pendientes.append(path)
+            continue
+        if estado.estado == OK:
+            continue
+        cambio = (estado.tamano, estado.mtime) != file_signature(path)
+        if cambio or (retry_quarantine and estado.estado in CUARENTENA):
+            pendientes.append(path)
+    return pendientes
+
+
+def status_record(session: Session, path, estado, mensaje=None):
+    """Retorna el EstadoIngesta del archivo actualizado con el nuevo estado (sin agregarlo)."""
+    ruta = os.path.abspath(path)
+    tamano, mtime = file_signature(path)
+    registro = session.get(EstadoIngesta, ruta) or EstadoIngesta(ruta=ruta, intentos=0)
+    registro.tamano, registro.mtime = tamano, mtime
+    registro.estado, registro.mensaje = estado, mensaje
+    registro.intentos += 1
+    return registro
+
+
+def _record(session: Session, path, estado, mensaje=None, espectros=(), investigador=None,
+            pipeline_version=None):
+    """Guarda las muestras del archivo y su estado en una sola transacción (checkpoint)."""
+    from src.ingestion.files import extract_mineral_name
+
+    registro = status_record(session, path, estado, mensaje)
+
+    try:
+        nombre = extract_mineral_name(os.path.basename(path))
+        for ruta_imagen, vector, representacion in espectros:
+            muestra = Muestra(nombre_muestra=nombre, investigador=investigador, ruta_imagen=ruta_imagen)
+            session.add(muestra)
+            session.flush()
+            espectro = EspectroVectorizado(muestra_id=muestra.id, pipeline_version=pipeline_version,
+                                           representacion=representacion)
+            espectro.vector = vector
+            session.add(espectro)
+            registro.muestra_id = muestra.id
+        session.add(registro)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    return registro
+
+
+def ingest_checkpointed(session: Session, paths, investigador="Dataset Tesis", workers=1,
+                        timeout=DEFAULT_TIMEOUT_S, memory_mb=DEFAULT_MEMORY_MB,
+                        retry_quarantine=False, params=None, log=None):
+    """
+    Ingiere los archivos pendientes, cada uno en un proceso hijo con timeout y
+    límite de memoria. Retorna un diccionario {estado: [rutas]} más 'omitidos'
+    (archivos que ya estaban procesados según el checkpoint).
+    """
+    from src.database.queries import get_active_pipeline_params, register_pipeline_version
+
+    # Importar en el padre los módulos de vectorización para que los hijos los hereden
+    import src.analysis.vectorize  # noqa: F401
+    import src.ingestion.watcher  # noqa: F401
+
+    if params is None:
+        params = get_active_pipeline_params(session)
+    pipeline_version = register_pipeline_version(session, params).id
+
+    pendientes = pending_files(session, paths, retry_quarantine=retry_quarantine)
+    resumen = {OK: [], SIN_ESPECTRO: [], ERROR: [], TIMEOUT: [], "omitidos": len(paths) - len(pendientes)}
+
+    def registrar(path, estado, mensaje=None, espectros=()):
+        _record(session, path, estado, mensaje, espectros, investigador, pipeline_version)
+        resumen[estado].append(path)
+        if log:
+            detalle = mensaje or (f"{len(espectros)} espectros" if espectros else "")
+            log(f"{estado}\t{path}\t{detalle}".rstrip("\t"))
+
+    ctx = _mp_context()
+    cola = list(reversed(pendientes))
+    activos = {}  # conexión -> (proceso, ruta, límite de tiempo)
+    try:
+        while cola or activos:
+            while cola and len(activos) < max(1, workers):
+                path = cola.pop()
+                padre, hijo = ctx.Pipe(duplex=False)
+                proceso = ctx.Process(target=_worker, args=(hijo, path, params, memory_mb), daemon=True)
+                proceso.start()
+                hijo.close()
+                activos[padre] = (proceso, path, time.monotonic() + timeout)
+
+            espera = max(0.0, min(limite for _, _, limite in activos.values()) - time.monotonic())
+            for conn in wait(list(activos), timeout=espera):
+                proceso, path, _ = activos.pop(conn)
+                try:
+                    estado, datos = conn.recv()
+                except EOFError:
+                    proceso.join()
+                    estado, datos = ERROR, f"El proceso terminó sin respuesta (código {proceso.exitcode})"
+                conn.close()
+                proceso.join()
+                if estado == OK:
+                    registrar(path, OK if datos else SIN_ESPECTRO, espectros=datos)
+                else:
+                    registrar(path, estado, mensaje=datos)
+
+            ahora = time.monotonic()
+            for conn, (proceso, path, limite) in list(activos.items()):
+                if ahora >= limite:
+                    proceso.kill()
+                    proceso.join()
+                    conn.close()
+                    del activos[conn]
+                    registrar(path, TIMEOUT, mensaje=f"Superó {timeout} s")
+    finally:
+        for conn, (proceso, _, _) in activos.items():
+            proceso.kill()
+            proceso.join()
+            conn.close()
+
+    return resumen
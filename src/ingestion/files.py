@@ -0,0 +1,85 @@
+# src/ingestion/files.py
+"""
+Descubrimiento y vectorización de archivos de espectros.
+"""
+
+import glob
+import os
+import re
+
+from src.analysis.pipeline import CONTEOS_ENERGIA, PERFIL_IMAGEN
+from src.ingestion.images import IMAGE_EXTENSIONS
+from src.parsers.spectrum_text_parser import TEXT_SPECTRUM_EXTENSIONS
+
+# Extensiones que sabe procesar la ingesta
+DOCX_EXTENSIONS = (".docx",)
+SUPPORTED_EXTENSIONS = DOCX_EXTENSIONS + TEXT_SPECTRUM_EXTENSIONS + IMAGE_EXTENSIONS
+
+
+def extract_mineral_name(filename):
+    """
+    Extrae el nombre del mineral del nombre del archivo.
+    Ejemplos:
+    - "EDS ALBITA_02.docx" -> "ALBITA"
+    - "Eds broncita_001.docx" -> "BRONCITA" 
+    - "EDS galena.docx" -> "GALENA"
+    - "MUESTRA-16-HEDEMBERGITA_04.tif" -> "HEDEMBERGITA"
+    """
+    # Quitar extensión
+    name = os.path.splitext(filename)[0]
+    
+    # Quitar prefijos comunes
+    name = name.replace('EDS ', '')
+    name = name.replace('Eds ', '')
+    name = name.replace('Element ', '')
+    name = re.sub(r'^MUESTRA[-_ ]*(\d+[-_ ]*)?', '', name, flags=re.IGNORECASE)
+    
+    # Tomar la primera parte antes de _ o números
+    name = re.split(r'[_\d]', name)[0]
+    
+    return name.strip().upper()
+
+
+def discover_files(paths, extensions=SUPPORTED_EXTENSIONS):
+    """
+    Retorna la lista ordenada de archivos con las extensiones indicadas.
+    Cada ruta puede ser un archivo, un directorio o un patrón glob.
+    """
+    found = set()
+    for path in paths:
+        if os.path.isdir(path):
+            candidates = glob.glob(os.path.join(path, "*"))
+        elif os.path.exists(path):
+            candidates = [path]
+        else:
+            candidates = glob.glob(path)
+        found.update(c for c in candidates if os.path.isfile(c) and c.lower().endswith(extensions))
+    return sorted(found)
+
+
+def vectorize_file(path, vector_size=200, threshold=0.99, row_bounds=(150, 250), method="mean",
+                   low_memory=False, page=None):
+    """
+    Vectoriza un archivo de espectro según su extensión. Retorna (vector,
+    representación) (ver src/analysis/pipeline.py), o (None, None) si no hay espectro.
+    threshold, row_bounds y method solo se aplican a espectros en imagen, al
+    igual que low_memory (modo de bajo consumo, ver src/memory.py).
+    En imágenes se decodifica una sola página: `page` o, por defecto, la
+    primera candidata según la cabecera. Para todas las páginas de un TIFF
+    use watcher.vectorize_path.
+    """
+    if path.lower().endswith(DOCX_EXTENSIONS):
+        from src.parsers.docx_parser import vectorize_docx
+        return vectorize_docx(path, vector_size=vector_size, threshold=threshold,
+                              row_bounds=row_bounds, method=method, low_memory=low_memory)
+    if path.lower().endswith(TEXT_SPECTRUM_EXTENSIONS):
+        from src.parsers.spectrum_text_parser import vectorize_text_spectrum
+        vector = vectorize_text_spectrum(path, vector_size=vector_size)
+        return (None, None) if vector is None else (vector, CONTEOS_ENERGIA)
+    if path.lower().endswith(IMAGE_EXTENSIONS):
+        from src.ingestion.images import spectrum_pages, vectorize_image_file
+        pages = [page] if page is not None else spectrum_pages(path)[:1]
+        vectores = vectorize_image_file(path, pages=pages, vector_size=vector_size, threshold=threshold,
+                                        row_bounds=row_bounds, method=method, low_memory=low_memory)
+        return (vectores[0][1], PERFIL_IMAGEN) if vectores else (None, None)
+    raise ValueError(f"Formato de archivo no soportado: {path}")
@@ -0,0 +1,123 @@
+# src/ingestion/images.py
+"""
+Espectros exportados como imágenes sueltas (TIFF, JPEG, PNG, BMP).
+
+Se leen solo las cabeceras (todas las páginas en TIFF multipágina) y se
+descartan sin decodificar las imágenes que no miden 512x400 píxeles; las
+candidatas se decodifican y vectorizan de a una página. La ingesta (en
+paralelo, con checkpoint) la hacen src/ingestion/checkpoint.py y
+async_pipeline.py a través de watcher.vectorize_path.
+"""
+
+import os
+
+from src.parsers.docx_parser import SPECTRUM_SHAPE
+from src.parsers.image_header import read_image_size, tiff_page_sizes
+
+IMAGE_EXTENSIONS = (".tif", ".tiff", ".jpg", ".jpeg", ".png", ".bmp")
+TIFF_EXTENSIONS = (".tif", ".tiff")
+
+# (ancho, alto) de la imagen del espectro
+SPECTRUM_SIZE = (SPECTRUM_SHAPE[1], SPECTRUM_SHAPE[0])
+
+
+def probe_image(path):
+    """
+    Lee las dimensiones de cada página desde la cabecera.
+    Retorna una lista de (ancho, alto); None en una posición si no se pudo leer.
+    """
+    with open(path, "rb") as fp:
+        if path.lower().endswith(TIFF_EXTENSIONS):
+            try:
+                sizes = tiff_page_sizes(fp)
+            except (EOFError, OSError, ValueError):
+                sizes = []
+            return [size if None not in size else None for size in sizes] or [None]
+        return [read_image_size(fp)]
+
+
+def spectrum_pages(path):
+    """
+    Retorna los índices de página que podrían ser espectros.
+    Las páginas con tamaño ilegible se conservan y se validan al decodificar.
+    """
+    return [i for i, size in enumerate(probe_image(path)) if size is None or size == SPECTRUM_SIZE]
+
+
+def _decode_page(path, page, total_pages):
+    import cv2
+
+    if total_pages > 1:
+        ok, mats = cv2.imreadmulti(path, page, 1)
+        return mats[0] if ok and mats else None
+    return cv2.imread(path)
+
+
+def _iter_spectrum_pages(path, pages=None, low_memory=False):
+    """Decodifica una página a la vez; con low_memory la entrega en uint8."""
+    from src.analysis.vectorize import to_float_image
+
+    total_pages = len(probe_image(path))
+    if pages is None:
+        pages = spectrum_pages(path)
+
+    for page in pages:
+        img = _decode_page(path, page, total_pages)
+        if img is None:
+            continue
+        if not low_memory:
+            img = to_float_image(img)
+        if img.shape[:2] == SPECTRUM_SHAPE[:2] and (low_memory or img.shape == SPECTRUM_SHAPE):
+            yield page, img
+
+
+def decode_spectrum_pages(path, pages=None):
+    """
+    Decodifica las páginas indicadas (por defecto las candidatas).
+    Retorna una lista de (pagina, imagen BGR float) solo con las de tamaño de espectro.
+    """
+    return list(_iter_spectrum_pages(path, pages))
+
+
+def estimate_image_memory(path):
+    """
+    Estima el pico de memoria de vectorize_image_file desde las cabeceras:
+    el archivo leído más la página candidata más grande decodificada y
+    vectorizada (las páginas se procesan de a una). Las páginas con tamaño
+    ilegible se cuentan como del tamaño del espectro.
+    Retorna (bytes normal, bytes bajo consumo).
+    """
+    from src.memory import BYTES_PER_PIXEL, BYTES_PER_PIXEL_LOW
+
+    candidatas = any(size is None or size == SPECTRUM_SIZE for size in probe_image(path))
+    pagina = SPECTRUM_SIZE[0] * SPECTRUM_SIZE[1] if candidatas else 0
+    tamano = os.path.getsize(path)
+    return tamano + pagina * BYTES_PER_PIXEL, tamano + pagina * BYTES_PER_PIXEL_LOW
+
+
+def vectorize_image_file(path, pages=None, vector_size=200, threshold=0.99, row_bounds=(150, 250),
+                         method="mean", low_memory=False):
+    """
+    Decodifica y vectoriza las páginas indicadas (por defecto las candidatas),
+    una a la vez. Retorna una lista de (pagina, vector) solo con las que son
+    espectros válidos. low_memory: ver vectorize_image_low_memory.
+    """
+    from src.analysis.vectorize import vectorize_image, vectorize_image_low_memory
+    from src.memory import stage
+
+    vectorize = vectorize_image_low_memory if low_memory else vectorize_image
+    vectores = []
+    paginas = _iter_spectrum_pages(path, pages, low_memory=low_memory)
+    while True:
+        with stage("parseo"):
+            page, img = next(paginas, (None, None))
+        if img is None:
+            break
+        with stage("vectorizacion"):
+            vector = vectorize(img, vector_size=vector_size, threshold=threshold,
+                               row_bounds=row_bounds, method=method)
+        del img
+        if vector is not None:
+            vectores.append((page, vector))
+    return vectores
+
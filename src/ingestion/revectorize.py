@@ -0,0 +1,140 @@
+# src/ingestion/revectorize.py
+"""
+Re-vectorización de la biblioteca con una nueva versión del pipeline.
+
+Los archivos de origen (Muestra.ruta_imagen) se vuelven a vectorizar en un
+pool de procesos y los vectores se guardan etiquetados con la nueva versión,
+con un commit por bloque de `chunk_size` muestras. La BD es el checkpoint: al
+reanudar solo se procesan las muestras que aún no tienen vector de esa
+versión. Mientras tanto las búsquedas siguen usando la versión activa; al
+terminar se activa la nueva versión en una sola transacción.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from sqlalchemy.orm import Session
+
+from src.analysis.pipeline import PERFIL_IMAGEN, normalize_params
+from src.database.models import EspectroVectorizado, Muestra
+
+CHUNK_SIZE = 64
+
+
+def split_ruta(ruta_imagen):
+    """Separa 'archivo.tif#3' en ('archivo.tif', 3); sin página retorna (ruta, None)."""
+    path, sep, page = ruta_imagen.rpartition("#")
+    if sep and page.isdigit():
+        return path, int(page)
+    return ruta_imagen, None
+
+
+def vectorize_source(ruta_imagen, params):
+    """
+    Vectoriza el archivo de origen de una muestra (se ejecuta en un proceso del pool).
+    Retorna (vector como lista o None, representación, mensaje de error o None).
+    """
+    from src.ingestion.files import vectorize_file
+    from src.ingestion.images import vectorize_image_file
+
+    path, page = split_ruta(ruta_imagen)
+    try:
+        if page is not None:
+            vectores = vectorize_image_file(path, pages=[page], **params)
+            vector, representacion = (vectores[0][1], PERFIL_IMAGEN) if vectores else (None, None)
+        else:
+            vector, representacion = vectorize_file(path, **params)
+    except Exception as e:
+        return None, None, str(e)
+    return (None if vector is None else vector.tolist()), representacion, None
+
+
+def pending_muestras(session: Session, pipeline_version: str):
+    """Retorna [(muestra_id, ruta_imagen)] de las muestras sin vector de esa versión."""
+    con_vector = (session.query(EspectroVectorizado.muestra_id)
+                  .filter(EspectroVectorizado.pipeline_version == pipeline_version))
+    query = (session.query(Muestra.id, Muestra.ruta_imagen)
+             .filter(Muestra.id.notin_(con_vector))
+             .order_by(Muestra.id))
+    return [(muestra_id, ruta) for muestra_id, ruta in query]
+
+
+def revectorize(session: Session, params, workers=None, chunk_size=CHUNK_SIZE, activate=True,
+                force=False, log=None):
+    """
+    Re-vectoriza todas las muestras con los parámetros indicados.
+
+    La nueva versión se activa solo si todas las muestras quedaron con vector
+    (o con force=True, en cuyo caso las que fallaron dejan de aparecer en las
+    búsquedas). Retorna un diccionario con el resumen del proceso.
+    """
+    from src.database.queries import activate_pipeline_version, register_pipeline_version
+
+    params = normalize_params(params)
+    version = register_pipeline_version(session, params)
+    pendientes = pending_muestras(session, version.id)
+    resumen = {
+        "pipeline_version": version.id,
+        "pendientes": len(pendientes),
+        "procesadas": 0,
+        "sin_fuente": [],
+        "sin_espectro": [],
+        "errores": [],
+        "activada": False,
+    }
+
+    trabajos = []
+    for muestra_id, ruta in pendientes:
+        if not ruta or not os.path.isfile(split_ruta(ruta)[0]):
+            resumen["sin_fuente"].append(muestra_id)
+        else:
+            trabajos.append((muestra_id, ruta))
+    if log and resumen["sin_fuente"]:
+        log(f"{len(resumen['sin_fuente'])} muestras sin archivo de origen")
+
+    if trabajos:
+        rutas = [ruta for _, ruta in trabajos]
+        bloque = []
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            resultados = pool.map(vectorize_source, rutas, repeat(params),
+                                  chunksize=max(1, chunk_size // (workers or os.cpu_count() or 1)))
+            for (muestra_id, ruta), (vector, representacion, error) in zip(trabajos, resultados):
+                if error is not None:
+                    resumen["errores"].append((muestra_id, error))
+                    if log:
+                        log(f"error\t{ruta}\t{error}")
+                elif vector is None:
+                    resumen["sin_espectro"].append(muestra_id)
+                    if log:
+                        log(f"sin-espectro\t{ruta}")
+                else:
+                    espectro = EspectroVectorizado(muestra_id=muestra_id, pipeline_version=version.id,
+                                                   representacion=representacion)
+                    espectro.vector = vector
+                    bloque.append(espectro)
+
+                resumen["procesadas"] += 1
+                if len(bloque) >= chunk_size:
+                    _commit_chunk(session, bloque)
+                    if log:
+                        log(f"checkpoint\t{resumen['procesadas']}/{len(trabajos)}")
+            _commit_chunk(session, bloque)
+
+    faltantes = len(pending_muestras(session, version.id))
+    if faltantes == 0:
+        version.estado = "completa"
+        session.commit()
+    if activate and (faltantes == 0 or force):
+        activate_pipeline_version(session, version.id)
+        resumen["activada"] = True
+    resumen["faltantes"] = faltantes
+    return resumen
+
+
+def _commit_chunk(session: Session, bloque):
+    """Guarda un bloque de vectores (checkpoint) y vacía la lista."""
+    if bloque:
+        session.add_all(bloque)
+        session.commit()
+        bloque.clear()
@@ -0,0 +1,262 @@
+# src/ingestion/watcher.py
+"""
+Vigilancia de carpetas para ingesta continua e incremental.
+
+Recorre periódicamente las carpetas configuradas (sondeo; no depende de
+inotify), espera a que cada archivo nuevo deje de cambiar de tamaño y fecha
+durante `settle_seconds` (archivos que todavía se están copiando) y lo procesa
+con el parser y el vectorizador existentes en un pool acotado de hilos. Las
+inserciones en la BD se hacen desde el hilo principal.
+
+Las métricas (rendimiento, profundidad de cola, tiempos) se pueden consultar
+con FolderWatcher.metrics() y se escriben periódicamente en un archivo JSON.
+"""
+
+import io
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from src.analysis.pipeline import PERFIL_IMAGEN, normalize_params
+from src.ingestion.files import SUPPORTED_EXTENSIONS, discover_files, extract_mineral_name
+from src.ingestion.images import IMAGE_EXTENSIONS
+from src.memory import BAJO_CONSUMO, NORMAL, plan_memory, track_memory
+from src.profiling import profile
+
+
+def vectorize_path(path, params=None, data=None):
+    """
+    Retorna una lista de (ruta_imagen, vector, representación) con los
+    espectros encontrados en el archivo.
+    params son los parámetros del pipeline (por defecto DEFAULT_PARAMS).
+    data es el contenido de un DOCX ya leído: se vectoriza desde memoria sin
+    volver a abrir path.
+    Lanza MemoryBudgetExceeded si el archivo no cabe en el presupuesto de memoria.
+    """
+    params = normalize_params(params)
+    etiqueta = f"ingest-{os.path.basename(path)}"
+    fuente = path if data is None else io.BytesIO(data)
+    # Con EDS_MEMORY_BUDGET_MB los archivos grandes van en bajo consumo o se omiten
+    low_memory = plan_memory(fuente) == BAJO_CONSUMO
+    with profile(etiqueta), track_memory(etiqueta) as reporte:
+        if reporte is not None:
+            reporte["modo"] = BAJO_CONSUMO if low_memory else NORMAL
+        if path.lower().endswith(IMAGE_EXTENSIONS):
+            from src.ingestion.images import vectorize_image_file
+
+            vectores = vectorize_image_file(path, low_memory=low_memory, **params)
+            if len(vectores) == 1 and vectores[0][0] == 0:
+                return [(path, vectores[0][1], PERFIL_IMAGEN)]
+            return [(f"{path}#{page}", vector, PERFIL_IMAGEN) for page, vector in vectores]
+
+        if data is not None:
+            from src.parsers.docx_parser import vectorize_docx
+
+            vector, representacion = vectorize_docx(fuente, low_memory=low_memory, **params)
+        else:
+            from src.ingestion.files import vectorize_file
+
+            vector, representacion = vectorize_file(path, low_memory=low_memory, **params)
+        return [] if vector is None else [(path, vector, representacion)]
+
+
+def _timed_vectorize(path, params=None):
+    inicio = time.perf_counter()
+    espectros = vectorize_path(path, params)
+    return espectros, time.perf_counter() - inicio
+
+
+class FolderWatcher:
+    """Ingesta continua de los archivos nuevos que aparecen en las carpetas vigiladas."""
+
+    def __init__(self, session_factory, folders, investigador="Dataset Tesis", workers=2,
+                 poll_interval=2.0, settle_seconds=5.0, max_pending=None,
+                 metrics_path=None, metrics_interval=30.0, log=print):
+        self.session_factory = session_factory
+        self.folders = list(folders)
+        self.investigador = investigador
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.settle_seconds = settle_seconds
+        self.max_pending = max_pending or workers * 4
+        self.metrics_path = metrics_path
+        self.metrics_interval = metrics_interval
+        self.log = log
+
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="eds-watch")
+        self._observed = {}  # ruta -> (tamaño, mtime, desde cuándo no cambia)
+        self._done = set()  # rutas ya ingeridas
+        self._failed = {}  # ruta -> (tamaño, mtime) del intento fallido
+        self._ready = deque()  # archivos estables esperando un hilo libre
+        self._pending = set()  # rutas en _ready o en proceso
+        self._in_flight = {}  # future -> ruta
+        self._completed = deque(maxlen=1000)  # instantes de fin (para el rendimiento)
+        self._counters = {"ok": 0, "sin_espectro": 0, "errores": 0, "muestras": 0, "segundos_proceso": 0.0}
+        self._started = time.monotonic()
+        self._last_metrics = 0.0
+        self.params = None  # parámetros de la versión activa del pipeline (load_known_files)
+        self.pipeline_version = None
+
+    def load_known_files(self):
+        """
+        Marca como procesados los archivos que ya están en la BD y toma los
+        parámetros de la versión activa del pipeline.
+        """
+        from src.database.models import Muestra
+        from src.database.queries import get_active_pipeline
+
+        session = self.session_factory()
+        try:
+            activa = get_active_pipeline(session)
+            self.params = activa.params if activa is not None else normalize_params()
+            self.pipeline_version = activa.id if activa is not None else None
+            for (ruta,) in session.query(Muestra.ruta_imagen).filter(Muestra.ruta_imagen.isnot(None)):
+                self._done.add(os.path.abspath(ruta.split("#")[0]))
+        finally:
+            session.close()
+
+    # ------------------------------------------------------------------ #
+    # Sondeo
+    # ------------------------------------------------------------------ #
+    def scan(self):
+        """Detecta archivos nuevos y encola los que ya no están cambiando."""
+        now = time.monotonic()
+        vistos = set()
+        for path in discover_files(self.folders, SUPPORTED_EXTENSIONS):
+            path = os.path.abspath(path)
+            vistos.add(path)
+            if path in self._done or path in self._pending:
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            firma = (stat.st_size, stat.st_mtime)
+            if self._failed.get(path) == firma:
+                continue  # falló y no ha cambiado desde entonces
+
+            previo = self._observed.get(path)
+            if previo is None or previo[:2] != firma:
+                self._observed[path] = (firma[0], firma[1], now)
+            elif now - previo[2] >= self.settle_seconds and firma[0] > 0:
+                del self._observed[path]
+                self._ready.append(path)
+                self._pending.add(path)
+
+        # Olvidar archivos que desaparecieron antes de estabilizarse
+        for path in list(self._observed):
+            if path not in vistos:
+                del self._observed[path]
+
+    def _dispatch(self):
+        while self._ready and len(self._in_flight) < self.max_pending:
+            path = self._ready.popleft()
+            future = self._pool.submit(_timed_vectorize, path, self.params)
+            self._in_flight[future] = path
+
+    def _collect(self):
+        from src.database.queries import insert_espectro, insert_muestra
+
+        terminados = [f for f in self._in_flight if f.done()]
+        if not terminados:
+            return
+        session = self.session_factory()
+        try:
+            for future in terminados:
+                path = self._in_flight.pop(future)
+                self._pending.discard(path)
+                self._completed.append(time.monotonic())
+                try:
+                    espectros, segundos = future.result()
+                    self._counters["segundos_proceso"] += segundos
+                    if not espectros:
+                        self._counters["sin_espectro"] += 1
+                        self._mark_failed(path)
+                        self.log(f"sin-espectro\t{path}")
+                        continue
+                    nombre = extract_mineral_name(os.path.basename(path))
+                    for ruta, vector, representacion in espectros:
+                        muestra = insert_muestra(session, nombre_muestra=nombre,
+                                                 investigador=self.investigador, ruta_imagen=ruta)
+                        insert_espectro(session, muestra_id=muestra.id, vector=vector,
+                                        pipeline_version=self.pipeline_version, representacion=representacion)
+                        self._counters["muestras"] += 1
+                        self.log(f"ok\t{ruta}\t{muestra.id}\t{nombre}")
+                    self._counters["ok"] += 1
+                    self._done.add(path)
+                except Exception as e:
+                    session.rollback()
+                    self._counters["errores"] += 1
+                    self._mark_failed(path)
+                    self.log(f"error\t{path}\t{e}")
+        finally:
+            session.close()
+
+    def _mark_failed(self, path):
+        try:
+            stat = os.stat(path)
+            self._failed[path] = (stat.st_size, stat.st_mtime)
+        except OSError:
+            pass
+
+    # ------------------------------------------------------------------ #
+    # Métricas
+    # ------------------------------------------------------------------ #
+    def metrics(self):
+        """Retorna un diccionario con contadores, rendimiento y profundidad de cola."""
+        now = time.monotonic()
+        ultimo_minuto = sum(1 for t in self._completed if now - t <= 60)
+        procesados = self._counters["ok"] + self._counters["sin_espectro"] + self._counters["errores"]
+        return {
+            **{k: v for k, v in self._counters.items() if k != "segundos_proceso"},
+            "en_espera": len(self._observed),
+            "en_cola": len(self._ready),
+            "en_proceso": len(self._in_flight),
+            "workers": self.workers,
+            "archivos_por_minuto": ultimo_minuto,
+            "segundos_promedio_por_archivo": (
+                round(self._counters["segundos_proceso"] / procesados, 3) if procesados else None
+            ),
+            "uptime_s": round(now - self._started, 1),
+        }
+
+    def _report_metrics(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_metrics < self.metrics_interval:
+            return
+        self._last_metrics = now
+        metrics = self.metrics()
+        if self.metrics_path:
+            tmp_path = f"{self.metrics_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(metrics, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.metrics_path)
+        self.log("metricas\t" + json.dumps(metrics, ensure_ascii=False))
+
+    # ------------------------------------------------------------------ #
+    # Bucle principal
+    # ------------------------------------------------------------------ #
+    def run_once(self):
+        """Un ciclo completo: sondeo, despacho al pool y registro de resultados."""
+        self.scan()
+        self._dispatch()
+        self._collect()
+        self._report_metrics()
+
+    def run(self, stop_after=None):
+        """Ejecuta el bucle hasta Ctrl+C (o durante stop_after segundos)."""
+        self.load_known_files()
+        self.log(f"Vigilando {', '.join(self.folders)} (cada {self.poll_interval}s, {self.workers} workers)")
+        fin = None if stop_after is None else time.monotonic() + stop_after
+        try:
+            while fin is None or time.monotonic() < fin:
+                self.run_once()
+                time.sleep(self.poll_interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._pool.shutdown(wait=True)
+            self._collect()
+            self._report_metrics(force=True)
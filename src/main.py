@@ -1,21 +1,35 @@
 # src/main.py
 
+import argparse
+import os
+
 from src.analysis.compare import compare_spectrum
 from src.database.connection import SessionLocal
 from src.database.queries import (count_muestras, create_tables,
                                   insert_espectro, insert_muestra)
-from src.parsers.docx_parser import extract_and_vectorize_spectrum
+from src.parsers.docx_parser import vectorize_docx
+from src.diagnostics import add_diagnostic_arguments, configure_from_args
+from src.profiling import profile
+
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de extremo a extremo con un archivo DOCX")
+    parser.add_argument("docx_file", nargs="?", default="data/Eds_magnetita.docx",
+                        help="Archivo DOCX con el espectro (default: data/Eds_magnetita.docx)")
+    add_diagnostic_arguments(parser)
+    args = parser.parse_args(argv)
+    configure_from_args(args)
 
-def main():
     # Crear tablas si no existen
     create_tables()
     session = SessionLocal()
 
-    docx_file = "data/Eds_magnetita.docx"  # Ajusta la ruta a tu archivo real
+    docx_file = args.docx_file
+    etiqueta = os.path.basename(docx_file)
 
     # 1. Extraer y vectorizar la imagen con shape (400,512,3)
-    vector = extract_and_vectorize_spectrum(docx_file, vector_size=200)
+    with profile(f"extract-{etiqueta}"):
+        vector, representacion = vectorize_docx(docx_file, vector_size=200)
 
     if vector is None:
         print("No se encontró ninguna imagen con shape (400,512,3) en el documento.")
@@ -29,7 +43,7 @@ def main():
     )
 
     # 3. Asociar el vector en la tabla espectros_vectorizados
-    insert_espectro(session, muestra_id=nueva_muestra.id, vector=vector)
+    insert_espectro(session, muestra_id=nueva_muestra.id, vector=vector, representacion=representacion)
     print(f"Muestra '{nueva_muestra.nombre_muestra}' guardada con ID={nueva_muestra.id}")
 
     # 4. Mostrar estadísticas
@@ -38,7 +52,8 @@ def main():
 
     # 5. Comparar contra otras muestras (si existen)
     if total_muestras > 1:
-        resultados = compare_spectrum(session, nueva_muestra.id, similitud_umbral=0.5)
+        with profile(f"compare-{etiqueta}"):
+            resultados = compare_spectrum(session, nueva_muestra.id, similitud_umbral=0.5)
         if resultados:
             print("Resultados de comparación (umbral=0.5):")
             for (mid, nombre, sim) in resultados:
@@ -0,0 +1,295 @@
+# src/memory.py
+"""
+Seguimiento de memoria y presupuesto de memoria por archivo.
+
+Seguimiento (opcional, tracemalloc + RSS): cada archivo ingerido o petición
+genera un reporte con el pico de memoria de cada etapa (parseo,
+vectorización, búsqueda), el pico total, el RSS y los sitios de asignación
+con más memoria viva. Los reportes se agregan como JSON lines al registro.
+
+Presupuesto: antes de abrir un archivo se estima su pico de memoria a partir
+de los tamaños de las imágenes (tamaño en el zip y dimensiones de cabecera,
+sin decodificar). Si supera el presupuesto se procesa en modo de bajo
+consumo (gris uint8 -> float, sin copias BGR float) y, si aun así no cabe,
+se omite con MemoryBudgetExceeded.
+
+  EDS_MEMORY            '1' activa el seguimiento (tracemalloc tiene costo: no
+                        dejarlo activo en producción).
+  EDS_MEMORY_LOG        Registro JSON lines (default: profiles/memory.jsonl).
+  EDS_MEMORY_TOP        Sitios de asignación por reporte (default: 5).
+  EDS_MEMORY_BUDGET_MB  Presupuesto estimado por archivo. Vacío o 0: sin límite.
+"""
+
+import contextlib
+import json
+import os
+import threading
+import time
+
+from src.diagnostics import set_env
+
+try:
+    import resource
+except ImportError:  # Windows: sin RSS máximo del proceso
+    resource = None
+
+DEFAULT_LOG = os.path.join("profiles", "memory.jsonl")
+DEFAULT_TOP = 5
+
+# Bytes por píxel medidos con tracemalloc al decodificar y vectorizar una imagen
+# (uint8 decodificado + copias float32 BGR, suavizado y gris)
+BYTES_PER_PIXEL = 30
+BYTES_PER_PIXEL_LOW = 15
+
+# Modos de procesamiento según el presupuesto
+NORMAL = "normal"
+BAJO_CONSUMO = "bajo_consumo"
+
+_MB = 1024 * 1024
+
+# Reporte activo de cada hilo (las etapas se anotan en él). tracemalloc es
+# global al proceso: con peticiones concurrentes los picos se mezclan.
+_current = threading.local()
+_log_lock = threading.Lock()
+_tracking_lock = threading.Lock()
+_activos = 0
+
+
+def _reset_after_fork():
+    # Un proceso hijo creado dentro de un bloque medido no hereda su reporte
+    global _activos
+    _current.reporte = None
+    if _activos:
+        import tracemalloc
+
+        tracemalloc.stop()
+        _activos = 0
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class MemoryBudgetExceeded(Exception):
+    """El pico estimado de un archivo supera el presupuesto incluso en bajo consumo."""
+
+
+def configure(track=None, budget_mb=None, top=None, log_path=None):
+    """Fija EDS_MEMORY, EDS_MEMORY_BUDGET_MB, EDS_MEMORY_TOP y EDS_MEMORY_LOG."""
+    set_env(EDS_MEMORY=None if track is None else ("1" if track else ""), EDS_MEMORY_BUDGET_MB=budget_mb,
+            EDS_MEMORY_TOP=top, EDS_MEMORY_LOG=log_path)
+
+
+def tracking_enabled():
+    return os.getenv("EDS_MEMORY", "") not in ("", "0")
+
+
+def memory_budget():
+    """Presupuesto por archivo en bytes, o None si no hay."""
+    mb = float(os.getenv("EDS_MEMORY_BUDGET_MB") or 0)
+    return int(mb * _MB) if mb > 0 else None
+
+
+def rss_bytes():
+    """Memoria residente actual del proceso (Linux), o None si no se puede leer."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_rss_bytes():
+    """RSS máximo del proceso desde que arrancó, o None."""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+# ---------------------------------------------------------------------- #
+# Presupuesto
+# ---------------------------------------------------------------------- #
+def estimate_memory(path):
+    """
+    Estima el pico de memoria de vectorizar un archivo (o un DOCX abierto en
+    binario). Retorna (bytes en modo normal, bytes en bajo consumo).
+    """
+    from src.ingestion.images import IMAGE_EXTENSIONS
+
+    if hasattr(path, "seek"):
+        from src.parsers.docx_parser import estimate_docx_memory
+
+        return estimate_docx_memory(path)
+    if path.lower().endswith(IMAGE_EXTENSIONS):
+        from src.ingestion.images import estimate_image_memory
+
+        return estimate_image_memory(path)
+    if path.lower().endswith(".docx"):
+        from src.parsers.docx_parser import estimate_docx_memory
+
+        return estimate_docx_memory(path)
+    # Espectros en texto: se leen completos
+    tamano = os.path.getsize(path)
+    return tamano, tamano
+
+
+def plan_memory(path, budget=None):
+    """
+    Decide el modo de procesamiento de un archivo según el presupuesto
+    (por defecto EDS_MEMORY_BUDGET_MB). Retorna NORMAL o BAJO_CONSUMO; lanza
+    MemoryBudgetExceeded si el archivo no cabe ni en bajo consumo.
+    """
+    if budget is None:
+        budget = memory_budget()
+    if budget is None:
+        return NORMAL
+    normal, bajo = estimate_memory(path)
+    if hasattr(path, "seek"):
+        path.seek(0)
+    if normal <= budget:
+        return NORMAL
+    if bajo <= budget:
+        return BAJO_CONSUMO
+    raise MemoryBudgetExceeded(
+        f"Pico estimado de {bajo / _MB:.1f} MB en bajo consumo; el presupuesto es {budget / _MB:.1f} MB"
+    )
+
+
+# ---------------------------------------------------------------------- #
+# Seguimiento
+# ---------------------------------------------------------------------- #
+def _mb(n):
+    return round(n / _MB, 1) if n is not None else None
+
+
+def _log_path():
+    return os.getenv("EDS_MEMORY_LOG") or DEFAULT_LOG
+
+
+def _top_sites(snapshot, limite):
+    import tracemalloc
+
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+    ))
+    sitios = []
+    for stat in snapshot.statistics("lineno")[:limite]:
+        frame = stat.traceback[0]
+        sitios.append({"sitio": f"{frame.filename}:{frame.lineno}", "kb": round(stat.size / 1024, 1),
+                       "bloques": stat.count})
+    return sitios
+
+
+def _snapshot_if_larger(reporte):
+    """
+    Guarda un snapshot si la memoria viva del bloque es la mayor observada
+    (al final de cada etapa: p. ej. la imagen decodificada que el parseo
+    entrega a la vectorización). Los sitios del reporte salen de ese snapshot.
+    """
+    import tracemalloc
+
+    actual = tracemalloc.get_traced_memory()[0]
+    if actual > reporte["_snap_bytes"]:
+        reporte["_snap"] = tracemalloc.take_snapshot()
+        reporte["_snap_bytes"] = actual
+
+
+def write_report(reporte, path=None):
+    """Agrega un reporte al registro JSON lines."""
+    path = path or _log_path()
+    directorio = os.path.dirname(path)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    linea = json.dumps(reporte, ensure_ascii=False) + "\n"
+    with _log_lock, open(path, "a", encoding="utf-8") as f:
+        f.write(linea)
+
+
+@contextlib.contextmanager
+def track_memory(etiqueta):
+    """
+    Mide la memoria del bloque si el seguimiento está activo y agrega el
+    reporte al registro. Retorna el reporte (dict) o None si no se mide.
+    Dentro de un bloque ya medido en el mismo hilo no hace nada.
+    """
+    if not tracking_enabled() or getattr(_current, "reporte", None) is not None:
+        yield None
+        return
+
+    import tracemalloc
+
+    global _activos
+    with _tracking_lock:
+        # Si tracemalloc ya estaba activo por fuera (p. ej. -X tracemalloc) no se detiene
+        if _activos == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _activos = 1
+        elif _activos:
+            _activos += 1
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    reporte = _current.reporte = {
+        "etiqueta": etiqueta, "pid": os.getpid(), "inicio": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "rss_inicio_mb": _mb(rss_bytes()), "etapas": {}, "pico_mb": 0.0, "_pico": base,
+        "_snap": None, "_snap_bytes": -1,
+    }
+    inicio = time.perf_counter()
+    try:
+        yield reporte
+    finally:
+        _current.reporte = None
+        pico = max(tracemalloc.get_traced_memory()[1], reporte.pop("_pico"))
+        reporte["pico_mb"] = round((pico - base) / _MB, 2)
+        reporte["segundos"] = round(time.perf_counter() - inicio, 3)
+        # RSS máximo: desde el arranque del proceso (por archivo en la ingesta con checkpoint)
+        rss = rss_bytes()
+        reporte["rss_fin_mb"] = _mb(rss)
+        reporte["rss_max_mb"] = _mb(max(filter(None, (rss, peak_rss_bytes())), default=None))
+        _snapshot_if_larger(reporte)
+        snapshot = reporte.pop("_snap")
+        reporte.pop("_snap_bytes")
+        reporte["sitios"] = _top_sites(snapshot, int(os.getenv("EDS_MEMORY_TOP") or DEFAULT_TOP))
+        with _tracking_lock:
+            if _activos:
+                _activos -= 1
+                if _activos == 0:
+                    tracemalloc.stop()
+        write_report(reporte)
+
+
+@contextlib.contextmanager
+def stage(nombre):
+    """
+    Anota en el reporte activo del hilo el pico de memoria de una etapa
+    (parseo, vectorización, búsqueda). Sin reporte activo no hace nada.
+    """
+    reporte = getattr(_current, "reporte", None)
+    if reporte is None:
+        yield
+        return
+
+    import tracemalloc
+
+    # reset_peak borra el pico del bloque exterior: se conserva en "_pico"
+    antes, pico_previo = tracemalloc.get_traced_memory()
+    reporte["_pico"] = max(reporte["_pico"], pico_previo)
+    tracemalloc.reset_peak()
+    try:
+        yield
+    finally:
+        pico = tracemalloc.get_traced_memory()[1]
+        etapas = reporte["etapas"]
+        etapas[nombre] = round(max(etapas.get(nombre, 0.0), (pico - antes) / _MB), 2)
+        reporte["_pico"] = max(reporte["_pico"], pico)
+        _snapshot_if_larger(reporte)
+
+
+def read_reports(path=None):
+    """Lee los reportes del registro (lista vacía si no existe)."""
+    path = path or _log_path()
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(linea) for linea in f if linea.strip()]
@@ -1,58 +1,297 @@
 # src/parsers/docx_parser.py
 
-import os
-import uuid
+import posixpath
+import re
+import xml.etree.ElementTree as ET
+import zipfile
 
-import cv2
-from docx import Document
+from src.analysis.pipeline import PERFIL_IMAGEN, SERIE_GRAFICO
+from src.memory import stage
+from src.parsers.image_header import read_image_size
 
-from src.analysis.vectorize import vectorize_spectrum
+# Forma (alto, ancho, canales) de la imagen del espectro en los reportes EDS
+SPECTRUM_SHAPE = (400, 512, 3)
 
+MEDIA_PREFIX = "word/media/"
+DOCUMENT_RELS = "word/_rels/document.xml.rels"
+RELS_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
 
-def extract_and_vectorize_spectrum(docx_path, vector_size=200, temp_folder="data/temp_images"):
+# Gráficos nativos de Word (word/charts/chartN.xml) y su espacio de nombres DrawingML
+CHART_PATTERN = re.compile(r"^word/charts/chart\d*\.xml$")
+CHART_NS = "{http://schemas.openxmlformats.org/drawingml/2006/chart}"
+
+
+def list_media_entries(docx_path):
+    """
+    Lista las imágenes embebidas (word/media/*) de un DOCX sin parsear su XML.
+    Retorna una lista de (nombre_en_zip, tamaño_en_bytes).
     """
-    1. Extrae todas las imágenes de docx_path y las guarda temporalmente en temp_folder.
-    2. Busca la imagen con shape (400, 512, 3) (la de tu espectro).
-    3. Vectoriza esa imagen usando vectorize_spectrum.
-    4. Borra todas las imágenes extraídas.
-    5. Retorna el vector si la encontró, o None si no la halló.
+    with zipfile.ZipFile(docx_path) as zf:
+        return [(info.filename, info.file_size) for info in _media_infos(zf)]
 
-    Requiere:
-      - La función vectorize_spectrum en src/analysis/vectorize.py
-      - docx y opencv instalados.
+
+def _media_infos(zf):
     """
+    Entradas word/media/* ordenadas como aparecen en las relaciones del documento
+    principal (el mismo orden que recorría python-docx); las no referenciadas van al final.
+    """
+    infos = [i for i in zf.infolist() if i.filename.startswith(MEDIA_PREFIX) and not i.is_dir()]
+    try:
+        rels = ET.fromstring(zf.read(DOCUMENT_RELS))
+    except (KeyError, ET.ParseError):
+        return infos
 
-    # 1. Abrir el documento .docx
-    doc = Document(docx_path)
+    orden = {}
+    for rel in rels.iter(f"{RELS_NS}Relationship"):
+        if "image" in rel.get("Type", "") and rel.get("TargetMode") != "External":
+            target = posixpath.normpath(posixpath.join("word", rel.get("Target", "")))
+            orden.setdefault(target, len(orden))
+    return sorted(infos, key=lambda i: orden.get(i.filename, len(orden)))
+
+
+def _package_image_infos(zf):
+    """Partes del paquete que no son XML (posibles imágenes fuera de word/media/)."""
+    return [i for i in zf.infolist() if not i.is_dir() and not i.filename.endswith((".xml", ".rels"))]
 
-    # Crear la carpeta temporal si no existe
-    if not os.path.exists(temp_folder):
-        os.makedirs(temp_folder)
 
-    extracted_paths = []
+def _candidate_infos(zf, infos):
+    """Imágenes cuya cabecera tiene el tamaño del espectro o no se pudo leer."""
+    alto, ancho = SPECTRUM_SHAPE[:2]
+    for info in infos:
+        with zf.open(info) as fp:
+            size = read_image_size(fp)
+        if size is None or size == (ancho, alto):
+            yield info
 
-    # 2. Recorrer todas las relaciones para extraer imágenes
+
+def _find_spectrum_image(zf, infos=None, low_memory=False):
+    """
+    Busca la imagen del espectro leyendo solo las cabeceras de las imágenes
+    y decodificando únicamente las candidatas con el tamaño esperado.
+    Con low_memory retorna la imagen uint8 (ver vectorize_image_low_memory).
+    """
+    from src.analysis.vectorize import decode_image, decode_image_float
+
+    decode = decode_image if low_memory else decode_image_float
+    for info in _candidate_infos(zf, _media_infos(zf) if infos is None else infos):
+        img = decode(zf.read(info))
+        if img is not None and img.shape == SPECTRUM_SHAPE:
+            return img
+    return None
+
+
+def estimate_docx_memory(docx_path):
+    """
+    Estima el pico de memoria de extract_and_vectorize_spectrum sin decodificar
+    imágenes: el blob más grande entre las candidatas (leído completo) más la
+    decodificación y vectorización de una imagen del espectro. Sin word/media/
+    python-docx carga todas las partes del paquete; en bajo consumo se recorren
+    las partes del zip una a una. Retorna (bytes normal, bytes bajo consumo).
+    """
+    from src.memory import BYTES_PER_PIXEL, BYTES_PER_PIXEL_LOW
+
+    pixeles = SPECTRUM_SHAPE[0] * SPECTRUM_SHAPE[1]
+    with zipfile.ZipFile(docx_path) as zf:
+        media = _media_infos(zf)
+        blob = max((i.file_size for i in _candidate_infos(zf, media or _package_image_infos(zf))), default=0)
+        paquete = sum(i.file_size for i in zf.infolist())
+    normal = (blob if media else paquete) + pixeles * BYTES_PER_PIXEL
+    return normal, blob + pixeles * BYTES_PER_PIXEL_LOW
+
+
+def _find_spectrum_image_python_docx(docx_path):
+    """Alternativa con python-docx para paquetes que no guardan las imágenes en word/media/."""
+    from docx import Document
+
+    from src.analysis.vectorize import decode_image_float
+
+    doc = Document(docx_path)
     for rel in doc.part.rels.values():
         if "image" in rel.target_ref:
-            out_filename = f"docimg_{uuid.uuid4()}.png"
-            out_path = os.path.join(temp_folder, out_filename)
-            with open(out_path, "wb") as f:
-                f.write(rel.target_part.blob)
-            extracted_paths.append(out_path)
-
-    # 3. Buscar la imagen con shape (400,512,3)
-    chosen_vector = None
-    for img_path in extracted_paths:
-        img = cv2.imread(img_path)
-        if img is not None and img.shape == (400, 512, 3):
-            # Vectorizar de inmediato
-            chosen_vector = vectorize_spectrum(img_path, vector_size=vector_size)
-            # Ya no buscamos más, rompe el bucle
-            break
-
-    # 4. Borrar todas las imágenes extraídas
-    for img_path in extracted_paths:
-        os.remove(img_path)
-
-    # 5. Devolver el vector (None si no encontró la imagen con shape (400,512,3))
-    return chosen_vector
+            img = decode_image_float(rel.target_part.blob)
+            if img is not None and img.shape == SPECTRUM_SHAPE:
+                return img
+    return None
+
+
+def _num_values(parent):
+    """
+    Lee los valores numéricos en caché de un elemento de serie (c:val, c:yVal,
+    c:xVal o c:cat). Retorna un arreglo float64 o None si no hay datos numéricos.
+    """
+    import numpy as np
+
+    if parent is None:
+        return None
+    cache = parent.find(f"{CHART_NS}numRef/{CHART_NS}numCache")
+    if cache is None:
+        cache = parent.find(f"{CHART_NS}numLit")
+    if cache is None:
+        return None
+
+    pt_count = cache.find(f"{CHART_NS}ptCount")
+    points = {}
+    for pt in cache.iter(f"{CHART_NS}pt"):
+        value = pt.find(f"{CHART_NS}v")
+        try:
+            points[int(pt.get("idx"))] = float(value.text)
+        except (TypeError, ValueError, AttributeError):
+            continue
+    if not points:
+        return None
+
+    size = max(points) + 1
+    if pt_count is not None and pt_count.get("val", "").isdigit():
+        size = max(size, int(pt_count.get("val")))
+    values = np.full(size, np.nan)
+    values[list(points)] = list(points.values())
+    return values
+
+
+def chart_series(chart_xml):
+    """
+    Extrae las series numéricas de un gráfico de Word.
+    Retorna una lista de (x, y): x es None cuando el eje no es numérico.
+    """
+    root = ET.fromstring(chart_xml)
+    series = []
+    for ser in root.iter(f"{CHART_NS}ser"):
+        y = _num_values(ser.find(f"{CHART_NS}yVal"))
+        if y is None:
+            y = _num_values(ser.find(f"{CHART_NS}val"))
+        if y is None:
+            continue
+        x = _num_values(ser.find(f"{CHART_NS}xVal"))
+        if x is None:
+            x = _num_values(ser.find(f"{CHART_NS}cat"))
+        series.append((x, y))
+    return series
+
+
+def chart_signature(x, y):
+    """
+    Convierte una serie (x, y) en una firma equiespaciada sobre el eje x,
+    equivalente al perfil que se obtiene de la imagen del espectro.
+    """
+    import numpy as np
+
+    y = np.clip(np.nan_to_num(y, nan=0.0), 0, None)
+    if x is None or x.size != y.size or np.isnan(x).any():
+        return y
+    orden = np.argsort(x, kind="stable")
+    x, y = x[orden], y[orden]
+    if x[-1] == x[0]:
+        return y
+    grid = np.linspace(x[0], x[-1], y.size)
+    return np.interp(grid, x, y)
+
+
+def _vectorize_chart(zf, vector_size=200):
+    """
+    Vectoriza el espectro a partir del gráfico nativo con la serie más larga.
+    Retorna None si el documento no tiene gráficos con datos numéricos.
+    """
+    from src.analysis.vectorize import normalize_vector, resize_signature
+
+    mejor = None
+    for name in zf.namelist():
+        if not CHART_PATTERN.match(name):
+            continue
+        try:
+            series = chart_series(zf.read(name))
+        except ET.ParseError:
+            continue
+        for x, y in series:
+            if mejor is None or y.size > mejor[1].size:
+                mejor = (x, y)
+
+    if mejor is None or mejor[1].size < 2:
+        return None
+    resized_sig = resize_signature(chart_signature(*mejor), vector_size=vector_size)
+    if resized_sig is None:
+        return None
+    return normalize_vector(resized_sig)
+
+
+def extract_spectrum_image(docx_path):
+    """
+    Retorna la imagen del espectro (BGR float, shape (400, 512, 3)) sin
+    vectorizarla, o None si el documento no la tiene (p. ej. solo gráficos).
+    """
+    with zipfile.ZipFile(docx_path) as zf:
+        has_media = any(name.startswith(MEDIA_PREFIX) for name in zf.namelist())
+        img = _find_spectrum_image(zf) if has_media else None
+
+    if img is None and not has_media:
+        if hasattr(docx_path, "seek"):
+            docx_path.seek(0)
+        img = _find_spectrum_image_python_docx(docx_path)
+    return img
+
+
+def extract_and_vectorize_spectrum(docx_path, vector_size=200, temp_folder="data/temp_images",
+                                   threshold=0.99, row_bounds=(150, 250), method="mean",
+                                   low_memory=False):
+    """
+    Vectoriza el espectro de un DOCX (ver vectorize_docx) y retorna solo el
+    vector, o None si no lo halló. temp_folder se conserva por compatibilidad
+    y ya no se utiliza.
+    """
+    return vectorize_docx(docx_path, vector_size=vector_size, threshold=threshold, row_bounds=row_bounds,
+                          method=method, low_memory=low_memory)[0]
+
+
+def vectorize_docx(docx_path, vector_size=200, threshold=0.99, row_bounds=(150, 250), method="mean",
+                   low_memory=False):
+    """
+    1. Abre el DOCX como zip y lista las imágenes de word/media/ con su tamaño.
+    2. Lee solo la cabecera de cada imagen y decodifica en memoria la que
+       tiene shape (400, 512, 3) (la de tu espectro).
+    3. Vectoriza esa imagen con el pipeline de vectorize_spectrum.
+    4. Si no hay imagen de espectro pero el documento trae un gráfico nativo
+       (word/charts/chartN.xml), vectoriza directamente sus valores numéricos.
+    5. Retorna (vector, representación): perfil_imagen para la imagen y
+       serie_grafico para el gráfico (no son comparables entre sí), o
+       (None, None) si no halló el espectro.
+
+    No se parsea document.xml ni se escriben imágenes temporales; python-docx solo
+    se usa como alternativa si el paquete no tiene imágenes en word/media/.
+    docx_path puede ser una ruta o un archivo binario abierto (p. ej. BytesIO).
+    threshold, row_bounds y method son los parámetros de la versión del pipeline
+    (ver src/analysis/pipeline.py); los gráficos nativos solo usan vector_size.
+    low_memory vectoriza en gris sin copias BGR float y no carga python-docx
+    (ver src/memory.py).
+
+    Requiere:
+      - La función vectorize_image en src/analysis/vectorize.py
+      - opencv instalado (python-docx solo para la alternativa).
+    """
+    from src.analysis.vectorize import vectorize_image, vectorize_image_low_memory
+
+    with stage("parseo"), zipfile.ZipFile(docx_path) as zf:
+        names = zf.namelist()
+        has_media = any(name.startswith(MEDIA_PREFIX) for name in names)
+        img = _find_spectrum_image(zf, low_memory=low_memory) if has_media else None
+
+        if img is None and any(CHART_PATTERN.match(name) for name in names):
+            chart_vector = _vectorize_chart(zf, vector_size=vector_size)
+            if chart_vector is not None:
+                return chart_vector, SERIE_GRAFICO
+
+        if img is None and not has_media and low_memory:
+            img = _find_spectrum_image(zf, _package_image_infos(zf), low_memory=True)
+
+    if img is None and not has_media and not low_memory:
+        if hasattr(docx_path, "seek"):
+            docx_path.seek(0)
+        with stage("parseo"):
+            img = _find_spectrum_image_python_docx(docx_path)
+
+    # Devolver el vector (None si no encontró la imagen con shape (400,512,3) ni un gráfico)
+    if img is None:
+        return None, None
+    vectorize = vectorize_image_low_memory if low_memory else vectorize_image
+    with stage("vectorizacion"):
+        vector = vectorize(img, vector_size=vector_size, threshold=threshold,
+                           row_bounds=row_bounds, method=method)
+    return (None, None) if vector is None else (vector, PERFIL_IMAGEN)
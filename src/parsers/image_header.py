@@ -0,0 +1,144 @@
+# src/parsers/image_header.py
+"""
+Lectura de dimensiones de imágenes desde la cabecera, sin decodificar píxeles.
+
+Permite descartar imágenes que no son espectros (p. ej. micrografías) leyendo
+solo unos pocos bytes. Soporta PNG, JPEG, GIF, BMP y TIFF.
+"""
+
+import struct
+
+# Marcadores SOF de JPEG que contienen las dimensiones (excluye DHT, JPG y DAC)
+_JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def _read_exact(fp, n):
+    data = fp.read(n)
+    if len(data) < n:
+        raise EOFError
+    return data
+
+
+def _png_size(fp, head):
+    # Firma (8) + longitud (4) + "IHDR" (4) + ancho (4) + alto (4)
+    data = head + fp.read(24 - len(head))
+    if len(data) < 24 or data[12:16] != b"IHDR":
+        return None
+    width, height = struct.unpack(">II", data[16:24])
+    return width, height
+
+
+def _jpeg_size(fp, head):
+    # head contiene SOI (FFD8); se recorren los segmentos hasta el primer SOF
+    pending = head[2:]
+    def read(n):
+        nonlocal pending
+        if len(pending) >= n:
+            data, pending = pending[:n], pending[n:]
+            return data
+        data, pending = pending, b""
+        return data + _read_exact(fp, n - len(data))
+
+    while True:
+        byte = read(1)
+        if byte != b"\xff":
+            continue
+        marker = read(1)[0]
+        while marker == 0xFF:  # bytes de relleno
+            marker = read(1)[0]
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            continue  # marcadores sin longitud
+        if marker == 0xD9:
+            return None
+        length = struct.unpack(">H", read(2))[0]
+        if marker in _JPEG_SOF_MARKERS:
+            height, width = struct.unpack(">xHH", read(5))
+            return width, height
+        read(length - 2)
+
+
+def _gif_size(fp, head):
+    data = head + fp.read(10 - len(head))
+    width, height = struct.unpack("<HH", data[6:10])
+    return width, height
+
+
+def _bmp_size(fp, head):
+    data = head + fp.read(26 - len(head))
+    header_size = struct.unpack("<I", data[14:18])[0]
+    if header_size == 12:
+        width, height = struct.unpack("<HH", data[18:22])
+    else:
+        width, height = struct.unpack("<ii", data[18:26])
+    return width, abs(height)
+
+
+def tiff_page_sizes(fp, head=None, max_pages=None):
+    """
+    Retorna la lista de (ancho, alto) de cada página (IFD) de un TIFF.
+    Requiere un archivo con seek().
+    """
+    if head is None:
+        head = _read_exact(fp, 8)
+    else:
+        head = head + fp.read(8 - len(head))
+    if head[:2] == b"II":
+        endian = "<"
+    elif head[:2] == b"MM":
+        endian = ">"
+    else:
+        return []
+    start = fp.tell() - len(head)
+    offset = struct.unpack(endian + "I", head[4:8])[0]
+
+    sizes = []
+    visited = set()
+    while offset and offset not in visited:
+        visited.add(offset)
+        fp.seek(start + offset)
+        count = struct.unpack(endian + "H", _read_exact(fp, 2))[0]
+        entries = _read_exact(fp, 12 * count)
+        width = height = None
+        for i in range(count):
+            tag, typ = struct.unpack(endian + "HH", entries[12 * i:12 * i + 4])
+            if tag not in (256, 257):
+                continue
+            # SHORT (3) o LONG (4) con un solo valor
+            fmt = "H" if typ == 3 else "I"
+            value = struct.unpack(endian + fmt, entries[12 * i + 8:12 * i + 8 + struct.calcsize(fmt)])[0]
+            if tag == 256:
+                width = value
+            else:
+                height = value
+        sizes.append((width, height))
+        if max_pages is not None and len(sizes) >= max_pages:
+            break
+        offset = struct.unpack(endian + "I", _read_exact(fp, 4))[0]
+    return sizes
+
+
+def _tiff_size(fp, head):
+    sizes = tiff_page_sizes(fp, head, max_pages=1)
+    return sizes[0] if sizes and None not in sizes[0] else None
+
+
+def read_image_size(fp):
+    """
+    Retorna (ancho, alto) leyendo solo la cabecera del archivo, o None si el
+    formato no es reconocido o la cabecera está incompleta.
+    """
+    head = fp.read(8)
+    try:
+        if head.startswith(b"\x89PNG\r\n\x1a\n"):
+            return _png_size(fp, head)
+        if head.startswith(b"\xff\xd8"):
+            return _jpeg_size(fp, head)
+        if head[:6] in (b"GIF87a", b"GIF89a"):
+            return _gif_size(fp, head)
+        if head.startswith(b"BM"):
+            return _bmp_size(fp, head)
+        if head[:4] in (b"II*\x00", b"MM\x00*"):
+            return _tiff_size(fp, head)
+    except (EOFError, struct.error, OSError):
+        return None
+    return None
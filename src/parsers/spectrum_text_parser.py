@@ -0,0 +1,174 @@
+# src/parsers/spectrum_text_parser.py
+"""
+Lectura de espectros EDS exportados como texto (EMSA/MSA y CSV).
+
+Los conteos se leen directamente con NumPy y se re-muestrean en `vector_size`
+bins dentro de ENERGY_RANGE_KEV, sin decodificar imágenes ni usar OpenCV. El
+eje de los vectores de imágenes no está calibrado en energía, por eso estos
+vectores se guardan como representación conteos_energia y no se comparan con
+los perfiles de imagen.
+"""
+
+import csv
+import os
+import re
+
+import numpy as np
+
+# Rango de energía (keV) que cubre el vector; cada bin mide (fin - inicio) / vector_size
+ENERGY_RANGE_KEV = (0.0, 20.0)
+
+# Energía por canal cuando un CSV solo trae la columna de conteos (keV)
+DEFAULT_KEV_PER_CHANNEL = 0.01
+
+EMSA_EXTENSIONS = (".msa", ".emsa")
+CSV_EXTENSIONS = (".csv",)
+TEXT_SPECTRUM_EXTENSIONS = EMSA_EXTENSIONS + CSV_EXTENSIONS
+
+
+def _to_kev(values, units):
+    """Convierte un eje de energía a keV según las unidades declaradas."""
+    units = (units or "").strip().lower()
+    if units == "ev":
+        return values / 1000.0
+    return values
+
+
+def _emsa_values(lineas):
+    """
+    Valores numéricos del bloque de datos EMSA, línea por línea hasta
+    #ENDOFDATA (separados por comas y/o espacios). Un valor no numérico es un
+    archivo corrupto: se rechaza en lugar de truncar el espectro.
+    """
+    for numero, linea in lineas:
+        if linea.startswith("#"):
+            if linea[1:].strip().upper().startswith("ENDOFDATA"):
+                return
+            continue
+        for token in linea.replace(",", " ").split():
+            try:
+                yield float(token)
+            except ValueError:
+                raise ValueError(f"Valor no numérico {token!r} en la línea {numero} de los datos EMSA.")
+
+
+def parse_emsa(path):
+    """
+    Lee un archivo EMSA/MSA. Los datos se convierten con NumPy directamente
+    desde el archivo abierto, sin cargar el bloque completo como texto.
+    Retorna (energias_kev, conteos) como arreglos float64.
+    Lanza ValueError si los datos tienen valores no numéricos, si en XY queda
+    un valor sin pareja o si la cantidad de puntos no coincide con NPOINTS.
+    """
+    header = {}
+    with open(path, "r", encoding="latin-1") as f:
+        lineas = enumerate(f, start=1)
+        # 1. Cabecera: líneas "#CLAVE : valor" hasta #SPECTRUM
+        for _, line in lineas:
+            if not line.startswith("#"):
+                continue
+            key, _, value = line[1:].partition(":")
+            key = key.strip().upper()
+            if key == "SPECTRUM":
+                break
+            header[key] = value.strip()
+
+        # 2. Datos: NumPy consume los valores a medida que se leen las líneas
+        values = np.fromiter(_emsa_values(lineas), dtype=np.float64)
+
+    datatype = header.get("DATATYPE", "Y").upper()
+    if datatype == "XY":
+        if values.size % 2:
+            raise ValueError(f"Datos XY con una cantidad impar de valores ({values.size}) en {path}.")
+        values = values.reshape(-1, 2)
+        energies, counts = values[:, 0], values[:, 1]
+    else:
+        counts = values
+        offset = float(header.get("OFFSET", 0.0))
+        xperchan = float(header.get("XPERCHAN", 1.0))
+        energies = offset + xperchan * np.arange(counts.size)
+
+    if "NPOINTS" in header:
+        npoints = int(float(header["NPOINTS"]))
+        if counts.size != npoints:
+            raise ValueError(f"{path} declara NPOINTS={npoints} pero tiene {counts.size} puntos.")
+    return _to_kev(energies, header.get("XUNITS")), counts
+
+
+def _energy_unit(encabezado):
+    """Unidad de energía nombrada en un encabezado ('kev', 'ev') o None."""
+    palabras = re.findall(r"[a-z]+", encabezado.lower())
+    if "kev" in palabras:
+        return "kev"
+    if "ev" in palabras:
+        return "ev"
+    return None
+
+
+def parse_csv_spectrum(path, kev_per_channel=DEFAULT_KEV_PER_CHANNEL):
+    """
+    Lee un CSV con columnas (energía, conteos) o solo conteos.
+    Las filas de encabezado no numéricas se omiten; si nombran la unidad de la
+    energía ("keV" o "eV") se usa esa. Sin unidad en el encabezado se supone
+    eV cuando la energía máxima supera 100, lo que es solo una estimación.
+    Retorna (energias_kev, conteos) como arreglos float64.
+    """
+    with open(path, "r", encoding="utf-8-sig") as f:
+        sample = f.read(4096)
+        f.seek(0)
+        try:
+            delimiter = csv.Sniffer().sniff(sample, delimiters=",;\t").delimiter
+        except csv.Error:
+            delimiter = ","
+
+        # Saltar las filas iniciales que no son numéricas (encabezados)
+        skip = 0
+        unidad = None
+        for line in sample.splitlines():
+            first = line.split(delimiter)[0].strip()
+            try:
+                float(first)
+                break
+            except ValueError:
+                skip += 1
+                unidad = _energy_unit(first) or unidad
+
+        values = np.loadtxt(f, delimiter=delimiter, skiprows=skip, ndmin=2)
+
+    if values.shape[1] >= 2:
+        energies, counts = values[:, 0], values[:, 1]
+        if unidad == "ev" or (unidad is None and energies.size and energies.max() > 100):
+            energies = energies / 1000.0
+    else:
+        counts = values[:, 0]
+        energies = kev_per_channel * np.arange(counts.size)
+    return energies, counts
+
+
+def rebin_counts(energies, counts, vector_size=200, energy_range=ENERGY_RANGE_KEV):
+    """
+    Suma los conteos en `vector_size` bins iguales dentro de energy_range.
+    Los canales fuera del rango se descartan.
+    """
+    sums, _ = np.histogram(energies, bins=vector_size, range=energy_range, weights=counts)
+    return sums.astype(np.float32)
+
+
+def vectorize_text_spectrum(path, vector_size=200, energy_range=ENERGY_RANGE_KEV):
+    """
+    Vectoriza un espectro EMSA/MSA o CSV.
+    Retorna el vector normalizado (norma L2) o None si no hay conteos en el rango.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext in EMSA_EXTENSIONS:
+        energies, counts = parse_emsa(path)
+    elif ext in CSV_EXTENSIONS:
+        energies, counts = parse_csv_spectrum(path)
+    else:
+        raise ValueError(f"Formato de espectro no soportado: {path}")
+
+    vector = rebin_counts(energies, np.clip(counts, 0, None), vector_size, energy_range)
+    norm = np.linalg.norm(vector)
+    if norm == 0:
+        return None
+    return vector / norm
@@ -0,0 +1,134 @@
+# src/profiling.py
+"""
+Perfilado opcional de peticiones y archivos de ingesta.
+
+Se activa con variables de entorno (o con las opciones --profile de los
+scripts, ver src/diagnostics.py, que las fijan y así llegan también a los
+procesos hijos):
+
+  EDS_PROFILE           'cprofile' (determinista, .pstats) o 'sample' (muestreo,
+                        pilas colapsadas .collapsed compatibles con flamegraph.pl
+                        y speedscope). Vacío: desactivado.
+  EDS_PROFILE_DIR       Carpeta de los artefactos (default: profiles).
+  EDS_PROFILE_RATE      Fracción de peticiones/archivos perfilados (default: 1.0).
+  EDS_PROFILE_INTERVAL  Milisegundos entre muestras en modo 'sample' (default: 5).
+
+El modo 'sample' con una fracción baja tiene un costo despreciable y puede
+quedar activo en producción. Cada artefacto se nombra con la etiqueta de la
+petición o del archivo, la hora y el pid.
+"""
+
+import collections
+import contextlib
+import os
+import random
+import re
+import sys
+import threading
+import time
+
+from src.diagnostics import set_env
+
+MODES = ("cprofile", "sample")
+DEFAULT_DIR = "profiles"
+DEFAULT_INTERVAL_MS = 5.0
+
+
+def configure(mode=None, directory=None, rate=None, interval_ms=None):
+    """Fija EDS_PROFILE, EDS_PROFILE_DIR, EDS_PROFILE_RATE y EDS_PROFILE_INTERVAL."""
+    if mode is not None and mode not in MODES:
+        raise ValueError(f"Modo de perfilado desconocido: {mode!r} (use {' o '.join(MODES)}).")
+    set_env(EDS_PROFILE=mode, EDS_PROFILE_DIR=directory, EDS_PROFILE_RATE=rate, EDS_PROFILE_INTERVAL=interval_ms)
+
+
+def reset_inherited_profiler():
+    """
+    Inicializador de pools de procesos: un proceso creado con fork desde un
+    bloque perfilado hereda el perfilador activo, que se descarta aquí.
+    """
+    sys.setprofile(None)
+
+
+def _artifact_path(etiqueta, extension):
+    directorio = os.getenv("EDS_PROFILE_DIR") or DEFAULT_DIR
+    os.makedirs(directorio, exist_ok=True)
+    nombre = re.sub(r"[^\w.-]+", "_", etiqueta).strip("_")[:80] or "perfil"
+    marca = time.strftime("%Y%m%d-%H%M%S")
+    return os.path.join(directorio, f"{nombre}-{marca}-{os.getpid()}{extension}")
+
+
+class StackSampler:
+    """
+    Muestrea la pila de un hilo cada `interval` segundos desde un hilo aparte
+    y acumula las pilas colapsadas ("raiz;...;hoja" -> cantidad).
+    """
+
+    def __init__(self, thread_id=None, interval=DEFAULT_INTERVAL_MS / 1000.0):
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="eds-profiler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            pila = []
+            while frame is not None:
+                code = frame.f_code
+                pila.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if pila:
+                self.stacks[";".join(reversed(pila))] += 1
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for pila, cantidad in self.stacks.most_common():
+                f.write(f"{pila} {cantidad}\n")
+
+
+@contextlib.contextmanager
+def profile(etiqueta):
+    """
+    Perfila el bloque si el perfilado está activo (y la petición cae dentro de
+    EDS_PROFILE_RATE). Retorna la ruta del artefacto, o None si no se perfila.
+    """
+    mode = os.getenv("EDS_PROFILE", "")
+    if mode not in MODES or random.random() >= float(os.getenv("EDS_PROFILE_RATE") or 1.0):
+        yield None
+        return
+
+    if mode == "cprofile":
+        import cProfile
+
+        if sys.getprofile() is not None:
+            # Ya hay un perfil activo en este hilo (bloques anidados)
+            yield None
+            return
+
+        path = _artifact_path(etiqueta, ".pstats")
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield path
+        finally:
+            profiler.disable()
+            profiler.dump_stats(path)
+        return
+
+    path = _artifact_path(etiqueta, ".collapsed")
+    interval = float(os.getenv("EDS_PROFILE_INTERVAL") or DEFAULT_INTERVAL_MS) / 1000.0
+    sampler = StackSampler(interval=interval).start()
+    try:
+        yield path
+    finally:
+        sampler.stop()
+        sampler.write(path)
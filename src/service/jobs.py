@@ -0,0 +1,173 @@
+# src/service/jobs.py
+"""
+Procesamiento en segundo plano de archivos subidos.
+
+Un JobManager compartido (uno por proceso) ejecuta la extracción, vectorización
+y comparación en un pool de hilos. Cada archivo recibe un job_id cuyo estado y
+progreso se pueden consultar, y los vectores se guardan en una caché acotada
+indexada por el hash del archivo (y la versión del pipeline) para no repetir
+el pipeline en re-subidas. Los resultados de la comparación se reutilizan de
+la caché de resultados (src/analysis/cache.py) mientras la biblioteca no cambie.
+"""
+
+import hashlib
+import io
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from src.analysis.pipeline import normalize_params
+from src.database.connection import SessionLocal
+from src.memory import BAJO_CONSUMO, plan_memory, track_memory
+from src.profiling import profile
+
+# Estados de un trabajo
+PENDIENTE = "pendiente"
+EXTRAYENDO = "extrayendo"
+COMPARANDO = "comparando"
+COMPLETADO = "completado"
+ERROR = "error"
+
+
+def file_hash(data: bytes):
+    """Hash SHA-256 del contenido de un archivo."""
+    return hashlib.sha256(data).hexdigest()
+
+
+class JobManager:
+    """Ejecutor compartido de trabajos de identificación con caché por hash de archivo."""
+
+    def __init__(self, max_workers=2, cache_size=64, max_jobs=256, results=None):
+        from src.analysis.cache import get_result_cache
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="eds-job")
+        # Caché de resultados (vector + versión de la biblioteca -> coincidencias)
+        self.results = results if results is not None else get_result_cache()
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._vectors = OrderedDict()
+        self.cache_size = cache_size
+        self.max_jobs = max_jobs
+
+    def submit(self, data: bytes, filename: str):
+        """
+        Encola un archivo DOCX para identificación y retorna su job_id.
+        Si el mismo archivo ya está en proceso se reutiliza el trabajo existente.
+        """
+        digest = file_hash(data)
+        with self._lock:
+            for job in self._jobs.values():
+                if job["file_hash"] == digest and job["estado"] not in (COMPLETADO, ERROR):
+                    return job["id"]
+
+            job_id = uuid.uuid4().hex[:12]
+            self._jobs[job_id] = {
+                "id": job_id,
+                "filename": filename,
+                "file_hash": digest,
+                "estado": PENDIENTE,
+                "progreso": 0.0,
+                "vector": None,
+                "representacion": None,
+                "resultados": None,
+                "error": None,
+                "creado": time.time(),
+                "terminado": None,
+            }
+            self._evict_jobs()
+
+        self._executor.submit(self._run_profiled, job_id, data, filename)
+        return job_id
+
+    def get(self, job_id):
+        """Retorna una copia del estado del trabajo o None si no existe."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def _evict_jobs(self):
+        """Descarta los trabajos terminados más antiguos cuando se supera max_jobs."""
+        terminados = [jid for jid, job in self._jobs.items() if job["estado"] in (COMPLETADO, ERROR)]
+        while len(self._jobs) > self.max_jobs and terminados:
+            del self._jobs[terminados.pop(0)]
+
+    def _cached_vector(self, key):
+        with self._lock:
+            vector = self._vectors.get(key)
+            if vector is not None:
+                self._vectors.move_to_end(key)
+            return vector
+
+    def _store_vector(self, key, vector):
+        with self._lock:
+            self._vectors[key] = vector
+            self._vectors.move_to_end(key)
+            while len(self._vectors) > self.cache_size:
+                self._vectors.popitem(last=False)
+
+    def _run_profiled(self, job_id, data, filename):
+        etiqueta = f"job-{filename}-{job_id}"
+        with profile(etiqueta), track_memory(etiqueta):
+            self._run(job_id, data)
+
+    def _run(self, job_id, data):
+        from src.analysis.cache import result_key, score_mode
+        from src.analysis.library import cached_library
+        from src.database.queries import get_active_pipeline, get_library_version
+        from src.parsers.docx_parser import vectorize_docx
+
+        try:
+            # La versión activa del pipeline fija los parámetros de vectorización;
+            # la versión de la biblioteca decide si sirve un resultado en caché.
+            session = SessionLocal()
+            try:
+                activa = get_active_pipeline(session)
+                pipeline_version = activa.id if activa is not None else None
+                params = activa.params if activa is not None else normalize_params()
+                library_version = get_library_version(session)
+            finally:
+                session.close()
+            key = (file_hash(data), pipeline_version)
+
+            # 1. Vectorizar (o reutilizar el vector de una subida anterior)
+            vector, representacion = self._cached_vector(key) or (None, None)
+            if vector is None:
+                self._update(job_id, estado=EXTRAYENDO, progreso=0.1)
+                archivo = io.BytesIO(data)
+                vector, representacion = vectorize_docx(archivo, low_memory=plan_memory(archivo) == BAJO_CONSUMO,
+                                                        **normalize_params(params))
+                if vector is None:
+                    self._update(
+                        job_id, estado=ERROR, progreso=1.0, terminado=time.time(),
+                        error="No se encontró un espectro válido en el archivo.",
+                    )
+                    return
+                self._store_vector(key, (vector, representacion))
+
+            # 2. Comparar contra la biblioteca sin insertar muestras temporales
+            #    (o reutilizar el resultado si la biblioteca no cambió)
+            #    Solo se compara contra vectores de la misma representación.
+            self._update(job_id, estado=COMPARANDO, progreso=0.7, vector=vector,
+                         representacion=representacion)
+            modo = score_mode(None, representacion)
+            resultados = self.results.get(result_key(vector, library_version, pipeline_version, modo=modo))
+            if resultados is None:
+                session = SessionLocal()
+                try:
+                    library = cached_library(session, representacion=representacion)
+                finally:
+                    session.close()
+                resultados = library.search(vector, similitud_umbral=0.0)[0]
+                self.results.put(result_key(vector, library.library_version, library.pipeline_version,
+                                            modo=modo), resultados)
+
+            self._update(job_id, estado=COMPLETADO, progreso=1.0, resultados=resultados, terminado=time.time())
+        except Exception as e:
+            self._update(job_id, estado=ERROR, progreso=1.0, error=str(e), terminado=time.time())
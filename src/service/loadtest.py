@@ -0,0 +1,487 @@
+# src/service/loadtest.py
+"""
+Prueba de carga local del servicio HTTP de identificación.
+
+Crea una BD temporal, la llena con un corpus de archivos (ingesta con
+src/ingestion/async_pipeline.py) o con espectros sintéticos, levanta
+src/service/server.py como subproceso sobre esa BD y le envía consultas
+concurrentes:
+
+  - lazo cerrado (por defecto): `concurrency` clientes, cada uno envía la
+    siguiente consulta apenas recibe la respuesta anterior.
+  - lazo abierto (--rate): llegadas de Poisson a `rate` consultas por segundo
+    con hasta `concurrency` en vuelo; la latencia se mide desde la llegada
+    programada, así que incluye la espera si el servicio no da abasto.
+
+Informa rendimiento, latencias p50/p95/p99, errores por código HTTP, errores
+de bloqueo de SQLite ("database is locked"), errores de conexión y el uso de
+CPU del servidor (núcleos promedio, proceso principal más el pool de parseo).
+
+Uso:
+    python -m src.service.loadtest --corpus "muestrasdatos/Muestras Tesis" --concurrency 16 --duration 30
+    python -m src.service.loadtest --synthetic 50000 --mode vector --rate 200 --duration 20
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+MODOS = ("upload", "vector")
+DEFAULT_CONCURRENCY = 8
+DEFAULT_DURATION_S = 10.0
+
+
+# ---------------------------------------------------------------------- #
+# Biblioteca temporal
+# ---------------------------------------------------------------------- #
+def synthetic_spectra(n, vector_size=200, seed=0):
+    """
+    Espectros sintéticos normalizados: entre 3 y 8 picos gaussianos sobre un
+    fondo bajo, como las firmas que produce el pipeline.
+    """
+    rng = np.random.default_rng(seed)
+    x = np.arange(vector_size, dtype=np.float32)
+    vectores = np.empty((n, vector_size), dtype=np.float32)
+    for i in range(n):
+        picos = rng.integers(3, 9)
+        centros = rng.uniform(0, vector_size, picos)
+        anchos = rng.uniform(1.0, 4.0, picos)
+        alturas = rng.uniform(0.2, 1.0, picos)
+        señal = (alturas[:, None] * np.exp(-0.5 * ((x - centros[:, None]) / anchos[:, None]) ** 2)).sum(axis=0)
+        señal += rng.uniform(0.0, 0.02, vector_size)
+        vectores[i] = señal / np.linalg.norm(señal)
+    return vectores
+
+
+def seed_database(url, corpus=None, synthetic=0, workers=None, log=None):
+    """
+    Crea el esquema en la BD indicada y la llena con los archivos del corpus
+    y/o `synthetic` espectros sintéticos. Retorna el número de muestras.
+    """
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from src.analysis.pipeline import DEFAULT_PARAMS
+    from src.database.connection import enable_sqlite_foreign_keys
+    from src.database.queries import count_muestras_with_vectors, create_tables, register_pipeline_version
+    from src.database.transfer import bulk_insert
+
+    engine = enable_sqlite_foreign_keys(create_engine(url))
+    create_tables(engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    try:
+        if corpus:
+            from src.ingestion.async_pipeline import run_ingest_async
+
+            run_ingest_async(session_factory, corpus, investigador="Prueba de carga", workers=workers)
+        if synthetic:
+            session = session_factory()
+            try:
+                version = register_pipeline_version(session, DEFAULT_PARAMS).id
+                vectores = synthetic_spectra(synthetic, DEFAULT_PARAMS["vector_size"])
+                for inicio in range(0, synthetic, 5000):
+                    lote = vectores[inicio:inicio + 5000]
+                    filas = [{"nombre_muestra": f"SINTETICO_{inicio + i:06d}", "investigador": "Prueba de carga"}
+                             for i in range(len(lote))]
+                    bulk_insert(session, filas, lote, version)
+                    session.commit()
+            finally:
+                session.close()
+        session = session_factory()
+        try:
+            total = count_muestras_with_vectors(session)
+        finally:
+            session.close()
+    finally:
+        engine.dispose()
+    if log:
+        log(f"BD temporal con {total} muestras")
+    return total
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _cpu_seconds(pid):
+    """CPU (usuario + sistema) de un proceso y sus hijos directos vivos (Linux), o None."""
+    tick = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+    def leer(p):
+        with open(f"/proc/{p}/stat") as f:
+            campos = f.read().rpartition(")")[2].split()
+        return int(campos[1]), (int(campos[11]) + int(campos[12])) / tick  # ppid, utime + stime
+
+    try:
+        total = leer(pid)[1]
+    except (OSError, ValueError, IndexError):
+        return None
+    for entrada in os.listdir("/proc"):
+        if entrada.isdigit() and int(entrada) != pid:
+            try:
+                ppid, cpu = leer(entrada)
+            except (OSError, ValueError, IndexError):
+                continue
+            if ppid == pid:
+                total += cpu
+    return total
+
+
+# ---------------------------------------------------------------------- #
+# Cliente HTTP mínimo (keep-alive, una conexión por cliente)
+# ---------------------------------------------------------------------- #
+class _Connection:
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=b"", content_type="application/octet-stream"):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        head = (f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n")
+        try:
+            self.writer.write(head.encode("latin-1") + body)
+            await self.writer.drain()
+            status = int((await self.reader.readline()).split()[1])
+            largo = 0
+            while True:
+                linea = await self.reader.readline()
+                if linea in (b"\r\n", b"\n", b""):
+                    break
+                nombre, _, valor = linea.decode("latin-1").partition(":")
+                if nombre.strip().lower() == "content-length":
+                    largo = int(valor.strip())
+            return status, await self.reader.readexactly(largo)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+class LoadResult:
+    """Latencias y contadores de una prueba."""
+
+    def __init__(self):
+        self.latencias = []
+        self.codigos = {}
+        self.bloqueos = 0
+        self.errores_conexion = 0
+
+    def record(self, latencia, status=None, cuerpo=b""):
+        self.latencias.append(latencia)
+        if status is None:
+            self.errores_conexion += 1
+            return
+        self.codigos[status] = self.codigos.get(status, 0) + 1
+        if status >= 500 and b"locked" in cuerpo:
+            self.bloqueos += 1
+
+    def summary(self, segundos):
+        lat = np.asarray(self.latencias, dtype=np.float64) * 1000.0
+        total = len(lat)
+        ok = self.codigos.get(200, 0)
+        p50, p95, p99 = np.percentile(lat, (50, 95, 99)) if total else (None, None, None)
+        return {
+            "consultas": total,
+            "ok": ok,
+            "errores": total - ok,
+            "codigos": {str(k): v for k, v in sorted(self.codigos.items())},
+            "bloqueos_sqlite": self.bloqueos,
+            "errores_conexion": self.errores_conexion,
+            "segundos": round(segundos, 2),
+            "consultas_por_segundo": round(ok / segundos, 2) if segundos else None,
+            "latencia_ms": {
+                "media": round(float(lat.mean()), 2) if total else None,
+                "p50": round(float(p50), 2) if total else None,
+                "p95": round(float(p95), 2) if total else None,
+                "p99": round(float(p99), 2) if total else None,
+                "max": round(float(lat.max()), 2) if total else None,
+            },
+        }
+
+
+def _build_requests(modo, corpus_files, vectores, top_k, ventana=None, seed=0):
+    """Retorna una función que genera (ruta, cuerpo, content-type) para cada consulta."""
+    rng = random.Random(seed)
+    if modo == "upload":
+        cuerpos = []
+        for path in corpus_files:
+            with open(path, "rb") as f:
+                cuerpos.append(f.read())
+        if not cuerpos:
+            raise ValueError("El modo upload necesita archivos DOCX en el corpus.")
+        ruta = f"/identify/upload?top_k={top_k}" + (f"&ventana={ventana[0]},{ventana[1]}" if ventana else "")
+        return lambda: (ruta, rng.choice(cuerpos), "application/octet-stream")
+
+    if vectores is None or not len(vectores):
+        raise ValueError("El modo vector necesita vectores de consulta (--synthetic o --corpus).")
+    ruido = np.random.default_rng(seed)
+
+    def siguiente():
+        # Consulta = espectro de la biblioteca con ruido (resultados no repetidos en la caché)
+        v = vectores[rng.randrange(len(vectores))] + ruido.normal(0, 0.01, vectores.shape[1]).astype(np.float32)
+        payload = {"vector": (v / np.linalg.norm(v)).tolist(), "top_k": top_k, "ventana": ventana}
+        cuerpo = json.dumps(payload).encode("utf-8")
+        return "/identify/vector", cuerpo, "application/json"
+    return siguiente
+
+
+async def run_load(host, port, siguiente, concurrency=DEFAULT_CONCURRENCY, rate=None,
+                   duration=DEFAULT_DURATION_S, requests=None, progress=None):
+    """
+    Envía consultas al servicio durante `duration` segundos (o hasta
+    `requests` consultas). Retorna (LoadResult, segundos transcurridos).
+    """
+    resultado = LoadResult()
+    conexiones = asyncio.Queue()
+    for _ in range(concurrency):
+        conexiones.put_nowait(_Connection(host, port))
+    inicio = time.perf_counter()
+    fin = inicio + duration if duration else None
+    enviadas = 0
+
+    def quedan():
+        return (fin is None or time.perf_counter() < fin) and (requests is None or enviadas < requests)
+
+    async def enviar(llegada):
+        ruta, cuerpo, tipo = siguiente()
+        conexion = await conexiones.get()
+        try:
+            status, respuesta = await conexion.request("POST", ruta, cuerpo, tipo)
+            resultado.record(time.perf_counter() - llegada, status, respuesta)
+        except (OSError, asyncio.IncompleteReadError, ValueError, IndexError):
+            resultado.record(time.perf_counter() - llegada)
+        finally:
+            conexiones.put_nowait(conexion)
+        if progress and len(resultado.latencias) % 500 == 0:
+            progress(len(resultado.latencias), time.perf_counter() - inicio)
+
+    if rate:
+        # Lazo abierto: llegadas de Poisson, sin esperar a que terminen las anteriores
+        pendientes = set()
+        proxima = inicio
+        while quedan():
+            proxima += random.expovariate(rate)
+            await asyncio.sleep(max(0.0, proxima - time.perf_counter()))
+            enviadas += 1
+            tarea = asyncio.create_task(enviar(proxima))
+            pendientes.add(tarea)
+            tarea.add_done_callback(pendientes.discard)
+        if pendientes:
+            await asyncio.gather(*pendientes)
+    else:
+        async def cliente():
+            nonlocal enviadas
+            while quedan():
+                enviadas += 1
+                await enviar(time.perf_counter())
+        await asyncio.gather(*(cliente() for _ in range(concurrency)))
+
+    transcurrido = time.perf_counter() - inicio
+    while not conexiones.empty():
+        conexiones.get_nowait().close()
+    return resultado, transcurrido
+
+
+# ---------------------------------------------------------------------- #
+# Orquestación
+# ---------------------------------------------------------------------- #
+def _log_tail(path, lineas=20):
+    """Últimas líneas del registro del servidor (para los mensajes de error)."""
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            cola = f.readlines()[-lineas:]
+    except OSError:
+        return ""
+    return "".join(cola).rstrip()
+
+
+def _wait_ready(host, port, proceso, log_path, timeout=120.0):
+    import urllib.request
+
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        if proceso.poll() is not None:
+            raise RuntimeError(f"El servidor terminó al iniciar (código {proceso.returncode}). "
+                               f"Últimas líneas de {log_path}:\n{_log_tail(log_path)}")
+        try:
+            with urllib.request.urlopen(f"http://{host}:{port}/health", timeout=2) as r:
+                return json.loads(r.read())
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"El servidor no respondió a /health a tiempo. "
+                       f"Últimas líneas de {log_path}:\n{_log_tail(log_path)}")
+
+
+def _health(host, port):
+    import urllib.request
+
+    try:
+        with urllib.request.urlopen(f"http://{host}:{port}/health", timeout=5) as r:
+            return json.loads(r.read())
+    except OSError:
+        return None
+
+
+def load_test(corpus=None, synthetic=0, modo="upload", concurrency=DEFAULT_CONCURRENCY, rate=None,
+              duration=DEFAULT_DURATION_S, requests=None, top_k=10, ventana=None, server_workers=None, cache_size=0,
+              window_ms=None, keep=False, log=print):
+    """
+    Ejecuta una prueba completa sobre una BD temporal y retorna el resumen.
+    cache_size=0 desactiva la caché de resultados del servidor para medir el
+    camino completo de identificación.
+    """
+    from src.ingestion.files import DOCX_EXTENSIONS, discover_files
+
+    archivos = discover_files(corpus) if corpus else []
+    docx = [p for p in archivos if p.lower().endswith(DOCX_EXTENSIONS)]
+    directorio = tempfile.mkdtemp(prefix="eds-loadtest-")
+    url = f"sqlite:///{os.path.join(directorio, 'loadtest.db')}"
+    host, port = "127.0.0.1", _free_port()
+    proceso = None
+    try:
+        muestras = seed_database(url, archivos, synthetic, workers=server_workers, log=log)
+
+        vectores = None
+        if modo == "vector":
+            vectores = _library_vectors(url, limite=10000)
+        siguiente = _build_requests(modo, docx, vectores, top_k, ventana)
+
+        env = {**os.environ, "EDS_DATABASE_URL": url, "EDS_SQL_ECHO": "0"}
+        comando = [sys.executable, "-m", "src.service.server", "--host", host, "--port", str(port),
+                   "--cache-size", str(cache_size)]
+        if server_workers:
+            comando += ["--workers", str(server_workers)]
+        if window_ms is not None:
+            comando += ["--window-ms", str(window_ms)]
+        # stderr va a un archivo: una tubería que nadie lee bloquearía al servidor al llenarse
+        log_path = os.path.join(directorio, "server.log")
+        with open(log_path, "wb") as salida:
+            proceso = subprocess.Popen(comando, env=env, stdout=subprocess.DEVNULL, stderr=salida)
+        _wait_ready(host, port, proceso, log_path)
+
+        modo_carga = f"{rate}/s (lazo abierto)" if rate else "lazo cerrado"
+        log(f"Prueba {modo}: {concurrency} concurrentes, {modo_carga}, "
+            f"{f'{requests} consultas' if requests else f'{duration} s'} contra {muestras} muestras")
+        cpu_inicio = _cpu_seconds(proceso.pid)
+        resultado, segundos = asyncio.run(run_load(
+            host, port, siguiente, concurrency=concurrency, rate=rate,
+            duration=None if requests else duration, requests=requests,
+            progress=lambda n, t: log(f"  {n} consultas en {t:.1f} s"),
+        ))
+        cpu_fin = _cpu_seconds(proceso.pid)
+
+        resumen = resultado.summary(segundos)
+        resumen.update({
+            "modo": modo, "concurrencia": concurrency, "tasa": rate, "muestras": muestras,
+            "cpu_servidor_nucleos": (round((cpu_fin - cpu_inicio) / segundos, 2)
+                                     if cpu_inicio is not None and cpu_fin is not None and segundos else None),
+            "nucleos_disponibles": os.cpu_count(),
+            "servidor": _health(host, port),
+        })
+        return resumen
+    finally:
+        if proceso is not None:
+            proceso.terminate()
+            try:
+                proceso.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proceso.kill()
+        if keep:
+            log(f"BD temporal conservada en {directorio}")
+        else:
+            shutil.rmtree(directorio, ignore_errors=True)
+
+
+def _library_vectors(url, limite):
+    """Vectores de la biblioteca temporal (para generar consultas en modo vector)."""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+
+    from src.analysis.library import SpectrumLibrary
+
+    engine = create_engine(url)
+    try:
+        with Session(engine) as session:
+            library = SpectrumLibrary.from_session(session)
+    finally:
+        engine.dispose()
+    return library.matrix[:limite]
+
+
+def format_summary(resumen):
+    lat = resumen["latencia_ms"]
+    lineas = [
+        f"Consultas: {resumen['consultas']} en {resumen['segundos']} s | ok: {resumen['ok']} | "
+        f"rendimiento: {resumen['consultas_por_segundo']} consultas/s",
+        f"Latencia (ms): p50 {lat['p50']} | p95 {lat['p95']} | p99 {lat['p99']} | "
+        f"media {lat['media']} | máx {lat['max']}",
+        f"Errores: {resumen['errores']} (códigos {resumen['codigos']}) | bloqueos SQLite: "
+        f"{resumen['bloqueos_sqlite']} | conexión: {resumen['errores_conexion']}",
+        f"CPU del servidor: {resumen['cpu_servidor_nucleos']} núcleos de {resumen['nucleos_disponibles']}",
+    ]
+    return "\n".join(lineas)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga local del servicio de identificación")
+    parser.add_argument("--corpus", nargs="*", default=[],
+                        help="Archivos/carpetas para llenar la BD temporal (y DOCX a subir en modo upload)")
+    parser.add_argument("--synthetic", type=int, default=0, help="Espectros sintéticos a agregar a la biblioteca")
+    parser.add_argument("--mode", choices=MODOS, default="upload",
+                        help="upload: subir DOCX del corpus; vector: enviar vectores con ruido")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="Clientes simultáneos (lazo cerrado) o máximo en vuelo (con --rate)")
+    parser.add_argument("--rate", type=float, help="Consultas por segundo (llegadas de Poisson, lazo abierto)")
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION_S, help="Segundos de prueba")
+    parser.add_argument("--requests", type=int, help="Número de consultas (en lugar de --duration)")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--ventana", metavar="INICIO,FIN", help="Ventana de bins [INICIO, FIN) de las consultas")
+    parser.add_argument("--server-workers", type=int, help="Procesos de parseo del servidor")
+    parser.add_argument("--window-ms", type=float, help="Ventana de agrupación del servidor")
+    parser.add_argument("--cache-size", type=int, default=0,
+                        help="Caché de resultados del servidor (default 0: desactivada)")
+    parser.add_argument("--keep", action="store_true", help="Conservar la BD temporal")
+    parser.add_argument("--json", help="Guardar el resumen en este archivo JSON")
+    args = parser.parse_args(argv)
+
+    if not args.corpus and not args.synthetic:
+        parser.error("Indique --corpus y/o --synthetic para llenar la biblioteca temporal.")
+    from src.analysis.library import parse_window
+
+    try:
+        ventana = parse_window(args.ventana)
+    except ValueError as e:
+        parser.error(str(e))
+    resumen = load_test(
+        corpus=args.corpus, synthetic=args.synthetic, modo=args.mode, concurrency=args.concurrency,
+        rate=args.rate, duration=args.duration, requests=args.requests, top_k=args.top_k, ventana=ventana,
+        server_workers=args.server_workers, cache_size=args.cache_size, window_ms=args.window_ms,
+        keep=args.keep,
+    )
+    print(format_summary(resumen))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resumen, f, ensure_ascii=False, indent=2)
+    return 0 if resumen["errores"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,420 @@
+# src/service/server.py
+"""
+Servicio HTTP local de identificación de minerales (asyncio, sin dependencias extra).
+
+Endpoints:
+  GET  /health               Estado del servicio y tamaño de la biblioteca
+  POST /identify/vector      Cuerpo JSON: {"vector": [...], "top_k": 10, "umbral": 0.0, "ventana": [10, 150]}
+  POST /identify/upload      Cuerpo: bytes del archivo DOCX (parámetros ?top_k=&umbral=&ventana=10,150)
+  POST /library/reload       Recarga la biblioteca desde la BD
+
+"ventana" (opcional) restringe la similitud a los bins [inicio, fin) del
+vector, p. ej. para ignorar el pico de carbono/recubrimiento al inicio; una
+ventana inválida o fuera del vector responde 400. "representacion" (opcional,
+por defecto perfil_imagen) declara el tipo del vector; la biblioteca en
+memoria solo tiene perfiles de imagen y las demás representaciones se
+rechazan con 422 en lugar de compararse contra otro eje.
+
+Las consultas que llegan dentro de una ventana de pocos milisegundos se agrupan
+en un solo producto de matrices contra la biblioteca compartida en memoria, y el
+parseo de DOCX se ejecuta en un pool de procesos. Con --shards las consultas se
+reparten entre los shards del registro (ver src/analysis/sharded.py).
+
+Uso:
+    python -m src.service.server --port 8765
+    python -m src.service.server --shards shards.json
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from src.analysis.cache import DEFAULT_MAX_ENTRIES, ResultCache, result_key, score_mode
+from src.analysis.library import SpectrumLibrary, parse_window
+from src.analysis.pipeline import PERFIL_IMAGEN
+from src.database.connection import SessionLocal
+from src.database.queries import create_tables
+from src.diagnostics import add_diagnostic_arguments, configure_from_args
+from src.memory import BAJO_CONSUMO, MemoryBudgetExceeded, plan_memory, track_memory
+from src.profiling import profile, reset_inherited_profiler
+
+MAX_BODY_BYTES = 50 * 1024 * 1024
+
+POST_ROUTES = ("/identify/vector", "/identify/upload", "/library/reload")
+
+HTTP_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    422: "Unprocessable Entity",
+    500: "Internal Server Error",
+}
+
+
+class HTTPError(Exception):
+    """Error que se devuelve al cliente con el código HTTP indicado."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def load_library():
+    """Carga la biblioteca de espectros desde la BD."""
+    session = SessionLocal()
+    try:
+        return SpectrumLibrary.from_session(session)
+    finally:
+        session.close()
+
+
+def vectorize_docx_bytes(data, params=None, etiqueta="upload"):
+    """
+    Vectoriza un DOCX recibido como bytes (se ejecuta en un proceso del pool)
+    con los parámetros del pipeline de la biblioteca cargada.
+    Retorna (vector como lista, representación) o (None, None) si no se
+    encontró espectro.
+    """
+    from src.analysis.pipeline import normalize_params
+    from src.parsers.docx_parser import vectorize_docx
+
+    archivo = io.BytesIO(data)
+    with profile(f"{etiqueta}-parse"), track_memory(f"{etiqueta}-parse"):
+        low_memory = plan_memory(archivo) == BAJO_CONSUMO
+        vector, representacion = vectorize_docx(archivo, low_memory=low_memory, **normalize_params(params))
+    return (None, None) if vector is None else (vector.tolist(), representacion)
+
+
+def _fail(items, error):
+    """Falla las consultas aún pendientes (las canceladas o ya resueltas se omiten)."""
+    for item in items:
+        if not item[3].done():
+            item[3].set_exception(error)
+
+
+class MicroBatcher:
+    """
+    Agrupa las consultas concurrentes que llegan dentro de `window_ms` en un
+    solo lote y las resuelve con un único producto de matrices (uno por
+    ventana distinta dentro del lote).
+    """
+
+    def __init__(self, library, window_ms=5.0, max_batch=256):
+        self.library = library
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.batches = 0
+        self.queries = 0
+        self._queue = asyncio.Queue()
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def submit(self, vector, top_k=10, similitud_umbral=0.0, ventana=None):
+        """Encola una consulta (vector float32 de una dimensión) y espera su resultado."""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((vector, top_k, similitud_umbral, future, ventana))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._resolve(batch)
+            except Exception as e:
+                # Un error inesperado falla solo este lote: el batcher sigue atendiendo
+                _fail(batch, e)
+
+    async def _resolve(self, batch):
+        library = self.library
+        self.batches += 1
+        self.queries += len(batch)
+
+        # Las consultas con una dimensión distinta a la de la biblioteca fallan individualmente
+        validas = []
+        for item in batch:
+            vector = item[0]
+            if vector.ndim != 1 or (library.dimension is not None and vector.size != library.dimension):
+                _fail([item], HTTPError(
+                    422, f"El vector debe tener {library.dimension} dimensiones (recibido {vector.size})."
+                ))
+            else:
+                validas.append(item)
+
+        grupos = {}
+        for item in validas:
+            grupos.setdefault(item[4], []).append(item)
+        for ventana, grupo in grupos.items():
+            await self._resolve_group(library, grupo, ventana)
+
+    async def _resolve_group(self, library, grupo, ventana):
+        # Un solo search con el top_k mayor y el umbral menor del grupo; cada
+        # consulta recorta luego su propia lista (ya ordenada)
+        queries = np.stack([item[0] for item in grupo])
+        top_ks = [item[1] for item in grupo]
+        top_k = None if None in top_ks else max(top_ks)
+        umbral = min(item[2] for item in grupo)
+        try:
+            resultados = await asyncio.get_running_loop().run_in_executor(
+                None, lambda: library.search(queries, top_k=top_k, similitud_umbral=umbral, ventana=ventana)
+            )
+        except Exception as e:
+            _fail(grupo, e)
+            return
+
+        for resultado, (_, top_k, umbral, future, _) in zip(resultados, grupo):
+            if not future.done():
+                future.set_result([r for r in resultado if r[2] >= umbral][:top_k])
+
+
+class IdentificationService:
+    """Servidor HTTP/1.1 mínimo con keep-alive sobre asyncio.start_server."""
+
+    def __init__(self, library, window_ms=5.0, max_batch=256, workers=None, loader=load_library,
+                 cache_size=DEFAULT_MAX_ENTRIES):
+        self.batcher = MicroBatcher(library, window_ms=window_ms, max_batch=max_batch)
+        # Resultados de consultas repetidas (se invalidan al recargar una biblioteca modificada)
+        self.cache = ResultCache(max_entries=cache_size)
+        # Función que recarga la biblioteca (SpectrumLibrary o coordinador de shards)
+        self.loader = loader
+        self.pool = ProcessPoolExecutor(max_workers=workers, initializer=reset_inherited_profiler)
+        self.requests = 0
+        self.started = time.time()
+
+    # ------------------------------------------------------------------ #
+    # Endpoints
+    # ------------------------------------------------------------------ #
+    async def identify(self, vector, params):
+        try:
+            vector = np.asarray(vector, dtype=np.float32)
+            top_k = int(params.get("top_k", 10))
+            umbral = float(params.get("umbral", 0.0))
+        except (ValueError, TypeError):
+            raise HTTPError(400, "Parámetros de consulta inválidos.")
+        if top_k < 1:
+            raise HTTPError(400, "top_k debe ser un entero mayor o igual a 1.")
+        try:
+            ventana = parse_window(params.get("ventana"), vector.size)
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+        library = self.batcher.library
+        representacion = params.get("representacion") or PERFIL_IMAGEN
+        if representacion != library.representacion:
+            raise HTTPError(422, f"La biblioteca en memoria solo tiene vectores '{library.representacion}'; "
+                                 f"no se compara contra '{representacion}'.")
+        modo = score_mode(ventana)
+        t0 = time.perf_counter()
+        resultados = self.cache.get(result_key(vector, library.library_version, library.pipeline_version,
+                                               top_k, umbral, modo=modo))
+        if resultados is None:
+            resultados = await self.batcher.submit(vector, top_k=top_k, similitud_umbral=umbral, ventana=ventana)
+            # La clave se arma con la biblioteca que resolvió la consulta (pudo recargarse)
+            library = self.batcher.library
+            self.cache.put(result_key(vector, library.library_version, library.pipeline_version,
+                                      top_k, umbral, modo=modo), resultados)
+        return {
+            # Con shards cada resultado trae además el nombre del shard
+            "resultados": [
+                dict(zip(("muestra_id", "nombre_muestra", "similitud", "shard"), resultado))
+                for resultado in resultados
+            ],
+            "elapsed_ms": round((time.perf_counter() - t0) * 1000, 3),
+        }
+
+    async def route(self, method, path, params, body):
+        if path in POST_ROUTES and method == "POST":
+            # Con EDS_PROFILE cada petición genera su propio perfil. Se mide el hilo
+            # del event loop: incluye lo que hagan otras peticiones concurrentes.
+            self.requests += 1
+            etiqueta = f"{path.strip('/').replace('/', '-')}-{self.requests}"
+            with profile(etiqueta), track_memory(etiqueta):
+                return await self._route(method, path, params, body, etiqueta)
+        return await self._route(method, path, params, body)
+
+    async def _route(self, method, path, params, body, etiqueta=None):
+        if path == "/health":
+            return {
+                "status": "ok",
+                "muestras": len(self.batcher.library),
+                "pipeline_version": self.batcher.library.pipeline_version,
+                "shards": getattr(self.batcher.library, "shards", None),
+                "lotes": self.batcher.batches,
+                "consultas": self.batcher.queries,
+                "cache": self.cache.stats(),
+                "uptime_s": round(time.time() - self.started, 1),
+            }
+
+        if path not in POST_ROUTES:
+            raise HTTPError(404, f"Ruta no encontrada: {path}")
+        if method != "POST":
+            raise HTTPError(405, f"Método no permitido: {method} {path}")
+
+        if path == "/identify/vector":
+            try:
+                payload = json.loads(body or b"{}")
+                vector = payload["vector"]
+            except (ValueError, KeyError, TypeError):
+                raise HTTPError(400, 'Se esperaba un JSON con la clave "vector".')
+            return await self.identify(vector, {**params, **payload})
+
+        if path == "/identify/upload":
+            if not body:
+                raise HTTPError(400, "El cuerpo de la petición debe contener el archivo DOCX.")
+            loop = asyncio.get_running_loop()
+            try:
+                vector, representacion = await loop.run_in_executor(
+                    self.pool, vectorize_docx_bytes, body, self.batcher.library.params, etiqueta or "upload")
+            except MemoryBudgetExceeded as e:
+                raise HTTPError(413, f"El archivo supera el presupuesto de memoria: {e}")
+            if vector is None:
+                raise HTTPError(422, "No se encontró un espectro válido en el archivo.")
+            return await self.identify(vector, {**params, "representacion": representacion})
+
+        if path == "/library/reload":
+            loop = asyncio.get_running_loop()
+            self.batcher.library = await loop.run_in_executor(None, self.loader)
+            return {"status": "ok", "muestras": len(self.batcher.library),
+                    "pipeline_version": self.batcher.library.pipeline_version}
+
+    # ------------------------------------------------------------------ #
+    # Protocolo HTTP
+    # ------------------------------------------------------------------ #
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self._send(writer, 400, {"error": "Petición mal formada."}, keep_alive=False)
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                length = int(headers.get("content-length", 0) or 0)
+                if length > MAX_BODY_BYTES:
+                    await self._send(writer, 413, {"error": "Archivo demasiado grande."}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                url = urlsplit(target)
+                params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                try:
+                    status, payload = 200, await self.route(method.upper(), url.path, params, body)
+                except HTTPError as e:
+                    status, payload = e.status, {"error": e.message}
+                except Exception as e:
+                    status, payload = 500, {"error": str(e)}
+
+                await self._send(writer, status, payload, keep_alive=keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+    async def _send(self, writer, status, payload, keep_alive=True):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = (
+            f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + data)
+        await writer.drain()
+
+    async def serve(self, host="127.0.0.1", port=8765):
+        self.batcher.start()
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"Servicio de identificación escuchando en http://{host}:{port} "
+              f"({len(self.batcher.library)} muestras en memoria)")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.batcher.stop()
+            self.pool.shutdown(cancel_futures=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servicio HTTP local de identificación de minerales EDS")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--window-ms", type=float, default=5.0,
+                        help="Ventana para agrupar consultas concurrentes (default: 5 ms)")
+    parser.add_argument("--max-batch", type=int, default=256, help="Máximo de consultas por lote")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos para parsear DOCX")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_MAX_ENTRIES,
+                        help="Consultas en la caché de resultados (0 la desactiva)")
+    parser.add_argument("--shards", metavar="REGISTRO",
+                        help="Buscar en la biblioteca particionada del registro de shards (ej. shards.json)")
+    add_diagnostic_arguments(parser)
+    args = parser.parse_args(argv)
+    configure_from_args(args)
+
+    if args.shards:
+        from src.analysis.sharded import ShardedSearch
+
+        library = ShardedSearch(args.shards)
+        loader = library.reload
+    else:
+        create_tables()
+        library, loader = load_library(), load_library
+    service = IdentificationService(
+        library,
+        window_ms=args.window_ms,
+        max_batch=args.max_batch,
+        workers=args.workers,
+        loader=loader,
+        cache_size=args.cache_size,
+    )
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if args.shards:
+            library.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from src.analysis.cache import ResultCache
+from src.analysis.compare import compare_vector
+from src.database.models import Muestra
+from src.database.queries import (activate_pipeline_version, create_tables, delete_muestra, get_library_version,
+                                  insert_espectro, insert_muestra, register_pipeline_version)
+from src.database.shards import get_engine, shard_session
+
+VECTOR = np.linspace(0, 1, 200)
+
+
+def _insertar(session, nombre, vector=VECTOR):
+    insert_espectro(session, insert_muestra(session, nombre).id, vector)
+
+
+def _actualizar(session):
+    session.query(Muestra).filter(Muestra.nombre_muestra == "CUARZO").one().nombre_muestra = "CALCITA"
+    session.commit()
+
+
+def _eliminar(session):
+    delete_muestra(session, session.query(Muestra.id).filter(Muestra.nombre_muestra == "CUARZO").scalar())
+
+
+def _activar(session):
+    activate_pipeline_version(session, register_pipeline_version(session, {"vector_size": 100}).id)
+
+
+@pytest.mark.parametrize("triggers", [True, False], ids=["con-triggers", "sin-triggers"])
+@pytest.mark.parametrize("cambio", [
+    lambda s: _insertar(s, "PIRITA", VECTOR[::-1]), _actualizar, _eliminar, _activar,
+], ids=["insert", "update", "delete", "activacion"])
+def test_cambio_desde_otro_engine_invalida_la_cache(tmp_path, triggers, cambio):
+    url = f"sqlite:///{tmp_path / 'biblioteca.db'}"
+    create_tables(get_engine(url))
+    if not triggers:
+        # Como en un motor sin los triggers de SQLite: solo cuenta la aplicación
+        with get_engine(url).begin() as conn:
+            for (nombre,) in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'trigger'")).all():
+                conn.execute(text(f"DROP TRIGGER {nombre}"))
+
+    session = shard_session(url)
+    _insertar(session, "CUARZO")
+    cache = ResultCache()
+    compare_vector(session, VECTOR, similitud_umbral=0.0, cache=cache)
+    compare_vector(session, VECTOR, similitud_umbral=0.0, cache=cache)
+    assert (cache.hits, cache.misses) == (1, 1)
+    version = get_library_version(session)
+    session.commit()
+
+    otro_engine = create_engine(url)
+    otra = sessionmaker(bind=otro_engine)()
+    try:
+        cambio(otra)
+    finally:
+        otra.close()
+        otro_engine.dispose()
+
+    assert get_library_version(session) > version
+    compare_vector(session, VECTOR, similitud_umbral=0.0, cache=cache)
+    assert cache.misses == 2
+    session.close()
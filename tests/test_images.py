@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+
+from src.cli import build_parser
+from src.ingestion import images
+from src.ingestion.files import vectorize_file
+
+
+def _tiff_dos_paginas(tmp_path):
+    ruta = str(tmp_path / "dos.tif")
+    paginas = [np.full((400, 512, 3), 255, dtype=np.uint8) for _ in range(2)]
+    for i, pagina in enumerate(paginas):
+        pagina[200 + 20 * i:, 100:110] = 0
+    assert cv2.imwritemulti(ruta, paginas)
+    return ruta
+
+
+def test_vectorize_file_decodifica_una_sola_pagina(tmp_path, monkeypatch):
+    ruta = _tiff_dos_paginas(tmp_path)
+    decodificadas = []
+    original = images._decode_page
+
+    def contar(path, page, total_pages):
+        decodificadas.append(page)
+        return original(path, page, total_pages)
+
+    monkeypatch.setattr(images, "_decode_page", contar)
+    vectorize_file(ruta)
+    assert decodificadas == [0]
+    vectorize_file(ruta, page=1)
+    assert decodificadas == [0, 1]
+
+
+def test_identify_rechaza_tiff_de_varias_paginas(tmp_path, capsys):
+    ruta = _tiff_dos_paginas(tmp_path)
+    args = build_parser().parse_args(["identify", ruta])
+    assert args.func(args) == 2
+    assert "--page" in capsys.readouterr().err
+    args = build_parser().parse_args(["identify", ruta, "--page", "5"])
+    assert args.func(args) == 2
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from src.analysis.library import SpectrumLibrary, cached_library, parse_window
+from src.database.queries import create_tables, insert_espectro, insert_muestra
+from src.database.shards import get_engine, shard_session
+
+
+def _coseno_por_fuerza_bruta(queries, matrix, a, b):
+    sims = np.zeros((len(queries), len(matrix)))
+    for i, q in enumerate(np.asarray(queries, dtype=np.float64)[:, a:b]):
+        for j, v in enumerate(np.asarray(matrix, dtype=np.float64)[:, a:b]):
+            norma = np.linalg.norm(q) * np.linalg.norm(v)
+            sims[i, j] = q @ v / norma if norma else 0.0
+    return sims
+
+
+@pytest.mark.parametrize("ventana", [(0, 200), (0, 1), (10, 150), (199, 200), (180, 200), "30,31", "5-60"])
+def test_ventana_igual_a_coseno_sobre_vectores_recortados(ventana):
+    rng = np.random.default_rng(0)
+    matrix = rng.random((30, 200))
+    # Filas con casi toda la energía al inicio y filas sin señal en la cola
+    matrix[:5, 20:] *= 1e-3
+    matrix[5:8, 180:] = 0.0
+    queries = rng.random((4, 200))
+    library = SpectrumLibrary(range(30), [f"M{i}" for i in range(30)], matrix)
+
+    a, b = parse_window(ventana)
+    obtenido = library.window_similarity_matrix(queries, ventana)
+    np.testing.assert_allclose(obtenido, _coseno_por_fuerza_bruta(queries, matrix, a, b), atol=1e-5)
+    assert library._sq_prefix.nbytes == library.matrix.nbytes
+
+
+@pytest.mark.parametrize("ventana", ["-1,5", "-1-5", "1--5", "5,5", "10,1", "1.5,3", "a,b", "1,2,3", (0, 201)])
+def test_parse_window_rechaza_ventanas_invalidas(ventana):
+    with pytest.raises(ValueError):
+        parse_window(ventana, 200)
+
+
+def test_parse_window_acepta_bins():
+    assert parse_window("10,150") == parse_window("10-150") == parse_window([10.0, 150]) == (10, 150)
+    assert parse_window(None) is None and parse_window("") is None
+
+
+def test_biblioteca_del_proceso_se_recarga_solo_si_cambia_la_bd(tmp_path):
+    url = f"sqlite:///{tmp_path / 'biblioteca.db'}"
+    create_tables(get_engine(url))
+    session = shard_session(url)
+    insert_espectro(session, insert_muestra(session, "CUARZO").id, np.ones(200))
+
+    primera = cached_library(session)
+    assert cached_library(session) is primera
+    insert_espectro(session, insert_muestra(session, "CALCITA").id, np.arange(200.0))
+    segunda = cached_library(session)
+    assert segunda is not primera and len(segunda) == 2
+    session.close()
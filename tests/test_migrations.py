@@ -0,0 +1,39 @@
+import sqlite3
+
+from src.database.models import EspectroVectorizado, Muestra
+from src.database.queries import create_tables, delete_muestra
+from src.database.shards import get_engine, shard_session
+
+# Esquema original (antes de las migraciones): sin versión del pipeline ni cascada
+ESQUEMA_LEGADO = [
+    "CREATE TABLE muestras (id INTEGER PRIMARY KEY, nombre_muestra VARCHAR NOT NULL, "
+    "fecha DATETIME DEFAULT CURRENT_TIMESTAMP, investigador VARCHAR, ruta_imagen VARCHAR)",
+    "CREATE TABLE espectros_vectorizados (id INTEGER PRIMARY KEY, "
+    "muestra_id INTEGER REFERENCES muestras (id), vector_json TEXT NOT NULL)",
+    "INSERT INTO muestras (id, nombre_muestra) VALUES (1, 'CUARZO'), (2, 'CALCITA')",
+    # Muestra 1 con un espectro repetido (10 y 11) y un espectro huérfano (12)
+    "INSERT INTO espectros_vectorizados (id, muestra_id, vector_json) VALUES "
+    "(10, 1, '[1.0]'), (11, 1, '[2.0]'), (12, 99, '[3.0]'), (13, 2, '[4.0]')",
+]
+
+
+def test_migra_bd_legada_con_duplicados_y_huerfanos(tmp_path):
+    # Sin claves foráneas activas, como las BD creadas antes de la migración
+    ruta = tmp_path / "legada.db"
+    with sqlite3.connect(ruta) as conn:
+        for sql in ESQUEMA_LEGADO:
+            conn.execute(sql)
+    conn.close()
+
+    url = f"sqlite:///{ruta}"
+    create_tables(get_engine(url))
+    session = shard_session(url)
+    try:
+        espectros = {e.id: (e.muestra_id, e.vector) for e in session.query(EspectroVectorizado)}
+        assert espectros == {11: (1, [2.0]), 13: (2, [4.0])}
+
+        delete_muestra(session, 1)
+        assert session.query(Muestra).count() == 1
+        assert [e.id for e in session.query(EspectroVectorizado)] == [13]
+    finally:
+        session.close()
@@ -0,0 +1,53 @@
+import argparse
+import os
+import pstats
+import time
+
+import pytest
+
+from src.diagnostics import add_diagnostic_arguments, configure_from_args
+from src.profiling import profile
+
+
+def _trabajo():
+    fin = time.perf_counter() + 0.05
+    while time.perf_counter() < fin:
+        sum(range(1000))
+
+
+@pytest.mark.parametrize("modo, extension", [("cprofile", ".pstats"), ("sample", ".collapsed")])
+def test_profile_escribe_el_artefacto_en_eds_profile_dir(tmp_path, monkeypatch, modo, extension):
+    monkeypatch.setenv("EDS_PROFILE", modo)
+    monkeypatch.setenv("EDS_PROFILE_DIR", str(tmp_path))
+    monkeypatch.setenv("EDS_PROFILE_RATE", "1")
+    monkeypatch.setenv("EDS_PROFILE_INTERVAL", "1")
+    with profile("peticion/prueba 1") as path:
+        _trabajo()
+
+    assert os.path.dirname(path) == str(tmp_path) and path.endswith(extension)
+    assert os.listdir(tmp_path) == [os.path.basename(path)]
+    if modo == "cprofile":
+        assert pstats.Stats(path).total_calls > 0
+    else:
+        with open(path, encoding="utf-8") as f:
+            assert "_trabajo" in f.read()
+
+
+def test_sin_eds_profile_no_escribe_nada(tmp_path, monkeypatch):
+    monkeypatch.delenv("EDS_PROFILE", raising=False)
+    monkeypatch.setenv("EDS_PROFILE_DIR", str(tmp_path))
+    with profile("peticion") as path:
+        _trabajo()
+    assert path is None and os.listdir(tmp_path) == []
+
+
+def test_opciones_de_diagnostico_fijan_el_entorno(tmp_path, monkeypatch):
+    for nombre in ("EDS_PROFILE", "EDS_PROFILE_DIR", "EDS_PROFILE_RATE", "EDS_MEMORY", "EDS_MEMORY_BUDGET_MB"):
+        monkeypatch.delenv(nombre, raising=False)
+    parser = argparse.ArgumentParser()
+    add_diagnostic_arguments(parser)
+    configure_from_args(parser.parse_args(["--profile", "sample", "--profile-dir", str(tmp_path),
+                                           "--memory-report", "--memory-budget-mb", "256"]))
+    assert (os.environ["EDS_PROFILE"], os.environ["EDS_PROFILE_DIR"]) == ("sample", str(tmp_path))
+    assert (os.environ["EDS_MEMORY"], os.environ["EDS_MEMORY_BUDGET_MB"]) == ("1", "256.0")
+    assert "EDS_PROFILE_RATE" not in os.environ
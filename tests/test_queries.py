@@ -0,0 +1,35 @@
+import numpy as np
+
+from src.database.models import Muestra
+from src.database.queries import (count_muestras_filtered, create_tables, delete_muestras, insert_espectro,
+                                  insert_muestra, register_pipeline_version, update_muestras)
+from src.database.shards import get_engine, shard_session
+
+VECTOR = np.linspace(0, 1, 200)
+
+
+def _sesion_con_muestras(tmp_path):
+    url = f"sqlite:///{tmp_path / 'muestras.db'}"
+    create_tables(get_engine(url))
+    session = shard_session(url)
+    # Con espectro activo, sin espectro y con espectro solo de otra versión
+    insert_espectro(session, insert_muestra(session, "QZ_1").id, VECTOR)
+    insert_muestra(session, "QZ_2")
+    otra = register_pipeline_version(session, {"vector_size": 100})
+    insert_espectro(session, insert_muestra(session, "QZ_3").id, VECTOR[:100], pipeline_version=otra.id)
+    return session
+
+
+def test_eliminar_por_filtros_coincide_con_el_total_mostrado(tmp_path):
+    session = _sesion_con_muestras(tmp_path)
+    total = count_muestras_filtered(session, nombre_prefix="QZ_")
+    assert delete_muestras(session, nombre_prefix="QZ_", solo_con_espectro=True) == total == 1
+    assert {m.nombre_muestra for m in session.query(Muestra)} == {"QZ_2", "QZ_3"}
+
+
+def test_actualizar_por_filtros_coincide_con_el_total_mostrado(tmp_path):
+    session = _sesion_con_muestras(tmp_path)
+    total = count_muestras_filtered(session, nombre_prefix="QZ_")
+    assert update_muestras(session, nuevo_investigador="Ana", nombre_prefix="QZ_",
+                           solo_con_espectro=True) == total
+    assert update_muestras(session, nuevo_investigador="Ana", nombre_prefix="QZ_") == 3
@@ -0,0 +1,77 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from src.analysis.library import SpectrumLibrary
+from src.service.server import HTTPError, IdentificationService
+
+
+def _library(n=20, dimension=200, seed=0):
+    rng = np.random.default_rng(seed)
+    return SpectrumLibrary(range(n), [f"M{i}" for i in range(n)], rng.random((n, dimension)))
+
+
+def _identify(service, *consultas):
+    """Ejecuta las consultas una tras otra (cada una en su propio lote)."""
+    async def run():
+        service.batcher.start()
+        try:
+            resultados = []
+            for vector, params in consultas:
+                try:
+                    resultados.append(await asyncio.wait_for(service.identify(vector, params), 5))
+                except (HTTPError, RuntimeError) as e:
+                    resultados.append(e)
+            return resultados
+        finally:
+            await service.batcher.stop()
+
+    try:
+        return asyncio.run(run())
+    finally:
+        service.pool.shutdown()
+
+
+@pytest.mark.parametrize("top_k", [0, -3, -1000])
+def test_top_k_invalido_es_400(top_k):
+    library = _library()
+    (error,) = _identify(IdentificationService(library, workers=1), (library.matrix[0], {"top_k": top_k}))
+    assert isinstance(error, HTTPError) and error.status == 400
+
+
+def test_batcher_sobrevive_a_un_error_inesperado():
+    library = _library()
+    service = IdentificationService(library, workers=1, cache_size=0)
+    resolver = service.batcher._resolve_group
+    fallas = []
+
+    async def resolve_group(*args):
+        # Error fuera del search (p. ej. al agrupar): antes mataba la tarea del batcher
+        if not fallas:
+            fallas.append(1)
+            raise RuntimeError("falla")
+        return await resolver(*args)
+
+    service.batcher._resolve_group = resolve_group
+    primera, segunda = _identify(service, (library.matrix[0], {"top_k": 1}), (library.matrix[1], {"top_k": 1}))
+    assert isinstance(primera, RuntimeError)
+    assert segunda["resultados"][0]["nombre_muestra"] == "M1"
+
+
+@pytest.mark.parametrize("ventana", ["-1,5", "5,5", "10,1", "0,500", "a,b", [1.5, 3]])
+def test_ventana_invalida_es_400(ventana):
+    library = _library()
+    (error,) = _identify(IdentificationService(library, workers=1), (library.matrix[0], {"ventana": ventana}))
+    assert isinstance(error, HTTPError) and error.status == 400
+
+
+def test_ventana_valida_usa_solo_esos_bins():
+    library = _library()
+    vector = library.matrix[3].copy()
+    vector[:50] = 0.0
+    (respuesta,) = _identify(IdentificationService(library, workers=1),
+                             (vector, {"top_k": 1, "ventana": "50,200"}))
+    assert respuesta["resultados"][0]["nombre_muestra"] == "M3"
+    assert respuesta["resultados"][0]["similitud"] == pytest.approx(1.0, abs=1e-5)
+
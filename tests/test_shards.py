@@ -0,0 +1,38 @@
+import numpy as np
+
+from src.analysis.pipeline import DEFAULT_PARAMS
+from src.database.shards import add_shard, distribute_batches, load_registry, route, shard_status
+
+NOMBRES = [f"MINERAL{i}" for i in range(40)]
+
+
+def _lotes(seed=0):
+    rng = np.random.default_rng(seed)
+    columnas = {"nombre_muestra": NOMBRES, "investigador": [None] * len(NOMBRES),
+                "fecha": [None] * len(NOMBRES), "ruta_imagen": [None] * len(NOMBRES),
+                "content_hash": [None] * len(NOMBRES), "representacion": [None] * len(NOMBRES)}
+    return [(columnas, rng.random((len(NOMBRES), 200)))]
+
+
+def test_agregar_un_shard_solo_mueve_los_minerales_que_gana(tmp_path):
+    registro = str(tmp_path / "shards.json")
+    for nombre in ("a", "b", "c"):
+        add_shard(nombre, str(tmp_path / f"{nombre}.db"), path=registro)
+    antes = {n: route(load_registry(registro), n)["nombre"] for n in NOMBRES}
+    add_shard("d", str(tmp_path / "d.db"), path=registro)
+    despues = {n: route(load_registry(registro), n)["nombre"] for n in NOMBRES}
+
+    movidos = [n for n in NOMBRES if antes[n] != despues[n]]
+    assert movidos and all(despues[n] == "d" for n in movidos)
+
+
+def test_reimportar_despues_de_agregar_un_shard_no_duplica(tmp_path):
+    registro = str(tmp_path / "shards.json")
+    add_shard("a", str(tmp_path / "a.db"), path=registro)
+    add_shard("b", str(tmp_path / "b.db"), path=registro)
+    assert sum(distribute_batches(_lotes(), DEFAULT_PARAMS, path=registro)["insertadas"].values()) == 40
+
+    add_shard("c", str(tmp_path / "c.db"), path=registro)
+    resumen = distribute_batches(_lotes(), DEFAULT_PARAMS, path=registro)
+    assert sum(resumen["insertadas"].values()) == 0 and resumen["duplicadas"] == 40
+    assert sum(s["muestras"] for s in shard_status(registro)) == 40
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from src.parsers.spectrum_text_parser import parse_emsa
+
+CABECERA = """#FORMAT      : EMSA/MAS Spectral Data File
+#VERSION     : 1.0
+#NPOINTS     : {npoints}
+#XUNITS      : eV
+#DATATYPE    : {datatype}
+#XPERCHAN    : 10.0
+#OFFSET      : 0.0
+#SPECTRUM    : Spectral Data Starts Here
+"""
+
+
+def _emsa(tmp_path, datos, npoints, datatype="Y"):
+    ruta = tmp_path / "espectro.msa"
+    ruta.write_text(CABECERA.format(npoints=npoints, datatype=datatype) + datos + "#ENDOFDATA   :\n",
+                    encoding="latin-1")
+    return str(ruta)
+
+
+def test_lee_datos_y_con_varias_columnas_por_linea(tmp_path):
+    energias, conteos = parse_emsa(_emsa(tmp_path, "1, 2, 3, 4,\n5, 6,\n", 6))
+    np.testing.assert_array_equal(conteos, [1, 2, 3, 4, 5, 6])
+    np.testing.assert_allclose(energias, np.arange(6) * 0.01)
+
+
+def test_lee_datos_xy(tmp_path):
+    energias, conteos = parse_emsa(_emsa(tmp_path, "100, 7\n200, 8\n", 2, datatype="XY"))
+    np.testing.assert_allclose(energias, [0.1, 0.2])
+    np.testing.assert_array_equal(conteos, [7, 8])
+
+
+@pytest.mark.parametrize("datos, npoints, datatype", [
+    ("1, 2, x, 4,\n", 4, "Y"),       # valor no numérico: antes se truncaba en [1, 2]
+    ("1, 2, 3,\n", 4, "Y"),          # archivo truncado respecto de NPOINTS
+    ("100, 7\n200,\n", 2, "XY"),     # valor XY sin pareja
+])
+def test_rechaza_datos_corruptos(tmp_path, datos, npoints, datatype):
+    with pytest.raises(ValueError):
+        parse_emsa(_emsa(tmp_path, datos, npoints, datatype))
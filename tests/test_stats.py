@@ -0,0 +1,42 @@
+import numpy as np
+from sqlalchemy.dialects import postgresql
+
+from src.database.queries import create_tables, get_library_version, insert_espectro, insert_muestra
+from src.database.shards import get_engine, shard_session
+from src.database.stats import _date_period, get_database_stats
+
+
+def _biblioteca(tmp_path, nombre, minerales):
+    url = f"sqlite:///{tmp_path / nombre}"
+    create_tables(get_engine(url))
+    session = shard_session(url)
+    for mineral in minerales:
+        insert_espectro(session, insert_muestra(session, mineral).id, np.ones(200))
+    return session
+
+
+def test_cache_separa_bds_con_la_misma_version(tmp_path):
+    a = _biblioteca(tmp_path, "a.db", ["CUARZO", "CALCITA"])
+    b = _biblioteca(tmp_path, "b.db", ["PIRITA", "YESO"])
+    assert get_library_version(a) == get_library_version(b)
+
+    assert {m for m, _ in get_database_stats(a)["por_mineral"]} == {"CUARZO", "CALCITA"}
+    assert {m for m, _ in get_database_stats(b)["por_mineral"]} == {"PIRITA", "YESO"}
+    a.close()
+    b.close()
+
+
+def test_modificar_el_resultado_no_altera_la_cache(tmp_path):
+    session = _biblioteca(tmp_path, "a.db", ["CUARZO"])
+    stats = get_database_stats(session)
+    stats["total_muestras"] = -1
+    stats["por_mineral"].clear()
+    again = get_database_stats(session)
+    assert again["total_muestras"] == 1 and again["por_mineral"] == [("CUARZO", 1)]
+    session.close()
+
+
+def test_histograma_por_fecha_en_postgresql():
+    sql = str(_date_period("postgresql", "month").compile(dialect=postgresql.dialect(),
+                                                          compile_kwargs={"literal_binds": True}))
+    assert sql == "to_char(muestras.fecha, 'YYYY-MM')"
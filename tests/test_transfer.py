@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from src.database.models import EspectroVectorizado, Muestra
+from src.database.queries import create_tables, insert_espectro, insert_muestra
+from src.database.shards import get_engine, shard_session
+from src.database.transfer import _pyarrow, export_bundle, import_bundle
+
+FORMATOS = ["npz"] + (["parquet"] if _pyarrow() is not None else [])
+
+
+def _session(tmp_path, nombre):
+    url = f"sqlite:///{tmp_path / nombre}"
+    create_tables(get_engine(url))
+    return shard_session(url)
+
+
+def _conteo(session):
+    return session.query(Muestra).count(), session.query(EspectroVectorizado).count()
+
+
+@pytest.mark.parametrize("fmt", FORMATOS)
+def test_exportar_importar_reimportar_sin_duplicados(tmp_path, fmt):
+    rng = np.random.default_rng(0)
+    origen = _session(tmp_path, "origen.db")
+    for i in range(5):
+        muestra = insert_muestra(origen, f"M{i}", investigador="Prueba")
+        insert_espectro(origen, muestra.id, rng.random(200))
+    paquete = str(tmp_path / f"biblioteca.{fmt}")
+    assert export_bundle(origen, paquete) == 5
+
+    destino = _session(tmp_path, "destino.db")
+    assert import_bundle(destino, paquete)["importadas"] == 5
+    resumen = import_bundle(destino, paquete)
+    assert (resumen["importadas"], resumen["duplicadas"]) == (0, 5)
+    assert _conteo(destino) == (5, 5)
+    origen.close()
+    destino.close()
+
+
+def test_importar_recalcula_el_hash_del_paquete(tmp_path):
+    origen = _session(tmp_path, "origen.db")
+    muestra = insert_muestra(origen, "Magnetita")
+    insert_espectro(origen, muestra.id, np.linspace(0, 1, 200))
+    paquete = tmp_path / "biblioteca.npz"
+    export_bundle(origen, str(paquete))
+
+    # Un hash alterado en el paquete no debe saltarse la deduplicación
+    datos = dict(np.load(paquete, allow_pickle=False))
+    datos["content_hash"] = np.array(["alterado"])
+    alterado = tmp_path / "alterado.npz"
+    np.savez(alterado, **datos)
+
+    destino = _session(tmp_path, "destino.db")
+    import_bundle(destino, str(paquete))
+    assert import_bundle(destino, str(alterado))["duplicadas"] == 1
+    assert _conteo(destino) == (1, 1)
+    origen.close()
+    destino.close()